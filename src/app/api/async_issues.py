@@ -0,0 +1,100 @@
+from datetime import datetime
+from typing import List
+from fastapi import APIRouter, Header, HTTPException, Path, Query
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from app.db import async_issue_crud, async_product_crud
+
+from app.api.etag import etag, if_match_version, not_modified
+from app.api.fast_json import FAST_JSON, FastJSONResponse
+from app.api.issues import ISSUE_FIELDS, SORT_PATTERN, parse_after_value, parse_fields
+from app.api.models import IssueResponse, IssueSchema
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_keyset_cursor, encode_keyset_cursor, next_page_link
+from app.api.cache_policy import REVALIDATE, SHARED, cache_policy
+from app.limits import request_cost
+
+router = APIRouter()
+
+async def _missing(productId: int, id: int, version: int):
+    if version is not None and await async_issue_crud.get_by_id(productId=productId, id=id):
+        raise HTTPException(status_code=412, detail="precondition failed")
+    raise HTTPException(status_code=404, detail="issue not found")
+
+async def _ndjson(issues):
+    async for issue in issues:
+        yield IssueResponse(**issue).json() + "\n"
+
+@router.get("/{productId}/issues/", response_model=List[IssueResponse])
+@cache_policy(SHARED)
+@request_cost(2)
+async def get_all_by_product(
+    *, request: Request, response: Response, productId: int = Path(..., gt=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False,
+    status: str = None, assignedTo: str = None, createdBy: str = None, updatedAfter: datetime = None,
+    updatedBefore: datetime = None, sort: str = Query("id", regex=SORT_PATTERN), fields: str = None
+):
+    filters = {"status": status, "assignedTo": assignedTo, "createdBy": createdBy, "updatedAfter": updatedAfter, "updatedBefore": updatedBefore}
+    if stream and (sort != "id" or fields is not None):
+        raise HTTPException(status_code=400, detail="stream does not support sort or fields")
+    columns = parse_fields(fields) or (ISSUE_FIELDS if FAST_JSON and not stream else None)
+    after_value, after_id = decode_keyset_cursor(after, sort)
+    if stream:
+        issues = async_issue_crud.stream_by_product(productId=productId, after=after_id, filters=filters)
+        return StreamingResponse(_ndjson(issues), media_type="application/x-ndjson")
+
+    issues = await async_issue_crud.get_all_by_product(
+        productId=productId, limit=limit + 1, after=after_id, after_value=parse_after_value(sort, after_value),
+        sort=sort, filters=filters, fields=columns
+    )
+    headers = {}
+    if len(issues) > limit:
+        issues = issues[:limit]
+        last = issues[-1]
+        headers["Link"] = next_page_link(request, encode_keyset_cursor(sort, last[sort.lstrip("-")], last["id"]))
+    if columns:
+        return FastJSONResponse([{name: issue[name] for name in columns} for issue in issues], headers=headers)
+    response.headers.update(headers)
+    return issues
+
+@router.get("/{productId}/issues/{id}/")
+@cache_policy(REVALIDATE)
+async def get(
+    *, response: Response, productId: int = Path(..., gt=0), id: int = Path(..., gt=0), if_none_match: str = Header(None)
+):
+    issue = await async_issue_crud.get_by_id(productId=productId, id=id)
+    if not issue:
+        raise HTTPException(status_code=404, detail="issue not found")
+    unchanged = not_modified(if_none_match, issue)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag(issue)
+    return issue
+
+@router.post("/{productId}/issues/", response_model=IssueResponse, status_code=201)
+async def create_issue(*, productId: int = Path(..., gt=0), payload: IssueSchema):
+    payload.productId = productId
+    product = await async_product_crud.get(id=productId)
+    if not product:
+        raise HTTPException(status_code=404, detail="product not found! Must create product first")
+
+    return await async_issue_crud.post(payload=payload)
+
+@router.put("/{productId}/issues/{id}/", response_model=IssueResponse)
+async def update_issue(
+    *, response: Response, productId: int = Path(..., gt=0), id: int = Path(..., gt=0), payload: IssueSchema,
+    if_match: str = Header(None)
+):
+    version = if_match_version(if_match)
+    issue = await async_issue_crud.put(productId=productId, id=id, payload=payload, version=version)
+    if not issue:
+        await _missing(productId, id, version)
+    response.headers["ETag"] = etag(issue)
+    return issue
+
+@router.delete("/{productId}/issues/{id}/", response_model=IssueResponse)
+async def delete_issue(*, productId: int = Path(..., gt=0), id: int = Path(..., gt=0), if_match: str = Header(None)):
+    version = if_match_version(if_match)
+    issue = await async_issue_crud.delete(productId=productId, id=id, version=version)
+    if not issue:
+        await _missing(productId, id, version)
+    return issue
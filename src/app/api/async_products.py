@@ -0,0 +1,114 @@
+from typing import List
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Path, Query
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.db import async_issue_crud, async_product_crud
+from app.db.db_factory import SessionLocal
+from app.api.etag import etag, if_match_version, not_modified
+from app.api.fast_json import FAST_JSON, FastJSONResponse
+from app.api.models import ProductDetail, ProductResponse, ProductSchema
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_id_cursor, encode_cursor, next_page_link
+from app.api.products import ISSUE_FIELDS, MAX_ISSUE_LIMIT, PRODUCT_FIELDS, parse_include, start_purge
+from app.api.cache_policy import REVALIDATE, SHARED, cache_policy
+from app.limits import request_cost
+
+
+router = APIRouter()
+
+async def _missing(id: int, version: int):
+    # The conditional write matched nothing: either the row is gone or its version moved on.
+    if version is not None and await async_product_crud.get(id=id):
+        raise HTTPException(status_code=412, detail="precondition failed")
+    raise HTTPException(status_code=404, detail="product not found")
+
+async def _embed(products: list, includes: set, issue_limit: int):
+    ids = [product["id"] for product in products]
+    if "issue_counts" in includes:
+        counts = await async_issue_crud.count_by_product(productIds=ids)
+        for product in products:
+            product["issueCount"] = counts.get(product["id"], 0)
+    if "issues" in includes:
+        latest = await async_issue_crud.latest_by_product(productIds=ids, per_product=issue_limit, fields=ISSUE_FIELDS)
+        for product in products:
+            product["latestIssues"] = latest.get(product["id"], [])
+    return products
+
+@router.post("/", response_model=ProductResponse, status_code=201)
+async def create_product(*, payload: ProductSchema):
+    return await async_product_crud.post(payload=payload)
+
+@router.get("/{id}/", response_model=ProductDetail, response_model_exclude_unset=True)
+@cache_policy(REVALIDATE)
+async def read_product(
+    *, response: Response, id: int = Path(..., gt=0), if_none_match: str = Header(None), include: str = None,
+    issueLimit: int = Query(5, gt=0, le=MAX_ISSUE_LIMIT)
+):
+    includes = parse_include(include)
+    product = await async_product_crud.get(id=id)
+    if not product:
+        raise HTTPException(status_code=404, detail="product not found")
+    if includes:
+        return (await _embed([{name: product[name] for name in PRODUCT_FIELDS}], includes, issueLimit))[0]
+    unchanged = not_modified(if_none_match, product)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag(product)
+    return product
+
+
+@router.get("/", response_model=List[ProductDetail], response_model_exclude_unset=True)
+@cache_policy(SHARED)
+@request_cost(2)
+async def read_all_products(
+    *, request: Request, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+    after: str = None, include: str = None, issueLimit: int = Query(5, gt=0, le=MAX_ISSUE_LIMIT)
+):
+    includes = parse_include(include)
+    fields = PRODUCT_FIELDS if FAST_JSON or includes else None
+    products = await async_product_crud.get_all(fields=fields, limit=limit + 1, after=decode_id_cursor(after))
+    headers = {}
+    if len(products) > limit:
+        products = products[:limit]
+        headers["Link"] = next_page_link(request, encode_cursor({"id": products[-1]["id"]}))
+    if includes:
+        products = await _embed(products, includes, issueLimit)
+    if FAST_JSON:
+        return FastJSONResponse(products, headers=headers)
+    response.headers.update(headers)
+    return products
+
+
+@router.put("/{id}/", response_model=ProductResponse)
+async def update_product(
+    *, response: Response, id: int = Path(..., gt=0), payload: ProductSchema, if_match: str = Header(None)
+):
+    version = if_match_version(if_match)
+    product = await async_product_crud.put(
+        id=id, title=payload.title, description=payload.description,
+        productOwner=payload.productOwner, createdBy=payload.createdBy, updatedBy=payload.updatedBy,
+        updatedDate=payload.updatedDate, version=version
+    )
+    if not product:
+        await _missing(id, version)
+    response.headers["ETag"] = etag(product)
+    return product
+
+
+@router.delete("/{id}/", response_model=ProductResponse)
+async def delete_product(
+    *, background_tasks: BackgroundTasks, id: int = Path(..., gt=0), if_match: str = Header(None), background: bool = False
+):
+    version = if_match_version(if_match)
+    if background:
+        # Purges run on the SQLAlchemy engine, batch by batch, like the purge status route.
+        db = SessionLocal()
+        try:
+            return await run_in_threadpool(start_purge, db, background_tasks, id, version)
+        finally:
+            db.close()
+    product = await async_product_crud.delete(id=id, version=version)
+    if not product:
+        await _missing(id, version)
+    return product
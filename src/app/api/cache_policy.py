@@ -0,0 +1,41 @@
+import os
+
+# Seconds browsers and CDNs may reuse a list or stats response. 0 (the default) makes them revalidate every time,
+# which keeps read-your-writes for clients whose own changes must show up at once.
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "0"))
+
+NO_STORE = "no-store"
+# Single resources carry an ETag, so revalidating costs a 304 at most.
+REVALIDATE = "no-cache"
+SHARED = f"public, max-age={CACHE_MAX_AGE}" if CACHE_MAX_AGE > 0 else REVALIDATE
+
+
+def cache_policy(value: str):
+    """Declares the Cache-Control header for a route; put it under the router decorator."""
+    def declare(endpoint):
+        endpoint.cache_control = value
+        return endpoint
+    return declare
+
+
+class CachePolicyMiddleware:
+    """Adds the matched route's declared Cache-Control to successful GET and HEAD responses that set none themselves."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                # The router records the matched endpoint in the scope before the response starts.
+                value = getattr(scope.get("endpoint"), "cache_control", None)
+                headers = list(message.get("headers", []))
+                if value is not None and all(name != b"cache-control" for name, _ in headers):
+                    message = dict(message, headers=headers + [(b"cache-control", value.encode("latin-1"))])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,45 @@
+import hashlib
+
+from fastapi import HTTPException
+from starlette.responses import Response
+
+
+def _field(resource, name: str):
+    if isinstance(resource, dict):
+        return resource.get(name)
+    return getattr(resource, name, None)
+
+
+def etag(resource) -> str:
+    version = _field(resource, "version")
+    if version is None:
+        # Rows written before the version column existed fall back to their last update time.
+        version = hashlib.md5(str(_field(resource, "updatedDate")).encode()).hexdigest()[:16]
+    return f'W/"{version}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def matches(header: str, tag: str) -> bool:
+    # Weak comparison for both headers: our tags are always weak, and they change on every write anyway.
+    tags = {_opaque(value) for value in header.split(",")}
+    return "*" in tags or _opaque(tag) in tags
+
+
+def not_modified(if_none_match: str, resource):
+    tag = etag(resource)
+    if if_none_match is not None and matches(if_none_match, tag):
+        return Response(status_code=304, headers={"ETag": tag})
+    return None
+
+
+def if_match_version(if_match: str):
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(_opaque(if_match).strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="precondition failed")
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Header, HTTPException, Path, Query
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from app.events import broker, event_stream
+from app.limits import request_cost
+
+router = APIRouter()
+
+def _resume_from(last_event_id: str, after: int):
+    # Browsers send Last-Event-ID on reconnect; ?lastEventId= serves clients that cannot set headers.
+    if last_event_id is None:
+        return after
+    try:
+        return int(last_event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid Last-Event-ID")
+
+@router.get("/{productId}/issues/events")
+@request_cost(0)
+async def issue_events(
+    *, request: Request, productId: int = Path(..., gt=0), last_event_id: str = Header(None),
+    lastEventId: int = Query(None, ge=0)
+):
+    stream = event_stream(request, broker, productId, _resume_from(last_event_id, lastEventId))
+    # X-Accel-Buffering stops nginx from holding events back.
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
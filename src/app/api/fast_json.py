@@ -0,0 +1,37 @@
+import json
+from datetime import datetime
+
+from starlette.responses import JSONResponse
+
+from app.config import env_flag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Opt-in: list endpoints read column-projected rows and encode them without building a response model per row.
+FAST_JSON = env_flag("FAST_JSON")
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    # Both backends produce the bytes JSONResponse renders after jsonable_encoder: compact, UTF-8, isoformat datetimes.
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def rows_to_dicts(rows, fields: list) -> list:
+    """Rows must be projected onto `fields` first (extra trailing columns are dropped); keys keep the model's field order."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
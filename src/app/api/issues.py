@@ -1,24 +1,241 @@
+import queue
+from datetime import datetime
 from typing import List
 from fastapi import APIRouter
 from sqlalchemy.orm import Session
-from app.db.db_factory import SessionLocal, get_db
-from fastapi import APIRouter, Depends, HTTPException, Path
-from app.db import issue_crud, product_crud
+from app.db.db_factory import SessionLocal, get_db, get_read_db
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Path, Query
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from app import ingest
+from app.db import changes_crud, ingest_crud, issue_crud, product_crud, stats_crud
 
-from app.api.models import IssueResponse, IssueSchema
+from app.api import transfer
+from app.api.etag import etag, if_match_version, not_modified
+from app.api.fast_json import FAST_JSON, FastJSONResponse, rows_to_dicts
+from app.api.models import BulkIssueUpdate, BulkItemResult, BulkResponse, ImportResponse, IngestTicketStatus, IssueChanges, IssueResponse, IssueSchema, ProductIssueStats
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, decode_keyset_cursor, encode_cursor, encode_keyset_cursor, next_page_link
+from app.api.cache_policy import NO_STORE, REVALIDATE, SHARED, cache_policy
+from app.limits import request_cost
 
 router = APIRouter()
+# Served on the SQLAlchemy engine in both database modes; DATABASE_ASYNC only swaps `router` for async_issues.
+shared_router = APIRouter()
+
+BULK_MAX_ITEMS = 10000
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MAX_ERRORS = 100
+ISSUE_FIELDS = list(IssueResponse.__fields__)
+SORT_PATTERN = "^-?(" + "|".join(issue_crud.SORT_COLUMNS) + ")$"
+
+def _missing(db: Session, productId: int, id: int, version: int):
+    if version is not None and issue_crud.get_by_id(db_session=db, productId=productId, id=id):
+        raise HTTPException(status_code=412, detail="precondition failed")
+    raise HTTPException(status_code=404, detail="issue not found")
+
+def _ndjson(issues):
+    for issue in issues:
+        yield IssueResponse.from_orm(issue).json() + "\n"
+
+def parse_fields(fields: str):
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(ISSUE_FIELDS)
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"unknown fields: {', '.join(sorted(unknown)) or fields}")
+    return [name for name in ISSUE_FIELDS if name in names or name == "id"]
+
+def parse_after_value(sort: str, value):
+    if value is None or sort.lstrip("-") == "id":
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
 
 @router.get("/{productId}/issues/", response_model=List[IssueResponse])
-def get_all_by_product(*, db: Session = Depends(get_db), productId: int = Path(..., gt=0)):
-   issues = issue_crud.get_all_by_product(db_session=db, productId=productId)
-   return issues
+@cache_policy(SHARED)
+@request_cost(2)
+def get_all_by_product(
+    *, db: Session = Depends(get_read_db), request: Request, response: Response, productId: int = Path(..., gt=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False,
+    status: str = None, assignedTo: str = None, createdBy: str = None, updatedAfter: datetime = None,
+    updatedBefore: datetime = None, sort: str = Query("id", regex=SORT_PATTERN), fields: str = None
+):
+    filters = {"status": status, "assignedTo": assignedTo, "createdBy": createdBy, "updatedAfter": updatedAfter, "updatedBefore": updatedBefore}
+    # Streams walk the whole product in id order with every field; refuse what they would silently ignore.
+    if stream and (sort != "id" or fields is not None):
+        raise HTTPException(status_code=400, detail="stream does not support sort or fields")
+    columns = parse_fields(fields) or (ISSUE_FIELDS if FAST_JSON and not stream else None)
+    after_value, after_id = decode_keyset_cursor(after, sort)
+    if stream:
+        issues = issue_crud.stream_by_product(db_session=db, productId=productId, after=after_id, filters=filters)
+        return StreamingResponse(_ndjson(issues), media_type="application/x-ndjson")
+
+    issues = issue_crud.get_all_by_product(
+        db_session=db, productId=productId, limit=limit + 1, after=after_id, after_value=parse_after_value(sort, after_value),
+        sort=sort, filters=filters, fields=columns
+    )
+    headers = {}
+    if len(issues) > limit:
+        issues = issues[:limit]
+        last = issues[-1]
+        headers["Link"] = next_page_link(request, encode_keyset_cursor(sort, getattr(last, sort.lstrip("-")), last.id))
+    if columns:
+        # Projected rows skip IssueResponse validation entirely; only the requested columns were read.
+        return FastJSONResponse(rows_to_dicts(issues, columns), headers=headers)
+    response.headers.update(headers)
+    return issues
+
+def _check_batch_size(items: list):
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"too many items in batch, maximum is {BULK_MAX_ITEMS}")
+
+def _validate_items(items: List[dict], schema, productId: int):
+    valid, failed = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema(**dict(item, productId=productId))))
+        except ValidationError as e:
+            failed.append(BulkItemResult(index=index, status=422, errors=e.errors()))
+    return valid, failed
+
+def _bulk_response(results: List[BulkItemResult]):
+    results.sort(key=lambda result: result.index)
+    succeeded = sum(1 for result in results if result.status < 400)
+    return BulkResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+@shared_router.post("/{productId}/issues/bulk", response_model=BulkResponse)
+@request_cost(10)
+def bulk_create_issues(*, db: Session = Depends(get_db), productId: int = Path(..., gt=0), payload: List[dict] = Body(...)):
+    _check_batch_size(payload)
+    product = product_crud.get(db, productId)
+    if not product:
+        raise HTTPException(status_code=404, detail="product not found! Must create product first")
+
+    valid, results = _validate_items(payload, IssueSchema, productId)
+    ids = issue_crud.bulk_post(db_session=db, payloads=[issue for _, issue in valid]) if valid else []
+    results += [BulkItemResult(index=index, id=id, status=201) for (index, _), id in zip(valid, ids)]
+    return _bulk_response(results)
+
+@shared_router.patch("/{productId}/issues/bulk", response_model=BulkResponse)
+@request_cost(10)
+def bulk_update_issues(*, db: Session = Depends(get_db), productId: int = Path(..., gt=0), payload: List[dict] = Body(...)):
+    _check_batch_size(payload)
+    valid, results = _validate_items(payload, BulkIssueUpdate, productId)
+    updated = issue_crud.bulk_put(db_session=db, productId=productId, payloads=[issue for _, issue in valid]) if valid else set()
+    for index, issue in valid:
+        if issue.id in updated:
+            results.append(BulkItemResult(index=index, id=issue.id, status=200))
+        else:
+            results.append(BulkItemResult(index=index, id=issue.id, status=404, errors="issue not found"))
+    return _bulk_response(results)
+
+@shared_router.delete("/{productId}/issues/bulk", response_model=BulkResponse)
+@request_cost(10)
+def bulk_delete_issues(*, db: Session = Depends(get_db), productId: int = Path(..., gt=0), ids: List[int] = Body(...)):
+    _check_batch_size(ids)
+    deleted = issue_crud.bulk_delete(db_session=db, productId=productId, ids=ids) if ids else set()
+    results = [
+        BulkItemResult(index=index, id=id, status=200) if id in deleted
+        else BulkItemResult(index=index, id=id, status=404, errors="issue not found")
+        for index, id in enumerate(ids)
+    ]
+    return _bulk_response(results)
+
+@shared_router.get("/{productId}/issues/stats", response_model=ProductIssueStats)
+@cache_policy(SHARED)
+@request_cost(5)
+def get_stats(*, db: Session = Depends(get_read_db), productId: int = Path(..., gt=0)):
+    if not product_crud.get(db, productId):
+        raise HTTPException(status_code=404, detail="product not found")
+    return stats_crud.product_stats(db_session=db, productId=productId)
+
+@shared_router.get("/{productId}/issues/changes", response_model=IssueChanges)
+@cache_policy(NO_STORE)
+def get_changes(
+    *, db: Session = Depends(get_read_db), productId: int = Path(..., gt=0), since: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE)
+):
+    since_seq, since_id = None, 0
+    if since is not None:
+        value = decode_cursor(since)
+        since_seq, since_id = value.get("seq"), value.get("id")
+        if not isinstance(since_seq, int) or not isinstance(since_id, int):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+    if not product_crud.get(db, productId):
+        raise HTTPException(status_code=404, detail="product not found")
+    changed, deleted, (seq, id), more = changes_crud.changes(
+        db_session=db, productId=productId, limit=limit, since_seq=since_seq, since_id=since_id
+    )
+    # An empty full sync starts the client at the beginning, so nothing written later is missed.
+    return {"changed": changed, "deleted": deleted, "next": encode_cursor({"seq": seq or 0, "id": id}), "more": more}
+
+@shared_router.get("/{productId}/issues/export")
+@cache_policy(NO_STORE)
+@request_cost(20)
+def export_issues(
+    *, db: Session = Depends(get_read_db), productId: int = Path(..., gt=0), format: str = Query("ndjson", regex="^(csv|ndjson)$")
+):
+    if not product_crud.get(db, productId):
+        raise HTTPException(status_code=404, detail="product not found")
+    batches = issue_crud.export_batches(db_session=db, productId=productId, fields=ISSUE_FIELDS)
+    chunks = transfer.csv_chunks(batches, ISSUE_FIELDS) if format == "csv" else transfer.ndjson_chunks(batches, ISSUE_FIELDS)
+    headers = {"Content-Disposition": f'attachment; filename="issues-{productId}.{format}"'}
+    return StreamingResponse(chunks, media_type=transfer.MEDIA_TYPES[format], headers=headers)
+
+def _import_batch(db: Session, productId: int, records: list):
+    valid, failed = [], []
+    for number, record in records:
+        if record is None:
+            failed.append(BulkItemResult(index=number, status=422, errors="malformed row"))
+            continue
+        try:
+            valid.append(IssueSchema(**dict(record, productId=productId)))
+        except ValidationError as e:
+            failed.append(BulkItemResult(index=number, status=422, errors=e.errors()))
+    return (issue_crud.load(db_session=db, productId=productId, payloads=valid) if valid else 0), failed
+
+@shared_router.post("/{productId}/issues/import", response_model=ImportResponse)
+@request_cost(20)
+async def import_issues(
+    *, db: Session = Depends(get_db), request: Request, productId: int = Path(..., gt=0),
+    format: str = Query("ndjson", regex="^(csv|ndjson)$")
+):
+    if not await run_in_threadpool(product_crud.get, db, productId):
+        raise HTTPException(status_code=404, detail="product not found! Must create product first")
+    # Exported files load back as they are: their id and createdDate columns are accepted and ignored.
+    chunks = request.stream()
+    records = transfer.csv_records(chunks, ISSUE_FIELDS) if format == "csv" else transfer.ndjson_records(chunks)
+    imported, failed, errors, batch = 0, 0, [], []
+    async for record in records:
+        batch.append(record)
+        if len(batch) < IMPORT_BATCH_SIZE:
+            continue
+        # Validation and the insert run off the event loop, one batch at a time, so memory stays bounded.
+        loaded, failures = await run_in_threadpool(_import_batch, db, productId, batch)
+        imported, failed, errors, batch = imported + loaded, failed + len(failures), (errors + failures)[:IMPORT_MAX_ERRORS], []
+    if batch:
+        loaded, failures = await run_in_threadpool(_import_batch, db, productId, batch)
+        imported, failed, errors = imported + loaded, failed + len(failures), errors + failures
+    return ImportResponse(imported=imported, failed=failed, errors=errors[:IMPORT_MAX_ERRORS])
 
 @router.get("/{productId}/issues/{id}/")
-def get(*, db: Session = Depends(get_db), productId: int = Path(..., gt=0), id: int = Path(..., gt=0)):
+@cache_policy(REVALIDATE)
+def get(
+    *, db: Session = Depends(get_read_db), response: Response, productId: int = Path(..., gt=0), id: int = Path(..., gt=0),
+    if_none_match: str = Header(None)
+):
     issue = issue_crud.get_by_id(db_session=db, productId=productId, id=id)
     if not issue:
         raise HTTPException(status_code=404, detail="issue not found")
+    unchanged = not_modified(if_none_match, issue)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag(issue)
     return issue
 
 @router.post("/{productId}/issues/", response_model=IssueResponse, status_code=201)
@@ -28,30 +245,48 @@ def create_issue(*, db: Session = Depends(get_db), productId: int = Path(..., gt
     if not product:
         raise HTTPException(status_code=404, detail="product not found! Must create product first")
 
+    if ingest.INGEST_BATCHING:
+        try:
+            ticket = ingest.ingest_queue.submit(payload)
+        except queue.Full:
+            raise HTTPException(status_code=503, detail="ingest queue is full", headers={"Retry-After": "1"})
+        content = {"ticket": ticket, "status": "queued", "id": None}
+        return JSONResponse(content, status_code=202, headers={"Location": f"/products/{productId}/issues/tickets/{ticket}"})
+
     issue = issue_crud.post(db_session=db, payload=payload)
     return issue
 
+@shared_router.get("/{productId}/issues/tickets/{ticket}", response_model=IngestTicketStatus)
+@cache_policy(NO_STORE)
+def get_ticket(*, db: Session = Depends(get_db), productId: int = Path(..., gt=0), ticket: str):
+    status = ingest.ingest_queue.status(ticket, productId)
+    if status is not None:
+        return {"ticket": ticket, "status": status, "id": None}
+    row = ingest_crud.resolve(db_session=db, ticket=ticket, productId=productId)
+    if row is None:
+        # Also what a ticket queued on another worker reads until its batch commits.
+        raise HTTPException(status_code=404, detail="unknown ticket")
+    return {"ticket": ticket, "status": row.status, "id": row.issueId}
+
 @router.put("/{productId}/issues/{id}/", response_model=IssueResponse)
 def update_issue(
-    *, db: Session = Depends(get_db), productId: int = Path(..., gt=0), id: int = Path(..., gt=0), payload: IssueSchema
+    *, db: Session = Depends(get_db), response: Response, productId: int = Path(..., gt=0), id: int = Path(..., gt=0),
+    payload: IssueSchema, if_match: str = Header(None)
 ):
-    issue = issue_crud.get_by_id(db_session=db, productId=productId, id=id)
+    version = if_match_version(if_match)
+    issue = issue_crud.put(db_session=db, productId=productId, id=id, payload=payload, version=version)
     if not issue:
-        raise HTTPException(status_code=404, detail="issue not found")
-    
-    issue = issue_crud.put(
-        db_session=db, issue=issue, title=payload.title, description=payload.description,
-        productId=payload.productId, createdBy=payload.createdBy, updatedBy=payload.updatedBy, 
-        updatedDate=payload.updatedDate, assignedTo=payload.assignedTo, status=payload.status
-    )
+        _missing(db, productId, id, version)
+    response.headers["ETag"] = etag(issue)
     return issue
 
 @router.delete("/{productId}/issues/{id}/", response_model=IssueResponse)
 def delete_issue(
     *, db: Session = Depends(get_db), productId: int = Path(..., gt=0), id: int = Path(..., gt=0),
+    if_match: str = Header(None)
 ):
-    issue = issue_crud.get_by_id(db_session=db, productId=productId, id=id)
+    version = if_match_version(if_match)
+    issue = issue_crud.delete(db_session=db, productId=productId, id=id, version=version)
     if not issue:
-        raise HTTPException(status_code=404, detail="issue not found")
-    issue = issue_crud.delete(db_session=db, productId=productId, id=id)
+        _missing(db, productId, id, version)
     return issue
@@ -1,7 +1,8 @@
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 from sqlalchemy.sql import func
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.db.db_factory import Base
@@ -11,7 +12,8 @@ from app.db.db_factory import Base
 class Product(Base):
 
     __tablename__ = "products"
-    issues = relationship("Issue", cascade="all, delete-orphan")
+    # The database deletes the issues (ON DELETE CASCADE), so the ORM never loads them to delete one by one.
+    issues = relationship("Issue", cascade="all, delete-orphan", passive_deletes=True)
 
     id = Column(Integer, primary_key=True)
     title = Column(String(50))
@@ -21,42 +23,107 @@ class Product(Base):
     updatedDate = Column(DateTime, default=func.now(), nullable=False)
     createdBy = Column(String(100))
     updatedBy = Column(String(100))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Bumped by every issue write in this product; see app.db.changes_crud.
+    changeSeq = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __mapper_args__ = {"version_id_col": version}
 
     def __init__(self, title, description, productOwner, createdBy, updatedBy, updatedDate):
         self.title = title
         self.description = description
         self.productOwner = productOwner
         self.createdBy = createdBy
-        self.updatedBy = updatedBy,
+        self.updatedBy = updatedBy
         self.updatedDate = updatedDate
 
 
 class Issue(Base):
 
     __tablename__ = "issues"
+    __table_args__ = (
+        Index("ix_issues_productId_id", "productId", "id"),
+        Index("ix_issues_productId_status_updatedDate", "productId", "status", "updatedDate"),
+        Index("ix_issues_productId_assignedTo", "productId", "assignedTo"),
+        Index("ix_issues_productId_changeSeq", "productId", "changeSeq"),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String(50))
     description = Column(String(50))
-    productId = Column(Integer, ForeignKey('products.id'))
+    productId = Column(Integer, ForeignKey('products.id', ondelete="CASCADE"))
     createdDate = Column(DateTime, default=func.now(), nullable=False)
     updatedDate = Column(DateTime, default=func.now(), nullable=False)
     createdBy = Column(String(100))
     updatedBy = Column(String(100))
     assignedTo = Column(String(100))
     status = Column(String(10))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    changeSeq = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __mapper_args__ = {"version_id_col": version}
 
     def __init__(self, title, description, productId, createdBy, updatedBy, updatedDate, assignedTo, status):
         self.title = title
         self.description = description
         self.productId = productId
         self.createdBy = createdBy
-        self.updatedBy = updatedBy,
+        self.updatedBy = updatedBy
         self.updatedDate = updatedDate
         self.assignedTo = assignedTo
         self.status = status
 
 
+# Per-day issue counts, maintained by issue_crud when ISSUE_STATS_SUMMARY is on.
+class IssueSummary(Base):
+
+    __tablename__ = "issue_summary"
+
+    productId = Column(Integer, primary_key=True)
+    status = Column(String(10), primary_key=True)
+    assignedTo = Column(String(100), primary_key=True)
+    createdDay = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Left behind by deleted (or moved) issues so delta sync can report them.
+class IssueTombstone(Base):
+
+    __tablename__ = "issue_tombstones"
+    __table_args__ = (Index("ix_issue_tombstones_productId_changeSeq", "productId", "changeSeq"),)
+
+    productId = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    id = Column(Integer, primary_key=True)
+    changeSeq = Column(Integer, nullable=False)
+
+
+# What became of a queued issue: its ticket maps to the created issue or records that it failed; see app.ingest.
+class IngestTicket(Base):
+
+    __tablename__ = "issue_ingest_tickets"
+    __table_args__ = (Index("ix_issue_ingest_tickets_createdDate", "createdDate"),)
+
+    ticket = Column(String(32), primary_key=True)
+    productId = Column(Integer, nullable=False)
+    # "created" with the issue's id, or "failed" with none.
+    status = Column(String(10), nullable=False)
+    issueId = Column(Integer)
+    createdDate = Column(DateTime, nullable=False)
+
+
+# Progress of a background product delete; see product_crud.purge.
+class ProductPurge(Base):
+
+    __tablename__ = "product_purges"
+
+    productId = Column(Integer, primary_key=True)
+    status = Column(String(10), nullable=False)
+    total = Column(Integer, nullable=False)
+    deleted = Column(Integer, nullable=False)
+    startedDate = Column(DateTime, default=func.now(), nullable=False)
+    updatedDate = Column(DateTime, default=func.now(), nullable=False)
+
+
 # Pydantic Model
 class ProductSchema(BaseModel):
     title: str = Field(..., min_length=3, max_length=50)
@@ -91,3 +158,71 @@ class IssueResponse(IssueSchema):
 
     class Config:
         orm_mode = True
+
+# Not `issues`, which would make from_orm lazy-load the relationship.
+class ProductDetail(ProductResponse):
+    issueCount: int = None
+    latestIssues: List[IssueResponse] = None
+
+class IssueSearchResult(IssueResponse):
+    rank: float
+
+class ProductPurgeStatus(BaseModel):
+    productId: int
+    status: str
+    total: int
+    deleted: int
+    startedDate: datetime
+    updatedDate: datetime
+
+    class Config:
+        orm_mode = True
+
+class IngestTicketStatus(BaseModel):
+    ticket: str
+    status: str
+    id: Optional[int]
+
+class IssueChanges(BaseModel):
+    changed: List[IssueResponse]
+    deleted: List[int]
+    next: str
+    more: bool
+
+class BulkIssueUpdate(IssueSchema):
+    id: int = Field(..., gt=0)
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int]
+    status: int
+    errors: Optional[Any]
+
+class ImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[BulkItemResult]
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+class IssueCounts(BaseModel):
+    total: int
+    open: int
+    closed: int
+    byStatus: Dict[str, int]
+
+class IssueStats(IssueCounts):
+    byAssignee: Dict[str, int]
+    age: Dict[str, Dict[str, int]]
+
+class ProductIssueCounts(IssueCounts):
+    productId: int
+
+class ProductIssueStats(IssueStats):
+    productId: int
+
+class AllIssueStats(IssueStats):
+    products: List[ProductIssueCounts]
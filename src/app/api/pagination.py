@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(value: dict) -> str:
+    raw = json.dumps(value, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not isinstance(value, dict):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return value
+
+
+def decode_id_cursor(cursor: str):
+    if cursor is None:
+        return None
+    after_id = decode_cursor(cursor).get("id")
+    if not isinstance(after_id, int):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return after_id
+
+
+def decode_keyset_cursor(cursor: str, sort: str):
+    if sort.lstrip("-") == "id":
+        return None, decode_id_cursor(cursor)
+    if cursor is None:
+        return None, None
+    value = decode_cursor(cursor)
+    if value.get("sort") != sort or not isinstance(value.get("id"), int) or "value" not in value:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return value["value"], value["id"]
+
+
+def encode_keyset_cursor(sort: str, value, id: int) -> str:
+    if sort.lstrip("-") == "id":
+        return encode_cursor({"id": id})
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return encode_cursor({"sort": sort, "value": value, "id": id})
+
+
+def next_page_link(request: Request, cursor: str) -> str:
+    url = request.url.include_query_params(after=cursor)
+    return f'<{url}>; rel="next"'
@@ -1,56 +1,155 @@
 from typing import List
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Path, Query
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
 
-from app.db.db_factory import SessionLocal, get_db
-from app.db import product_crud
-from app.api.models import ProductResponse, ProductSchema
+from app.db.db_factory import SessionLocal, get_db, get_read_db
+from app.db import issue_crud, product_crud, stats_crud
+from app.api.etag import etag, if_match_version, not_modified
+from app.api.fast_json import FAST_JSON, FastJSONResponse, rows_to_dicts
+from app.api.models import AllIssueStats, IssueResponse, ProductDetail, ProductPurgeStatus, ProductResponse, ProductSchema
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_id_cursor, encode_cursor, next_page_link
+from app.api.cache_policy import NO_STORE, REVALIDATE, SHARED, cache_policy
+from app.limits import request_cost
 
 
 router = APIRouter()
+# Served on the SQLAlchemy engine in both database modes; DATABASE_ASYNC only swaps `router` for async_products.
+shared_router = APIRouter()
+
+PRODUCT_FIELDS = list(ProductResponse.__fields__)
+ISSUE_FIELDS = list(IssueResponse.__fields__)
+INCLUDES = ("issues", "issue_counts")
+MAX_ISSUE_LIMIT = 100
+
+def _missing(db: Session, id: int, version: int):
+    if version is not None and product_crud.get(db_session=db, id=id):
+        raise HTTPException(status_code=412, detail="precondition failed")
+    raise HTTPException(status_code=404, detail="product not found")
+
+def parse_include(include: str) -> set:
+    if include is None:
+        return set()
+    names = {name.strip() for name in include.split(",") if name.strip()}
+    unknown = names - set(INCLUDES)
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"unknown include: {', '.join(sorted(unknown)) or include}")
+    return names
+
+def _embed(db: Session, products: list, includes: set, issue_limit: int):
+    # One query per include for the whole page, however many products it holds.
+    ids = [product["id"] for product in products]
+    if "issue_counts" in includes:
+        counts = issue_crud.count_by_product(db_session=db, productIds=ids)
+        for product in products:
+            product["issueCount"] = counts.get(product["id"], 0)
+    if "issues" in includes:
+        latest = issue_crud.latest_by_product(db_session=db, productIds=ids, per_product=issue_limit, fields=ISSUE_FIELDS)
+        for product in products:
+            product["latestIssues"] = rows_to_dicts(latest.get(product["id"], []), ISSUE_FIELDS)
+    return products
 
 @router.post("/", response_model=ProductResponse, status_code=201)
 def create_product(*, db: Session = Depends(get_db), payload: ProductSchema):
     product = product_crud.post(db_session=db, payload=payload)
     return product
 
-@router.get("/{id}/", response_model=ProductResponse)
+@shared_router.get("/stats", response_model=AllIssueStats)
+@cache_policy(SHARED)
+@request_cost(5)
+def read_issue_stats(db: Session = Depends(get_read_db)):
+    return stats_crud.all_stats(db_session=db)
+
+
+@router.get("/{id}/", response_model=ProductDetail, response_model_exclude_unset=True)
+@cache_policy(REVALIDATE)
 def read_product(
-    *, db: Session = Depends(get_db), id: int = Path(..., gt=0),
+    *, db: Session = Depends(get_read_db), response: Response, id: int = Path(..., gt=0), if_none_match: str = Header(None),
+    include: str = None, issueLimit: int = Query(5, gt=0, le=MAX_ISSUE_LIMIT)
 ):
+    includes = parse_include(include)
     product = product_crud.get(db_session=db, id=id)
     if not product:
         raise HTTPException(status_code=404, detail="product not found")
+    if includes:
+        # The product's version does not change with its issues, so embedded responses carry no ETag.
+        return _embed(db, [{name: getattr(product, name) for name in PRODUCT_FIELDS}], includes, issueLimit)[0]
+    unchanged = not_modified(if_none_match, product)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag(product)
     return product
 
 
-@router.get("/", response_model=List[ProductResponse])
-def read_all_products(db: Session = Depends(get_db)):
-    return product_crud.get_all(db_session=db)
+@router.get("/", response_model=List[ProductDetail], response_model_exclude_unset=True)
+@cache_policy(SHARED)
+@request_cost(2)
+def read_all_products(
+    *, db: Session = Depends(get_read_db), request: Request, response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE), after: str = None, include: str = None,
+    issueLimit: int = Query(5, gt=0, le=MAX_ISSUE_LIMIT)
+):
+    includes = parse_include(include)
+    fields = PRODUCT_FIELDS if FAST_JSON or includes else None
+    products = product_crud.get_all(db_session=db, fields=fields, limit=limit + 1, after=decode_id_cursor(after))
+    headers = {}
+    if len(products) > limit:
+        products = products[:limit]
+        headers["Link"] = next_page_link(request, encode_cursor({"id": products[-1].id}))
+    if fields:
+        products = _embed(db, rows_to_dicts(products, fields), includes, issueLimit)
+        if FAST_JSON:
+            return FastJSONResponse(products, headers=headers)
+    response.headers.update(headers)
+    return products
 
 
 @router.put("/{id}/", response_model=ProductResponse)
 def update_product(
-    *, db: Session = Depends(get_db), id: int = Path(..., gt=0), payload: ProductSchema
+    *, db: Session = Depends(get_db), response: Response, id: int = Path(..., gt=0), payload: ProductSchema,
+    if_match: str = Header(None),
 ):
-    product = product_crud.get(db_session=db, id=id)
+    version = if_match_version(if_match)
+    product = product_crud.put(db_session=db, id=id, payload=payload, version=version)
     if not product:
-        raise HTTPException(status_code=404, detail="product not found")
-
-    product = product_crud.put(
-        db_session=db, product=product, title=payload.title, description=payload.description,
-        productOwner=payload.productOwner, createdBy=payload.createdBy, updatedBy=payload.updatedBy, 
-        updatedDate=payload.updatedDate
-    )
+        _missing(db, id, version)
+    response.headers["ETag"] = etag(product)
     return product
 
 
 @router.delete("/{id}/", response_model=ProductResponse)
 def delete_product(
-    *, db: Session = Depends(get_db), id: int = Path(..., gt=0),
+    *, db: Session = Depends(get_db), background_tasks: BackgroundTasks, id: int = Path(..., gt=0),
+    if_match: str = Header(None), background: bool = False
 ):
+    version = if_match_version(if_match)
+    if background:
+        return start_purge(db, background_tasks, id, version)
+    product = product_crud.delete(db_session=db, id=id, version=version)
+    if not product:
+        _missing(db, id, version)
+    return product
+
+
+def start_purge(db: Session, background_tasks: BackgroundTasks, id: int, version: int):
     product = product_crud.get(db_session=db, id=id)
     if not product:
         raise HTTPException(status_code=404, detail="product not found")
-    product = product_crud.delete(db_session=db, id=id)
-    return product
+    if version is not None and product.version != version:
+        raise HTTPException(status_code=412, detail="precondition failed")
+    purge, started = product_crud.start_purge(db_session=db, id=id)
+    if started:
+        background_tasks.add_task(product_crud.purge, db.get_bind(), id)
+    content = jsonable_encoder(ProductPurgeStatus.from_orm(purge))
+    return JSONResponse(content, status_code=202, headers={"Location": f"/products/{id}/purge"})
+
+
+@shared_router.get("/{id}/purge", response_model=ProductPurgeStatus)
+@cache_policy(NO_STORE)
+def read_purge(*, db: Session = Depends(get_db), id: int = Path(..., gt=0)):
+    purge = product_crud.get_purge(db_session=db, id=id)
+    if not purge:
+        raise HTTPException(status_code=404, detail="no purge for this product")
+    return purge
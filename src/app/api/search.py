@@ -0,0 +1,37 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+from app.db import search_crud
+from app.db.db_factory import get_read_db
+
+from app.api.models import IssueSearchResult
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, next_page_link
+from app.api.cache_policy import SHARED, cache_policy
+from app.limits import request_cost
+
+router = APIRouter()
+
+def _decode_offset(cursor: str) -> int:
+    if cursor is None:
+        return 0
+    offset = decode_cursor(cursor).get("offset")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return offset
+
+@router.get("/search", response_model=List[IssueSearchResult])
+@cache_policy(SHARED)
+@request_cost(3)
+def search_issues(
+    *, db: Session = Depends(get_read_db), request: Request, response: Response, q: str = Query(..., min_length=1),
+    productId: int = Query(None, gt=0), status: str = None, limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+    after: str = None
+):
+    offset = _decode_offset(after)
+    issues = search_crud.search(db_session=db, q=q, productId=productId, status=status, limit=limit + 1, offset=offset)
+    if len(issues) > limit:
+        issues = issues[:limit]
+        response.headers["Link"] = next_page_link(request, encode_cursor({"offset": offset + limit}))
+    return issues
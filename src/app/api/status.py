@@ -1,8 +1,55 @@
 from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.db.cache import cache
+from app.db.db_factory import get_engine, get_replicas
+from app.db.pool import pool_status
+from app.instrumentation import statements
+from app.metrics import registry
+from app.api.cache_policy import NO_STORE, cache_policy
+from app.limits import request_cost
 
 router = APIRouter()
 
 
 @router.get("/status/")
+@cache_policy(NO_STORE)
+@request_cost(0)
 async def status():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@router.get("/status/pool")
+@cache_policy(NO_STORE)
+@request_cost(0)
+async def pool():
+    return pool_status(get_engine().pool)
+
+
+@router.get("/status/replicas")
+@cache_policy(NO_STORE)
+@request_cost(0)
+async def replicas():
+    replica_set = get_replicas()
+    return {"replicas": replica_set.status() if replica_set is not None else []}
+
+
+@router.get("/status/cache")
+@cache_policy(NO_STORE)
+@request_cost(0)
+async def cache_status():
+    return cache.info()
+
+
+@router.get("/status/queries")
+@cache_policy(NO_STORE)
+@request_cost(0)
+async def queries():
+    return {"statements": statements.value}
+
+
+@router.get("/metrics", include_in_schema=False)
+@cache_policy(NO_STORE)
+@request_cost(0)
+async def metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
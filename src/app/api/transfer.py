@@ -0,0 +1,122 @@
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from app.api.fast_json import dumps
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# Longest CSV record, in characters, that may span lines; an unterminated quoted value is reported past this.
+CSV_MAX_RECORD_CHARS = 65536
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_chunks(batches, fields: list):
+    """Encodes batches of `fields` tuples as CSV with a header row, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in batches:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(batches, fields: list):
+    for rows in batches:
+        yield b"".join(dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+
+
+async def lines(chunks):
+    """Splits an async stream of UTF-8 bytes into lines without holding more than one line in memory."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _quote_open(line: str, quoted: bool) -> bool:
+    """Whether a quoted value is still open at the end of `line`, given whether one was open at its start.
+
+    Follows the csv module: only a quote at the start of a value opens one, and a quote inside an unquoted value is
+    a literal character.
+    """
+    if not quoted and '"' not in line:
+        return False
+    state = "quoted" if quoted else "start"
+    for char in line:
+        if char == ",":
+            state = state if state == "quoted" else "start"
+        elif char == '"':
+            state = {"start": "quoted", "quoted": "closed", "closed": "quoted"}.get(state, state)
+        elif state != "quoted":
+            state = "unquoted"
+    return state == "quoted"
+
+
+async def csv_records(chunks, allowed: list):
+    """Yields (row number, dict) for each CSV row after the header; empty cells become None.
+
+    A row whose quoted value is still open after CSV_MAX_RECORD_CHARS yields None in place of the dict.
+    """
+    header, parts, size, quoted, number = None, [], 0, False, 0
+    async for line in lines(chunks):
+        parts.append(line)
+        size += len(line) + 1
+        quoted = _quote_open(line, quoted)
+        if quoted and size <= CSV_MAX_RECORD_CHARS:
+            continue
+        record = "\n".join(parts) if not quoted else None
+        parts, size, quoted = [], 0, False
+        if record is None:
+            if header is None:
+                raise HTTPException(status_code=400, detail="malformed header")
+            number += 1
+            yield number, None
+            continue
+        if not record.strip():
+            continue
+        values = next(csv.reader([record.rstrip("\r")]))
+        if header is None:
+            unknown = set(values) - set(allowed)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"unknown columns: {', '.join(sorted(unknown))}")
+            header = values
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, None
+            continue
+        yield number, {name: value if value != "" else None for name, value in zip(header, values)}
+    if parts and header is not None:
+        # The stream ended inside a quoted value.
+        yield number + 1, None
+
+
+async def ndjson_records(chunks):
+    """Yields (row number, dict) for each non-empty line, or None in place of the dict when it is not a JSON object."""
+    number = 0
+    async for line in lines(chunks):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            value = json.loads(line)
+        except ValueError:
+            value = None
+        yield number, value if isinstance(value, dict) else None
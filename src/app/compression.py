@@ -0,0 +1,175 @@
+import os
+import zlib
+
+from app.config import env_flag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION = env_flag("COMPRESSION", "true")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+LEVELS = {
+    "zstd": int(os.getenv("ZSTD_LEVEL", "3")),
+    "br": int(os.getenv("BROTLI_QUALITY", "4")),
+    "gzip": int(os.getenv("GZIP_LEVEL", "6")),
+}
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# In order of preference when the client accepts several equally.
+COMPRESSORS = {"zstd": ZstdCompressor, "br": BrotliCompressor, "gzip": GzipCompressor}
+
+
+def available_encodings() -> list:
+    modules = {"zstd": zstandard, "br": brotli, "gzip": zlib}
+    return [name for name in COMPRESSORS if modules[name] is not None]
+
+
+def choose_encoding(accept_encoding: str, encodings: list):
+    """The best of `encodings` by the client's q-values, or None when it accepts none of them."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in encodings:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = None) -> bytes:
+    compressor = COMPRESSORS[encoding](LEVELS[encoding] if level is None else level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compresses JSON, NDJSON and text responses of at least `minimum_size` bytes for clients that accept it.
+
+    Small bodies go out as they are. Streamed bodies are buffered only until they reach `minimum_size` and are then
+    compressed chunk by chunk. Event streams are never compressed, since that would hold events back in the buffer.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, encodings: list = None, levels: dict = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings() if encodings is None else encodings
+        self.levels = dict(LEVELS, **(levels or {}))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+        await self.app(scope, receive, CompressedResponder(self, choose_encoding(accept, self.encodings), send).send)
+
+
+class CompressedResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start = None
+        self.buffer = []
+        self.buffered = 0
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            headers = dict(message.get("headers", []))
+            content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+            if content_type not in COMPRESSIBLE_TYPES or b"content-encoding" in headers:
+                self.passthrough = True
+                await self._send(message)
+                return
+            headers = [(name, value) for name, value in message.get("headers", [])]
+            headers.append((b"vary", b"Accept-Encoding"))
+            self.start = dict(message, headers=headers)
+            if self.encoding is None:
+                self.passthrough = True
+                await self._send(self.start)
+            return
+
+        if self.passthrough or message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body, more = message.get("body", b""), message.get("more_body", False)
+        if self.compressor is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if self.buffered < self.middleware.minimum_size:
+                if more:
+                    return
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": b"".join(self.buffer)})
+                return
+            self.compressor = COMPRESSORS[self.encoding](self.middleware.levels[self.encoding])
+            body, self.buffer = b"".join(self.buffer), []
+            headers = [(name, value) for name, value in self.start["headers"] if name != b"content-length"]
+            headers.append((b"content-encoding", self.encoding.encode()))
+            if not more:
+                data = self.compressor.compress(body) + self.compressor.finish()
+                headers.append((b"content-length", str(len(data)).encode()))
+                await self._send(dict(self.start, headers=headers))
+                await self._send({"type": "http.response.body", "body": data})
+                return
+            await self._send(dict(self.start, headers=headers))
+
+        data = self.compressor.compress(body)
+        if not more:
+            data += self.compressor.finish()
+        if data or not more:
+            await self._send({"type": "http.response.body", "body": data, "more_body": more})
@@ -0,0 +1,120 @@
+from typing import List
+from sqlalchemy import and_, select
+
+from app.api.models import Issue, IssueSchema
+from app.db import changes_crud, issue_crud, search_crud, stats_crud
+from app.db.db_factory import get_database
+from app.events import broker
+
+issues = Issue.__table__
+
+
+async def get_all_by_product(
+    productId: int, limit: int, after: int = None, after_value=None, sort: str = "id", filters: dict = None,
+    fields: List[str] = None
+):
+    names = issue_crud.projection(sort, fields) if fields else [column.name for column in issues.c]
+    clauses, order = issue_crud.keyset(sort, after, after_value)
+    query = select([issues.c[name] for name in names]).where(and_(*issue_crud.conditions(productId, filters or {}), *clauses))
+    query = query.order_by(*order).limit(limit)
+    return [dict(row) for row in await get_database().fetch_all(query=query)]
+
+async def count_by_product(productIds: List[int]) -> dict:
+    if not productIds:
+        return {}
+    return {row["productId"]: row["count"] for row in await get_database().fetch_all(query=issue_crud.count_query(productIds))}
+
+async def latest_by_product(productIds: List[int], per_product: int, fields: List[str]) -> dict:
+    if not productIds:
+        return {}
+    latest = {}
+    for row in await get_database().fetch_all(query=issue_crud.latest_query(productIds, per_product, fields)):
+        latest.setdefault(row["productId"], []).append(dict(row))
+    return latest
+
+async def stream_by_product(productId: int, after: int = None, filters: dict = None):
+    query = issues.select().where(and_(*issue_crud.conditions(productId, filters or {})))
+    if after is not None:
+        query = query.where(issues.c.id > after)
+    async for row in get_database().iterate(query=query.order_by(issues.c.id)):
+        yield dict(row)
+
+async def post(payload: IssueSchema):
+    query = issues.insert().values(**payload.dict(), changeSeq=changes_crud.current(payload.productId)).returning(*issues.c)
+    async with get_database().transaction():
+        await changes_crud.bump_async(get_database(), payload.productId)
+        issue = _as_dict(await get_database().fetch_one(query=query))
+        await stats_crud.record_async(get_database(), added=[_summary_key(issue)])
+        events = [broker.event(issue["productId"], "created", issue["id"], issue)]
+        await _send(events)
+    broker.committed(events)
+    issue_crud.invalidate(issue["productId"])
+    search_crud.touch_async(get_database(), [issue["id"]])
+    return issue
+
+async def get_by_id(productId: int, id: int):
+    query = issues.select().where(issues.c.id == id).where(issues.c.productId == productId)
+    return _as_dict(await get_database().fetch_one(query=query))
+
+async def put(productId: int, id: int, payload: IssueSchema, version: int = None):
+    target = payload.productId
+    query = (
+        _matching(issues.update(), productId, id, version)
+        .values(**payload.dict(), version=issues.c.version + 1, changeSeq=changes_crud.current(target))
+        .returning(*issues.c)
+    )
+    async with get_database().transaction():
+        # Lock both products in id order so concurrent moves between the same pair cannot deadlock.
+        for changed in sorted({productId, target}):
+            await changes_crud.bump_async(get_database(), changed)
+        previous = await stats_crud.summary_rows_async(get_database(), productId, [id])
+        issue = _as_dict(await get_database().fetch_one(query=query))
+        events = []
+        if issue is not None:
+            await stats_crud.record_async(get_database(), added=[_summary_key(issue)], removed=previous)
+            if target != productId:
+                await changes_crud.bury_async(get_database(), productId, [id])
+                await changes_crud.revive_async(get_database(), target, id)
+                events.append(broker.event(productId, "deleted", id))
+            events.append(broker.event(target, "updated", id, issue))
+        await _send(events)
+    broker.committed(events)
+    if issue is not None:
+        issue_crud.invalidate(productId, ids=[id])
+        if target != productId:
+            issue_crud.invalidate(target)
+        search_crud.touch_async(get_database(), [id])
+    return issue
+
+async def delete(productId: int, id: int, version: int = None):
+    query = _matching(issues.delete(), productId, id, version).returning(*issues.c)
+    async with get_database().transaction():
+        await changes_crud.bump_async(get_database(), productId)
+        issue = _as_dict(await get_database().fetch_one(query=query))
+        events = []
+        if issue is not None:
+            await stats_crud.record_async(get_database(), removed=[_summary_key(issue)])
+            await changes_crud.bury_async(get_database(), productId, [id])
+            events.append(broker.event(productId, "deleted", id, issue))
+        await _send(events)
+    broker.committed(events)
+    if issue is not None:
+        issue_crud.invalidate(productId, ids=[id])
+        search_crud.touch_async(get_database(), [id])
+    return issue
+
+async def _send(events: list):
+    if events:
+        await broker.send_async(get_database(), events)
+
+def _matching(query, productId: int, id: int, version: int):
+    query = query.where(issues.c.id == id).where(issues.c.productId == productId)
+    if version is not None:
+        query = query.where(issues.c.version == version)
+    return query
+
+def _summary_key(issue: dict):
+    return stats_crud.summary_key(issue["productId"], issue["status"], issue["assignedTo"], issue["createdDate"])
+
+def _as_dict(row):
+    return dict(row) if row is not None else None
@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import select
+
+from app.api.models import Product, ProductSchema
+from app.db import product_crud, search_crud, stats_crud
+from app.db.db_factory import get_database
+
+products = Product.__table__
+
+
+async def post(payload: ProductSchema):
+    query = products.insert().values(**payload.dict()).returning(*products.c)
+    product = _as_dict(await get_database().fetch_one(query=query))
+    product_crud.invalidate(product["id"])
+    return product
+
+
+async def get(id: int):
+    query = products.select().where(products.c.id == id)
+    return _as_dict(await get_database().fetch_one(query=query))
+
+
+async def get_all(fields: List[str] = None, limit: int = None, after: int = None):
+    query = select([products.c[name] for name in fields]) if fields else products.select()
+    if after is not None:
+        query = query.where(products.c.id > after)
+    query = query.order_by(products.c.id).limit(limit)
+    return [dict(row) for row in await get_database().fetch_all(query=query)]
+
+
+async def put(id: int, title: str, description: str, productOwner: str, createdBy: str, updatedBy: str, updatedDate: datetime, version: int = None):
+    query = (
+        _matching(products.update(), id, version)
+        .values(
+            title=title, description=description, productOwner=productOwner, createdBy=createdBy, updatedBy=updatedBy,
+            updatedDate=updatedDate, version=products.c.version + 1
+        )
+        .returning(*products.c)
+    )
+    product = _as_dict(await get_database().fetch_one(query=query))
+    if product is not None:
+        product_crud.invalidate(id)
+    return product
+
+
+async def delete(id: int, version: int = None):
+    query = _matching(products.delete(), id, version).returning(*products.c)
+    # Postgres cascades the issues and tombstones; the summary rows go in the same transaction.
+    async with get_database().transaction():
+        product = _as_dict(await get_database().fetch_one(query=query))
+        if product is not None:
+            await stats_crud.forget_product_async(get_database(), id)
+    if product is not None:
+        product_crud.invalidate(id, issues=True)
+        search_crud.forget_product_async(get_database(), id)
+    return product
+
+
+def _matching(query, id: int, version: int):
+    query = query.where(products.c.id == id)
+    if version is not None:
+        query = query.where(products.c.version == version)
+    return query
+
+
+def _as_dict(row):
+    return dict(row) if row is not None else None
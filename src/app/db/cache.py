@@ -0,0 +1,287 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.util import KeyedTuple
+
+from app.db.db_factory import DATABASE_REPLICA_URLS, READ_YOUR_WRITES_SECONDS
+from app.metrics import registry
+
+MISSING = object()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int = 10000, ttl: float = 30.0, lag_window: float = 0.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lag_window = lag_window
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self._invalidated = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return MISSING
+            expires, value = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.stats.invalidations += 1
+            self._mark(key)
+
+    # Versions come from one counter and live outside the entry LRU. Dropping the oldest raises the floor every
+    # unrecorded name reads, so a name's version never goes back to one that stale entries were stored under.
+    def version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, self._floor)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._counter += 1
+            self._versions[namespace] = self._counter
+            self._versions.move_to_end(namespace)
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+                self._floor = self._counter
+            self.stats.invalidations += 1
+            self._mark(namespace)
+
+    # Replicas may still serve the old rows for `lag_window` seconds after a key or namespace is invalidated.
+    def _mark(self, name: str):
+        if not self.lag_window:
+            return
+        now = self._clock()
+        self._invalidated.pop(name, None)
+        self._invalidated[name] = now
+        while next(iter(self._invalidated.values())) <= now - self.lag_window:
+            self._invalidated.popitem(last=False)
+
+    def invalidated_recently(self, name: str) -> bool:
+        with self._lock:
+            invalidated = self._invalidated.get(name)
+            return invalidated is not None and invalidated > self._clock() - self.lag_window
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._floor = self._counter
+            self._invalidated.clear()
+
+    def info(self) -> dict:
+        return dict(self.stats.as_dict(), backend="memory", entries=len(self._entries), max_entries=self.max_entries, ttl=self.ttl)
+
+
+class RedisCache:
+    def __init__(self, url: str, ttl: float = 30.0, prefix: str = "issue-tracker:", lag_window: float = 0.0):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lag_window = lag_window
+        self.stats = CacheStats()
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            self.stats.misses += 1
+            return MISSING
+        self.stats.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key: str, value):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=max(int(self.ttl), 1))
+
+    def delete(self, key: str):
+        self.stats.invalidations += self._client.delete(self.prefix + key)
+        self._mark(key)
+
+    def version(self, namespace: str) -> int:
+        return int(self._client.get(f"{self.prefix}ns:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        # A version outlives every entry stored under an older one, so it can expire without resurrecting them.
+        with self._client.pipeline() as pipeline:
+            pipeline.incr(f"{self.prefix}ns:{namespace}")
+            pipeline.expire(f"{self.prefix}ns:{namespace}", max(int(self.ttl), 1) + 60)
+            pipeline.execute()
+        self.stats.invalidations += 1
+        self._mark(namespace)
+
+    # The marker expires by itself, and every worker sees it.
+    def _mark(self, name: str):
+        if self.lag_window:
+            self._client.set(f"{self.prefix}invalidated:{name}", 1, px=max(int(self.lag_window * 1000), 1))
+
+    def invalidated_recently(self, name: str) -> bool:
+        return bool(self.lag_window) and bool(self._client.exists(f"{self.prefix}invalidated:{name}"))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+    def info(self) -> dict:
+        return dict(self.stats.as_dict(), backend="redis", ttl=self.ttl)
+
+
+class NullCache:
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        return MISSING
+
+    def set(self, key: str, value):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def version(self, namespace: str) -> int:
+        return 0
+
+    def bump(self, namespace: str):
+        pass
+
+    def invalidated_recently(self, name: str) -> bool:
+        return False
+
+    def clear(self):
+        pass
+
+    def info(self) -> dict:
+        return {"backend": "none"}
+
+
+def build_cache():
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    ttl = float(os.getenv("CACHE_TTL", "30"))
+    lag_window = READ_YOUR_WRITES_SECONDS if DATABASE_REPLICA_URLS else 0.0
+    if backend == "none":
+        return NullCache()
+    if backend == "redis":
+        return RedisCache(os.getenv("CACHE_URL", "redis://localhost:6379/0"), ttl=ttl, lag_window=lag_window)
+    return MemoryCache(max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "10000")), ttl=ttl, lag_window=lag_window)
+
+
+cache = build_cache()
+
+
+def cache_metrics() -> list:
+    stats = cache.stats.as_dict()
+    return [(f"cache_{name}_total", "counter", f"Read-through cache {name}.", value) for name, value in stats.items()]
+
+
+registry.collector(cache_metrics)
+
+
+def snapshot(instance) -> dict:
+    return {attribute.key: getattr(instance, attribute.key) for attribute in instance.__mapper__.column_attrs}
+
+
+def restore(model, values: dict):
+    instance = model.__mapper__.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(instance, key, value)
+    make_transient_to_detached(instance)
+    return instance
+
+
+def versioned_key(key: str, namespace: str = None) -> str:
+    if namespace is None:
+        return key
+    return f"{namespace}:v{cache.version(namespace)}:{key}"
+
+
+def _row_key(key: str, namespace: str = None) -> str:
+    # Single rows are versioned like namespaces: a load that started before forget() fills a key no one reads again.
+    key = versioned_key(key, namespace)
+    return f"{key}:v{cache.version(key)}"
+
+
+def forget(key: str, namespace: str = None):
+    cache.bump(versioned_key(key, namespace))
+
+
+def _fillable(db_session, key: str, namespace: str = None) -> bool:
+    # A replica can still return the rows from before a recent invalidation; caching them would outlive the lag.
+    if not db_session.info.get("replica"):
+        return True
+    return not cache.invalidated_recently(key) and (namespace is None or not cache.invalidated_recently(namespace))
+
+
+def get_or_load(db_session, model, key: str, loader, namespace: str = None):
+    if db_session.info.get("bypass_cache"):
+        return loader()
+    key, name = _row_key(key, namespace), versioned_key(key, namespace)
+    values = cache.get(key)
+    if values is MISSING:
+        instance = loader()
+        if instance is not None and _fillable(db_session, name, namespace):
+            cache.set(key, snapshot(instance))
+        return instance
+    # merge(load=False) attaches the cached row to the session without a SELECT, so callers may still modify it.
+    return db_session.merge(restore(model, values), load=False)
+
+
+def list_or_load(db_session, model, namespace: str, params, loader):
+    if db_session.info.get("bypass_cache"):
+        return loader()
+    key = versioned_key(repr(params), namespace)
+    rows = cache.get(key)
+    if rows is MISSING:
+        result = loader()
+        if _fillable(db_session, key, namespace):
+            cache.set(key, [_row_values(row) for row in result])
+        return result
+    return [restore(model, values) if isinstance(values, dict) else KeyedTuple(*values) for values in rows]
+
+
+def _row_values(row):
+    if hasattr(row, "__mapper__"):
+        return snapshot(row)
+    return (tuple(row), row.keys())
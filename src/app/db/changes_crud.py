@@ -0,0 +1,90 @@
+from typing import List
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.api.models import Issue, IssueTombstone, Product
+
+products = Product.__table__
+issues = Issue.__table__
+tombstones = IssueTombstone.__table__
+
+
+def bump(db_session: Session, productId: int):
+    """Takes the product's next change number for the write in this transaction.
+
+    The UPDATE holds the product row lock until commit, so a product's changes commit in sequence order and a
+    client's watermark can never pass a change that is still in flight.
+    """
+    db_session.execute(_bump_query(productId))
+
+
+def current(productId: int):
+    """The number taken by bump(), for use as a column value in the same transaction."""
+    return select([products.c.changeSeq]).where(products.c.id == productId).as_scalar()
+
+
+def bury(db_session: Session, productId: int, ids: List[int]):
+    if ids:
+        db_session.execute(_bury_query(productId), [{"productId": productId, "id": id} for id in ids])
+
+
+def revive(db_session: Session, productId: int, id: int):
+    db_session.execute(_revive_query(productId, id))
+
+
+# The same hooks for the async database path; call them inside the write's transaction.
+async def bump_async(database, productId: int):
+    await database.execute(query=_bump_query(productId))
+
+
+async def bury_async(database, productId: int, ids: List[int]):
+    if ids:
+        await database.execute_many(query=_bury_query(productId), values=[{"productId": productId, "id": id} for id in ids])
+
+
+async def revive_async(database, productId: int, id: int):
+    await database.execute(query=_revive_query(productId, id))
+
+
+def _bump_query(productId: int):
+    return products.update().where(products.c.id == productId).values(changeSeq=products.c.changeSeq + 1)
+
+
+def _bury_query(productId: int):
+    return tombstones.insert().values(changeSeq=current(productId))
+
+
+def _revive_query(productId: int, id: int):
+    # An issue moved back into a product must not be reported as both changed and deleted.
+    return tombstones.delete().where(tombstones.c.productId == productId).where(tombstones.c.id == id)
+
+
+def forget_product(db_session: Session, productId: int):
+    db_session.execute(tombstones.delete().where(tombstones.c.productId == productId))
+
+
+def changes(db_session: Session, productId: int, limit: int, since_seq: int = None, since_id: int = 0):
+    """Issues changed and ids deleted after (since_seq, since_id), oldest first, as (changed, deleted, last, more).
+
+    Without a watermark this is a full sync, which needs no tombstones.
+    """
+    query = db_session.query(Issue).filter(Issue.productId == productId)
+    if since_seq is not None:
+        query = query.filter(tuple_(Issue.changeSeq, Issue.id) > tuple_(since_seq, since_id))
+    changed = query.order_by(Issue.changeSeq, Issue.id).limit(limit + 1).all()
+    entries = [(issue.changeSeq, issue.id, issue) for issue in changed]
+    if since_seq is not None:
+        query = (
+            db_session.query(IssueTombstone.changeSeq, IssueTombstone.id)
+            .filter(IssueTombstone.productId == productId)
+            .filter(tuple_(IssueTombstone.changeSeq, IssueTombstone.id) > tuple_(since_seq, since_id))
+        )
+        entries += [(row.changeSeq, row.id, None) for row in query.order_by(IssueTombstone.changeSeq, IssueTombstone.id).limit(limit + 1)]
+    entries.sort(key=lambda entry: entry[:2])
+    more = len(entries) > limit
+    entries = entries[:limit]
+    last = entries[-1][:2] if entries else (since_seq, since_id)
+    changed = [issue for _, _, issue in entries if issue is not None]
+    deleted = [id for _, id, issue in entries if issue is None]
+    return changed, deleted, last, more
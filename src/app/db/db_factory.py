@@ -1,21 +1,166 @@
 import os
+import threading
 
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
 
+from app.config import env_flag
+from app.db.pool import InstrumentedNullPool, InstrumentedQueuePool, pool_metrics, recent_wait
+from app.db.replicas import ReplicaSet, pinned_to_primary
+from app.instrumentation import instrument_engine
+from app.metrics import registry
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_ASYNC = env_flag("DATABASE_ASYNC")
+ISSUE_STATS_SUMMARY = env_flag("ISSUE_STATS_SUMMARY")
 
-engine = create_engine(DATABASE_URL)
+# Comma separated; routes that only read (get_read_db) spread over these, everything else uses DATABASE_URL.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# "queue" keeps a pool per worker; "external" defers pooling to pgbouncer or similar.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "true")
+
+
+def engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    # Batch mode lets psycopg2 send executemany() parameter sets in pages, not one round trip each.
+    options = {"executemany_mode": "batch"} if url.startswith("postgresql") else {}
+    if DB_POOL_MODE == "external":
+        return dict(options, poolclass=InstrumentedNullPool)
+    return dict(
+        options,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+def async_database_options() -> dict:
+    if DB_POOL_MODE == "external":
+        # Transaction-pooling proxies hand each statement a different backend, which
+        # breaks asyncpg's per-connection prepared statement cache.
+        return {"min_size": 1, "max_size": DB_POOL_SIZE, "statement_cache_size": 0}
+    return {"min_size": DB_POOL_SIZE, "max_size": DB_POOL_SIZE + DB_MAX_OVERFLOW}
+
+
+# Nothing connects, or even imports a database driver, until the first session or migration needs the engine.
+_engine = None
+_replicas = None
+_database = None
+_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+
+def _database_url() -> str:
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL is not set")
+    return DATABASE_URL
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                engine = create_engine(_database_url(), **engine_options(DATABASE_URL))
+                instrument_engine(engine)
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def get_replicas():
+    global _replicas
+    if _replicas is None and DATABASE_REPLICA_URLS:
+        with _lock:
+            if _replicas is None:
+                engines = [create_engine(url, **engine_options(url)) for url in DATABASE_REPLICA_URLS]
+                for engine in engines:
+                    instrument_engine(engine)
+                _replicas = ReplicaSet(engines, check_interval=REPLICA_CHECK_INTERVAL)
+    return _replicas
+
+
+def recent_pool_wait() -> float:
+    """The slowest recent checkout wait over the primary's pool and every replica's; the load shedder watches it."""
+    pools = [get_engine().pool]
+    replicas = get_replicas()
+    if replicas is not None:
+        pools += [replica.engine.pool for replica in replicas.replicas]
+    return max(recent_wait(pool) for pool in pools)
+
+
+def get_database():
+    global _database
+    if _database is None:
+        with _lock:
+            if _database is None:
+                from databases import Database
+                _database = Database(_database_url(), **async_database_options())
+    return _database
+
+
+def dispose_engine():
+    global _engine, _replicas
+    with _lock:
+        engine, _engine = _engine, None
+        replicas, _replicas = _replicas, None
+    if engine is not None:
+        engine.dispose()
+    if replicas is not None:
+        replicas.dispose()
+
+
+registry.collector(lambda: pool_metrics(_engine.pool) if _engine is not None else [])
+
 def get_db():
+    get_engine()
     try:
         db = SessionLocal()
         yield db
     finally:
         db.close()
+
+def get_read_db(request: Request):
+    """Session for routes that only read: a healthy replica, or the primary while the client's recent write may not have replicated yet."""
+    get_engine()
+    replicas = get_replicas()
+    if replicas is None:
+        yield from get_db()
+        return
+    pinned = pinned_to_primary(request.cookies)
+    engine = None if pinned else replicas.choose()
+    try:
+        db = SessionLocal() if engine is None else SessionLocal(bind=engine)
+        # A shared cache entry may have been filled from a lagging replica, so pinned reads go straight to the primary.
+        db.info["bypass_cache"] = pinned
+        db.info["replica"] = engine is not None
+        yield db
+    finally:
+        db.close()
+
+def supports_returning(db_session) -> bool:
+    return db_session.get_bind().dialect.name == "postgresql"
+
+def supports_cascade(db_session) -> bool:
+    # Migration 0007 adds ON DELETE CASCADE on Postgres only; SQLite cannot alter existing constraints.
+    return db_session.get_bind().dialect.name == "postgresql"
+
+def supports_copy(db_session) -> bool:
+    return db_session.get_bind().dialect.name == "postgresql"
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from app.api.models import IngestTicket
+
+tickets = IngestTicket.__table__
+
+
+def record(db_session: Session, ticket_ids: List[str], product_ids: List[int], issue_ids: List[int]):
+    now = datetime.utcnow()
+    rows = [
+        {"ticket": ticket, "productId": productId, "status": "created", "issueId": id, "createdDate": now}
+        for ticket, productId, id in zip(ticket_ids, product_ids, issue_ids)
+    ]
+    if rows:
+        db_session.execute(tickets.insert(), rows)
+
+
+def fail(db_session: Session, ticket_ids: List[str], product_ids: List[int]):
+    now = datetime.utcnow()
+    rows = [
+        {"ticket": ticket, "productId": productId, "status": "failed", "issueId": None, "createdDate": now}
+        for ticket, productId in zip(ticket_ids, product_ids)
+    ]
+    if rows:
+        db_session.execute(tickets.insert(), rows)
+
+
+def resolve(db_session: Session, ticket: str, productId: int):
+    """The ticket's (status, issueId) row, or None when the product has no such ticket."""
+    query = db_session.query(IngestTicket.status, IngestTicket.issueId)
+    return query.filter(IngestTicket.ticket == ticket, IngestTicket.productId == productId).first()
+
+
+def expire(db_session: Session, before: datetime):
+    db_session.execute(tickets.delete().where(tickets.c.createdDate < before))
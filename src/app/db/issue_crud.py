@@ -1,36 +1,288 @@
+import csv
+import io
+from typing import List
+from sqlalchemy import and_, bindparam, func, or_, select
 from sqlalchemy.orm import Session
-from datetime import datetime
 
-from app.api.models import Issue, IssueSchema
+from app.api.models import Issue, IssueSchema, BulkIssueUpdate
+from app.db.db_factory import supports_copy, supports_returning
+from app.db.cache import cache, forget, get_or_load, list_or_load
+from app.db.returning import delete_returning, insert_returning, update_returning
+from app.db import changes_crud, ingest_crud, search_crud, stats_crud
+from app.events import broker
 
-def get_all_by_product(db_session: Session, productId: int):
-    return db_session.query(Issue).filter(Issue.productId == productId).all()
+issues = Issue.__table__
+INSERT_CHUNK_SIZE = 1000
+
+def invalidate(productId: int, ids=()):
+    cache.bump(f"issues:{productId}")
+    for id in ids:
+        forget(f"issue:{id}", namespace=f"issue-rows:{productId}")
+
+def _summary_key(issue):
+    return stats_crud.summary_key(issue.productId, issue.status, issue.assignedTo, issue.createdDate)
+
+def _matching(productId: int, id: int, version: int = None):
+    condition = (issues.c.id == id) & (issues.c.productId == productId)
+    if version is not None:
+        condition &= issues.c.version == version
+    return condition
+
+SORT_COLUMNS = {"id": Issue.id, "createdDate": Issue.createdDate, "updatedDate": Issue.updatedDate}
+
+def conditions(productId: int, filters: dict) -> list:
+    """The WHERE clauses of a product's filtered issue listing; the async crud builds the same query from them."""
+    clauses = [Issue.productId == productId]
+    for name in ("status", "assignedTo", "createdBy"):
+        if filters.get(name) is not None:
+            clauses.append(getattr(Issue, name) == filters[name])
+    if filters.get("updatedAfter") is not None:
+        clauses.append(Issue.updatedDate >= filters["updatedAfter"])
+    if filters.get("updatedBefore") is not None:
+        clauses.append(Issue.updatedDate < filters["updatedBefore"])
+    return clauses
+
+def keyset(sort: str, after: int, after_value) -> tuple:
+    """The (clauses, order) that page a listing by `sort`, resuming after the row (after_value, after)."""
+    key = sort.lstrip("-")
+    column = SORT_COLUMNS[key]
+    descending = sort.startswith("-")
+    clauses = []
+    if after is not None:
+        if key == "id":
+            clauses.append(Issue.id < after if descending else Issue.id > after)
+        elif descending:
+            clauses.append(or_(column < after_value, and_(column == after_value, Issue.id < after)))
+        else:
+            clauses.append(or_(column > after_value, and_(column == after_value, Issue.id > after)))
+
+    order = [column.desc(), Issue.id.desc()] if descending else [column, Issue.id]
+    if key == "id":
+        order = order[:1]
+    return clauses, order
+
+def projection(sort: str, fields: List[str]) -> List[str]:
+    # Paging reads the id and sort key of the last row, so they are selected even when not requested.
+    key = sort.lstrip("-")
+    return list(fields) + [name for name in ("id", key) if name not in fields]
+
+def _filtered(query, productId: int, filters: dict):
+    return query.filter(*conditions(productId, filters))
+
+def get_all_by_product(
+    db_session: Session, productId: int, limit: int, after: int = None, after_value=None,
+    sort: str = "id", filters: dict = None, fields: List[str] = None
+):
+    params = (limit, after, after_value, sort, sorted((filters or {}).items()), fields)
+    return list_or_load(db_session, Issue, f"issues:{productId}", params, lambda: _query_by_product(
+        db_session, productId, limit, after, after_value, sort, filters, fields
+    ))
+
+def _query_by_product(db_session: Session, productId: int, limit: int, after, after_value, sort: str, filters: dict, fields: List[str]):
+    if fields:
+        query = db_session.query(*[getattr(Issue, name) for name in projection(sort, fields)])
+    else:
+        query = db_session.query(Issue)
+    clauses, order = keyset(sort, after, after_value)
+    query = _filtered(query, productId, filters or {}).filter(*clauses)
+    return query.order_by(*order).limit(limit).all()
+
+def count_query(productIds: List[int]):
+    return select([issues.c.productId, func.count(issues.c.id).label("count")]).where(
+        issues.c.productId.in_(productIds)
+    ).group_by(issues.c.productId)
+
+def count_by_product(db_session: Session, productIds: List[int]) -> dict:
+    if not productIds:
+        return {}
+    return {row.productId: row.count for row in db_session.execute(count_query(productIds))}
+
+def latest_query(productIds: List[int], per_product: int, fields: List[str]):
+    rank = func.row_number().over(partition_by=issues.c.productId, order_by=issues.c.id.desc()).label("rank")
+    ranked = select([issues.c[name] for name in fields] + [rank]).where(issues.c.productId.in_(productIds)).alias("ranked")
+    query = select([ranked.c[name] for name in fields]).where(ranked.c.rank <= per_product)
+    return query.order_by(ranked.c.productId, ranked.c.id.desc())
+
+def latest_by_product(db_session: Session, productIds: List[int], per_product: int, fields: List[str]) -> dict:
+    """The newest `per_product` issues of each product, projected onto `fields`, in one query for all of them."""
+    if not productIds:
+        return {}
+    latest = {}
+    for row in db_session.execute(latest_query(productIds, per_product, fields)):
+        latest.setdefault(row.productId, []).append(row)
+    return latest
+
+def stream_by_product(db_session: Session, productId: int, after: int = None, filters: dict = None, batch_size: int = 1000):
+    query = _filtered(db_session.query(Issue), productId, filters or {})
+    if after is not None:
+        query = query.filter(Issue.id > after)
+    query = query.order_by(Issue.id).execution_options(stream_results=True).yield_per(batch_size)
+    for issue in query:
+        yield issue
 
 def post(db_session: Session, payload: IssueSchema):
-    issue = Issue(title=payload.title, description=payload.description, productId=payload.productId, createdBy=payload.createdBy, updatedBy=payload.updatedBy, updatedDate=payload.updatedDate, assignedTo=payload.assignedTo, status=payload.status)
-    db_session.add(issue)
+    changes_crud.bump(db_session, payload.productId)
+    issue = insert_returning(db_session, issues, dict(payload.dict(), changeSeq=changes_crud.current(payload.productId)))
+    stats_crud.record(db_session, added=[_summary_key(issue)])
+    broker.stage(db_session, issue.productId, "created", issue.id, issue)
     db_session.commit()
-    db_session.refresh(issue)
+    invalidate(issue.productId)
+    search_crud.touch(db_session, [issue.id])
     return issue
 
 def get_by_id(db_session: Session, productId: int, id: int):
-    return db_session.query(Issue).filter(Issue.id == id, Issue.productId == productId).first()
-
-def put(db_session: Session, issue: Issue, title: str, description: str, productId: int, createdBy: str, updatedBy: str, updatedDate: datetime, assignedTo: str, status: str):
-    issue.title = title
-    issue.description = description
-    issue.productId = productId
-    issue.createdBy = createdBy
-    issue.updatedBy = updatedBy,
-    issue.updatedDate = updatedDate
-    issue.assignedTo = assignedTo
-    issue.status = status
+    return get_or_load(
+        db_session, Issue, f"issue:{id}", lambda: db_session.query(Issue).filter(Issue.id == id, Issue.productId == productId).first(),
+        namespace=f"issue-rows:{productId}"
+    )
+
+def put(db_session: Session, productId: int, id: int, payload: IssueSchema, version: int = None):
+    target = payload.productId
+    # Lock both products in id order so concurrent moves between the same pair cannot deadlock.
+    for changed in sorted({productId, target}):
+        changes_crud.bump(db_session, changed)
+    values = dict(payload.dict(), version=issues.c.version + 1, changeSeq=changes_crud.current(target))
+    previous = stats_crud.summary_rows(db_session, productId, [id])
+    issue = update_returning(db_session, issues, id, _matching(productId, id, version), values)
+    if issue is not None:
+        stats_crud.record(db_session, added=[_summary_key(issue)], removed=previous)
+        if target != productId:
+            changes_crud.bury(db_session, productId, [id])
+            changes_crud.revive(db_session, target, id)
+            broker.stage(db_session, productId, "deleted", id)
+        broker.stage(db_session, issue.productId, "updated", id, issue)
     db_session.commit()
+    if issue is not None:
+        invalidate(productId, ids=[id])
+        if issue.productId != productId:
+            invalidate(issue.productId)
+        search_crud.touch(db_session, [id])
     return issue
 
-def delete(db_session: Session, productId: int, id: int):
-    issue = db_session.query(Issue).filter(Issue.id == id, Issue.productId == productId).first()
-    db_session.delete(issue)
+def delete(db_session: Session, productId: int, id: int, version: int = None):
+    changes_crud.bump(db_session, productId)
+    issue = delete_returning(db_session, issues, _matching(productId, id, version))
+    if issue is not None:
+        stats_crud.record(db_session, removed=[_summary_key(issue)])
+        changes_crud.bury(db_session, productId, [issue.id])
+        broker.stage(db_session, productId, "deleted", id, issue)
     db_session.commit()
+    if issue is not None:
+        invalidate(productId, ids=[id])
+        search_crud.touch(db_session, [id])
     return issue
 
+def bulk_post(db_session: Session, payloads: List[IssueSchema], tickets: List[str] = None) -> List[int]:
+    productIds = sorted({payload.productId for payload in payloads})
+    for productId in productIds:
+        changes_crud.bump(db_session, productId)
+    # One change number per product covers the whole batch.
+    rows = [dict(payload.dict(), changeSeq=changes_crud.current(payload.productId)) for payload in payloads]
+    ids = []
+    if supports_returning(db_session):
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            query = issues.insert().values(rows[start:start + INSERT_CHUNK_SIZE]).returning(issues.c.id)
+            ids.extend(row.id for row in db_session.execute(query))
+    else:
+        for row in rows:
+            ids.append(db_session.execute(issues.insert().values(row)).inserted_primary_key[0])
+    for productId in productIds:
+        stats_crud.record(db_session, added=stats_crud.summary_rows(db_session, productId, ids))
+    if tickets:
+        ingest_crud.record(db_session, tickets, [payload.productId for payload in payloads], ids)
+    # Bulk events carry only the id; subscribers fetch the issues they care about.
+    for payload, id in zip(payloads, ids):
+        broker.stage(db_session, payload.productId, "created", id)
+    db_session.commit()
+    for productId in productIds:
+        invalidate(productId)
+    search_crud.touch(db_session, ids)
+    return ids
+
+def export_batches(db_session: Session, productId: int, fields: List[str], batch_size: int = 1000):
+    """Yields the product's issues as lists of `fields` tuples, read through a server-side cursor on Postgres."""
+    query = select([issues.c[name] for name in fields]).where(issues.c.productId == productId).order_by(issues.c.id)
+    result = db_session.execute(query.execution_options(stream_results=True))
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+def load(db_session: Session, productId: int, payloads: List[IssueSchema]) -> int:
+    """Inserts one batch of an import with COPY on Postgres and executemany elsewhere, then commits it.
+
+    Nothing is returned per row, so every row in the batch shares one change number and one creation time, read up front.
+    """
+    changes_crud.bump(db_session, productId)
+    seq, now = db_session.execute(select([changes_crud.current(productId), func.now()])).first()
+    rows = [dict(payload.dict(), productId=productId, createdDate=now, changeSeq=seq) for payload in payloads]
+    if supports_copy(db_session):
+        _copy(db_session, rows)
+    else:
+        db_session.execute(issues.insert(), rows)
+    stats_crud.record(db_session, added=[
+        stats_crud.summary_key(productId, row["status"], row["assignedTo"], now) for row in rows
+    ])
+    db_session.commit()
+    invalidate(productId)
+    if not search_crud.uses_database(db_session):
+        query = select([issues.c.id]).where(issues.c.productId == productId).where(issues.c.changeSeq == seq)
+        search_crud.touch(db_session, [row.id for row in db_session.execute(query)])
+    return len(rows)
+
+def _copy(db_session: Session, rows: List[dict]):
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[name] for name in columns])
+    buffer.seek(0)
+    names = ", ".join(f'"{name}"' for name in columns)
+    cursor = db_session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY issues ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def existing_ids(db_session: Session, productId: int, ids: List[int]) -> set:
+    query = db_session.query(Issue.id).filter(Issue.productId == productId, Issue.id.in_(ids))
+    return {row.id for row in query}
+
+def bulk_put(db_session: Session, productId: int, payloads: List[BulkIssueUpdate]) -> set:
+    found = existing_ids(db_session, productId, [payload.id for payload in payloads])
+    rows = [dict(payload.dict(exclude={"id"}), _id=payload.id) for payload in payloads if payload.id in found]
+    previous = stats_crud.summary_rows(db_session, productId, found)
+    if rows:
+        changes_crud.bump(db_session, productId)
+        columns = [name for name in rows[0] if name != "_id"]
+        values = dict(
+            {name: bindparam(name) for name in columns}, version=issues.c.version + 1, changeSeq=changes_crud.current(productId)
+        )
+        query = issues.update().where(issues.c.id == bindparam("_id")).values(values)
+        db_session.execute(query, rows)
+    stats_crud.record(db_session, added=stats_crud.summary_rows(db_session, productId, found), removed=previous)
+    for id in sorted(found):
+        broker.stage(db_session, productId, "updated", id)
+    db_session.commit()
+    invalidate(productId, ids=found)
+    search_crud.touch(db_session, found)
+    return found
+
+def bulk_delete(db_session: Session, productId: int, ids: List[int]) -> set:
+    changes_crud.bump(db_session, productId)
+    query = issues.delete().where(issues.c.productId == productId).where(issues.c.id.in_(ids))
+    previous = stats_crud.summary_rows(db_session, productId, ids)
+    if supports_returning(db_session):
+        deleted = {row.id for row in db_session.execute(query.returning(issues.c.id))}
+    else:
+        deleted = existing_ids(db_session, productId, ids)
+        db_session.execute(query)
+    stats_crud.record(db_session, removed=previous)
+    changes_crud.bury(db_session, productId, sorted(deleted))
+    for id in sorted(deleted):
+        broker.stage(db_session, productId, "deleted", id)
+    db_session.commit()
+    invalidate(productId, ids=deleted)
+    search_crud.touch(db_session, deleted)
+    return deleted
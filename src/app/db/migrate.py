@@ -0,0 +1,31 @@
+import argparse
+
+from app.db import migrations, stats_crud
+from app.db.db_factory import get_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status", "rebuild-summary"], default="upgrade")
+    parser.add_argument("--target", type=int, help="stop after this migration version")
+    args = parser.parse_args()
+    engine = get_engine()
+
+    if args.command == "status":
+        for version, name, applied in migrations.status(engine):
+            print(f"{'applied' if applied else 'pending':8} {name}")
+        return
+
+    if args.command == "rebuild-summary":
+        # Needed after turning ISSUE_STATS_SUMMARY on, since writes made while it was off are not in the table.
+        with engine.begin() as connection:
+            stats_crud.rebuild_summary(connection)
+        print("issue summary rebuilt")
+        return
+
+    applied = migrations.upgrade(engine, target=args.target)
+    print("\n".join(f"applied  {name}" for name in applied) or "database is up to date")
+
+
+if __name__ == "__main__":
+    main()
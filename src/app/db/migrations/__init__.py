@@ -0,0 +1,58 @@
+import importlib
+import pkgutil
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, text
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("appliedDate", DateTime, default=func.now(), nullable=False),
+)
+
+# Arbitrary key so concurrent deploys serialise on Postgres instead of racing each other.
+ADVISORY_LOCK_ID = 7201603
+
+
+def available_migrations():
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        if module_info.name.startswith("v") and module_info.name[1:5].isdigit():
+            module = importlib.import_module(f"{__name__}.{module_info.name}")
+            migrations.append((int(module_info.name[1:5]), module_info.name, module))
+    return sorted(migrations, key=lambda migration: migration[0])
+
+
+def applied_versions(connection) -> set:
+    metadata.create_all(connection)
+    return {row.version for row in connection.execute(schema_migrations.select())}
+
+
+def upgrade(engine, target: int = None) -> list:
+    applied = []
+    with engine.connect() as connection:
+        locked = connection.dialect.name == "postgresql"
+        if locked:
+            connection.execute(text("SELECT pg_advisory_lock(:id)"), id=ADVISORY_LOCK_ID)
+        try:
+            done = applied_versions(connection)
+            for version, name, module in available_migrations():
+                if version in done or (target is not None and version > target):
+                    continue
+                with connection.begin():
+                    module.upgrade(connection)
+                    connection.execute(schema_migrations.insert().values(version=version, name=name))
+                applied.append(name)
+        finally:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"), id=ADVISORY_LOCK_ID)
+    return applied
+
+
+def status(engine) -> list:
+    with engine.connect() as connection:
+        done = applied_versions(connection)
+    return [(version, name, version in done) for version, name, _ in available_migrations()]
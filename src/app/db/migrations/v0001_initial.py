@@ -0,0 +1,36 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, func
+
+metadata = MetaData()
+
+products = Table(
+    "products",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String(50)),
+    Column("description", String(50)),
+    Column("productOwner", String(100)),
+    Column("createdDate", DateTime, default=func.now(), nullable=False),
+    Column("updatedDate", DateTime, default=func.now(), nullable=False),
+    Column("createdBy", String(100)),
+    Column("updatedBy", String(100)),
+)
+
+issues = Table(
+    "issues",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String(50)),
+    Column("description", String(50)),
+    Column("productId", Integer, ForeignKey("products.id")),
+    Column("createdDate", DateTime, default=func.now(), nullable=False),
+    Column("updatedDate", DateTime, default=func.now(), nullable=False),
+    Column("createdBy", String(100)),
+    Column("updatedBy", String(100)),
+    Column("assignedTo", String(100)),
+    Column("status", String(10)),
+)
+
+
+def upgrade(connection):
+    # Databases created by the old startup create_all() already have these tables.
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import text
+
+INDEXES = {
+    "ix_issues_productId_id": '"productId", id',
+    "ix_issues_productId_status_updatedDate": '"productId", status, "updatedDate"',
+    "ix_issues_productId_assignedTo": '"productId", "assignedTo"',
+}
+
+
+def upgrade(connection):
+    for name, columns in INDEXES.items():
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}" ON issues ({columns})'))
@@ -0,0 +1,10 @@
+from sqlalchemy import inspect, text
+
+TABLES = ("products", "issues")
+
+
+def upgrade(connection):
+    for table in TABLES:
+        columns = {column["name"] for column in inspect(connection).get_columns(table)}
+        if "version" not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
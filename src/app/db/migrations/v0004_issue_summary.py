@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Date, Integer, MetaData, String, Table
+
+from app.db import stats_crud
+
+metadata = MetaData()
+
+issue_summary = Table(
+    "issue_summary",
+    metadata,
+    Column("productId", Integer, primary_key=True),
+    Column("status", String(10), primary_key=True),
+    Column("assignedTo", String(100), primary_key=True),
+    Column("createdDay", Date, primary_key=True),
+    Column("count", Integer, nullable=False, default=0),
+)
+
+
+def upgrade(connection):
+    issue_summary.create(connection, checkfirst=True)
+    stats_crud.rebuild_summary(connection)
@@ -0,0 +1,17 @@
+from sqlalchemy import text
+
+# A generated column keeps the document in step with every INSERT/UPDATE, including bulk Core writes.
+SEARCH_COLUMN = (
+    "ALTER TABLE issues ADD COLUMN IF NOT EXISTS search tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ") STORED"
+)
+
+
+def upgrade(connection):
+    # SQLite test databases search with the in-process index in app.db.search_index instead.
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text(SEARCH_COLUMN))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS "ix_issues_search" ON issues USING GIN (search)'))
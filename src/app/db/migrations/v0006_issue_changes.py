@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, text
+
+metadata = MetaData()
+
+issue_tombstones = Table(
+    "issue_tombstones",
+    metadata,
+    Column("productId", Integer, primary_key=True),
+    Column("id", Integer, primary_key=True),
+    Column("changeSeq", Integer, nullable=False),
+)
+
+
+def upgrade(connection):
+    for table in ("products", "issues"):
+        columns = {column["name"] for column in inspect(connection).get_columns(table)}
+        if "changeSeq" not in columns:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN "changeSeq" INTEGER NOT NULL DEFAULT 0'))
+    issue_tombstones.create(connection, checkfirst=True)
+    connection.execute(text('CREATE INDEX IF NOT EXISTS "ix_issues_productId_changeSeq" ON issues ("productId", "changeSeq")'))
+    connection.execute(
+        text('CREATE INDEX IF NOT EXISTS "ix_issue_tombstones_productId_changeSeq" ON issue_tombstones ("productId", "changeSeq")')
+    )
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, text
+
+metadata = MetaData()
+
+product_purges = Table(
+    "product_purges",
+    metadata,
+    Column("productId", Integer, primary_key=True),
+    Column("status", String(10), nullable=False),
+    Column("total", Integer, nullable=False),
+    Column("deleted", Integer, nullable=False),
+    Column("startedDate", DateTime, default=func.now(), nullable=False),
+    Column("updatedDate", DateTime, default=func.now(), nullable=False),
+)
+
+CASCADES = {"issues": "issues_productId_fkey", "issue_tombstones": "issue_tombstones_productId_fkey"}
+
+
+def upgrade(connection):
+    product_purges.create(connection, checkfirst=True)
+    # SQLite cannot change the constraints of an existing table; product_crud.delete removes the children itself there.
+    if connection.dialect.name != "postgresql":
+        return
+    for table, name in CASCADES.items():
+        for foreign_key in inspect(connection).get_foreign_keys(table):
+            if foreign_key["referred_table"] == "products":
+                connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{foreign_key["name"]}"'))
+        # NOT VALID skips the scan of existing rows under lock; v0009 validates them in a transaction of its own.
+        connection.execute(text(
+            f'ALTER TABLE {table} ADD CONSTRAINT "{name}" FOREIGN KEY ("productId") REFERENCES products (id) '
+            "ON DELETE CASCADE NOT VALID"
+        ))
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+# Failed tickets are stored too, so issueId is nullable; productId scopes lookups to the route's product.
+issue_ingest_tickets = Table(
+    "issue_ingest_tickets",
+    metadata,
+    Column("ticket", String(32), primary_key=True),
+    Column("productId", Integer, nullable=False),
+    Column("status", String(10), nullable=False),
+    Column("issueId", Integer),
+    Column("createdDate", DateTime, nullable=False),
+    Index("ix_issue_ingest_tickets_createdDate", "createdDate"),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,11 @@
+from sqlalchemy import text
+
+from app.db.migrations.v0007_cascade_deletes import CASCADES
+
+
+def upgrade(connection):
+    # Runs after v0007 has committed; VALIDATE scans the rows without blocking writes to either table.
+    if connection.dialect.name != "postgresql":
+        return
+    for table, name in CASCADES.items():
+        connection.execute(text(f'ALTER TABLE {table} VALIDATE CONSTRAINT "{name}"'))
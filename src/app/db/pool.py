@@ -0,0 +1,103 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app.metrics import Histogram
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Weight of the newest checkout in `recent_wait`; roughly the last 1 / RECENT_WAIT_WEIGHT checkouts count.
+RECENT_WAIT_WEIGHT = 0.1
+
+
+class PoolStats:
+    def __init__(self):
+        self.wait_seconds = Histogram(WAIT_BUCKETS)
+        self.checked_out = 0
+        self.timeouts = 0
+        # Moving average of checkout waits, which the load shedder watches.
+        self.recent_wait = 0.0
+        self._lock = threading.Lock()
+
+    def _record_wait(self, waited: float):
+        self.wait_seconds.observe(waited)
+        self.recent_wait += (waited - self.recent_wait) * RECENT_WAIT_WEIGHT
+
+    def checkout(self, waited: float):
+        with self._lock:
+            self._record_wait(waited)
+            self.checked_out += 1
+
+    def checkin(self):
+        with self._lock:
+            self.checked_out -= 1
+
+    def timeout(self, waited: float):
+        with self._lock:
+            self._record_wait(waited)
+            self.timeouts += 1
+
+
+class _InstrumentedPool:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeout(time.perf_counter() - started)
+            raise
+        self.stats.checkout(time.perf_counter() - started)
+        return connection
+
+    def _do_return_conn(self, conn):
+        self.stats.checkin()
+        super()._do_return_conn(conn)
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_InstrumentedPool, NullPool):
+    pass
+
+
+def recent_wait(pool) -> float:
+    stats = getattr(pool, "stats", None)
+    return stats.recent_wait if stats is not None else 0.0
+
+
+def pool_status(pool) -> dict:
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), checked_in=pool.checkedin(), overflow=max(pool.overflow(), 0))
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(
+            checked_out=stats.checked_out, timeouts=stats.timeouts, recent_wait_seconds=round(stats.recent_wait, 6),
+            wait_seconds=stats.wait_seconds.snapshot(),
+        )
+    return status
+
+
+def pool_metrics(pool) -> list:
+    metrics = []
+    if isinstance(pool, QueuePool):
+        metrics.append(("db_pool_size", "gauge", "Configured pool size.", pool.size()))
+        metrics.append(("db_pool_overflow", "gauge", "Connections open beyond the pool size.", max(pool.overflow(), 0)))
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        metrics.append(("db_pool_checked_out", "gauge", "Connections currently checked out.", stats.checked_out))
+        metrics.append(("db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.", stats.timeouts))
+        metrics.append(("db_pool_wait_seconds", "histogram", "Time spent waiting to check out a connection.", stats.wait_seconds))
+    return metrics
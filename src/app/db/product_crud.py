@@ -1,38 +1,147 @@
+import logging
+import os
+from typing import List
+
+from datetime import timedelta
+
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from datetime import datetime
 
-from app.api.models import Product, ProductSchema
+from app.api.models import Issue, Product, ProductPurge, ProductSchema
+from app.db.cache import cache, forget, get_or_load, list_or_load
+from app.db.db_factory import supports_cascade
+from app.db.returning import delete_returning, insert_returning, update_returning
+from app.db import changes_crud, search_crud, stats_crud
+from app.events import broker
+
+logger = logging.getLogger("app.db.purge")
+
+products = Product.__table__
+issues = Issue.__table__
+purges = ProductPurge.__table__
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "5000"))
+# A running purge touches its progress row with every batch; one silent for this long died with its worker.
+PURGE_STALE_SECONDS = float(os.getenv("PURGE_STALE_SECONDS", "300"))
+
+
+def invalidate(id: int, issues: bool = False):
+    forget(f"product:{id}")
+    cache.bump("products")
+    if issues:
+        cache.bump(f"issues:{id}")
+        cache.bump(f"issue-rows:{id}")
+
+
+def _matching(id: int, version: int = None):
+    condition = products.c.id == id
+    if version is not None:
+        condition &= products.c.version == version
+    return condition
 
 
 def post(db_session: Session, payload: ProductSchema):
-    product = Product(title=payload.title, description=payload.description, productOwner=payload.productOwner, createdBy=payload.createdBy, updatedBy=payload.updatedBy, updatedDate=payload.updatedDate)
-    db_session.add(product)
+    product = insert_returning(db_session, products, payload.dict())
     db_session.commit()
-    db_session.refresh(product)
+    invalidate(product.id)
     return product
 
 
 def get(db_session: Session, id: int):
-    return db_session.query(Product).filter(Product.id == id).first()
+    return get_or_load(db_session, Product, f"product:{id}", lambda: db_session.query(Product).filter(Product.id == id).first())
 
 
-def get_all(db_session: Session):
-    return db_session.query(Product).all()
+def get_all(db_session: Session, fields: List[str] = None, limit: int = None, after: int = None):
+    def load():
+        query = db_session.query(*[getattr(Product, name) for name in fields]) if fields else db_session.query(Product)
+        if after is not None:
+            query = query.filter(Product.id > after)
+        return query.order_by(Product.id).limit(limit).all()
 
+    return list_or_load(db_session, Product, "products", (tuple(fields or ()), limit, after), load)
 
-def put(db_session: Session, product: Product, title: str, description: str, productOwner: str, createdBy: str, updatedBy: str, updatedDate: datetime):
-    product.title = title
-    product.description = description
-    product.productOwner = productOwner
-    product.createdBy = createdBy
-    product.updatedBy = updatedBy,
-    product.updatedDate = updatedDate
+
+def put(db_session: Session, id: int, payload: ProductSchema, version: int = None):
+    values = dict(payload.dict(), version=products.c.version + 1)
+    product = update_returning(db_session, products, id, _matching(id, version), values)
     db_session.commit()
+    if product is not None:
+        invalidate(id)
     return product
 
 
-def delete(db_session: Session, id: int):
-    product = db_session.query(Product).filter(Product.id == id).first()
-    db_session.delete(product)
+def delete(db_session: Session, id: int, version: int = None):
+    # Lock the product row before its issues, in the same order as issue writes.
+    changes_crud.bump(db_session, id)
+    if not supports_cascade(db_session):
+        # Without ON DELETE CASCADE the children go first, in the same transaction.
+        db_session.execute(issues.delete().where(issues.c.productId == id))
+        changes_crud.forget_product(db_session, id)
+    stats_crud.forget_product(db_session, id)
+    product = delete_returning(db_session, products, _matching(id, version))
+    if product is None:
+        db_session.rollback()
+        return None
     db_session.commit()
+    invalidate(id, issues=True)
+    search_crud.forget_product(db_session, id)
     return product
+
+
+def get_purge(db_session: Session, id: int):
+    return db_session.query(ProductPurge).filter(ProductPurge.productId == id).first()
+
+
+def start_purge(db_session: Session, id: int):
+    """Records a background delete of the product, unless one is already running. Returns (purge, started)."""
+    purge = get_purge(db_session, id)
+    if purge is not None and purge.status == "running":
+        # updatedDate comes from the database clock, so compare it with that rather than the worker's.
+        now = db_session.execute(select([func.now()])).scalar()
+        if now - purge.updatedDate < timedelta(seconds=PURGE_STALE_SECONDS):
+            return purge, False
+    total = db_session.query(func.count(Issue.id)).filter(Issue.productId == id).scalar()
+    db_session.execute(purges.delete().where(purges.c.productId == id))
+    db_session.execute(purges.insert().values(productId=id, status="running", total=total, deleted=0))
+    db_session.commit()
+    return get_purge(db_session, id), True
+
+
+def purge(engine, id: int, batch_size: int = None):
+    """Deletes the product's issues `batch_size` at a time, one transaction each, then the product itself.
+
+    Runs after the response has been sent, so it opens its own session. Short transactions keep locks and WAL bursts
+    small, and the progress row is updated with every batch.
+    """
+    batch_size = batch_size or PURGE_BATCH_SIZE
+    db_session = Session(bind=engine)
+    try:
+        while True:
+            changes_crud.bump(db_session, id)
+            batch = [row.id for row in db_session.query(Issue.id).filter(Issue.productId == id).limit(batch_size)]
+            if not batch:
+                break
+            stats_crud.record(db_session, removed=stats_crud.summary_rows(db_session, id, batch))
+            db_session.execute(issues.delete().where(issues.c.id.in_(batch)))
+            # Streams and delta syncs learn of each batch as it commits; the product's own delete comes last.
+            changes_crud.bury(db_session, id, batch)
+            for issueId in batch:
+                broker.stage(db_session, id, "deleted", issueId)
+            db_session.execute(
+                purges.update().where(purges.c.productId == id)
+                .values(deleted=purges.c.deleted + len(batch), updatedDate=func.now())
+            )
+            db_session.commit()
+            invalidate(id, issues=True)
+            search_crud.touch(db_session, batch)
+        delete(db_session, id)
+        status = "done"
+    except Exception:
+        logger.exception("purge of product %s failed", id)
+        db_session.rollback()
+        status = "failed"
+    try:
+        db_session.execute(purges.update().where(purges.c.productId == id).values(status=status, updatedDate=func.now()))
+        db_session.commit()
+    finally:
+        db_session.close()
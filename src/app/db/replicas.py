@@ -0,0 +1,98 @@
+import itertools
+import threading
+import time
+from http.cookies import SimpleCookie
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+PRIMARY_COOKIE = "primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class Replica:
+    __slots__ = ("engine", "healthy", "checked_at", "failures")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = None
+        self.failures = 0
+
+
+class ReplicaSet:
+    """Round-robins read sessions over replica engines, skipping any that failed their last health check."""
+
+    def __init__(self, engines, check_interval: float = 5.0, clock=time.monotonic):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.check_interval = check_interval
+        self._clock = clock
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """Returns the next healthy replica engine, or None when every replica is down and reads must use the primary."""
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._check(replica):
+                return replica.engine
+        return None
+
+    def _check(self, replica: Replica) -> bool:
+        now = self._clock()
+        with self._lock:
+            due = replica.checked_at is None or now - replica.checked_at >= self.check_interval
+            if due:
+                # Claim the check so concurrent requests keep using the last verdict instead of piling on.
+                replica.checked_at = now
+        if due:
+            try:
+                with replica.engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                replica.healthy = True
+            except DBAPIError:
+                replica.healthy = False
+                replica.failures += 1
+        return replica.healthy
+
+    def status(self) -> list:
+        return [
+            {"url": repr(replica.engine.url), "healthy": replica.healthy, "failures": replica.failures}
+            for replica in self.replicas
+        ]
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+
+def pinned_to_primary(cookies: dict, now: float = None) -> bool:
+    try:
+        return float(cookies.get(PRIMARY_COOKIE, 0)) > (time.time() if now is None else now)
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """After a successful write, pins the client's reads to the primary for `window` seconds with a cookie."""
+
+    def __init__(self, app, window: float = 5.0):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[PRIMARY_COOKIE] = str(round(time.time() + self.window, 3))
+                cookie[PRIMARY_COOKIE].update({"max-age": int(self.window + 0.999), "path": "/", "httponly": True, "samesite": "Lax"})
+                header = cookie.output(header="").strip().encode("latin-1")
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"set-cookie", header)])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
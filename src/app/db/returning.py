@@ -0,0 +1,31 @@
+from sqlalchemy.orm import Session
+
+from app.db.db_factory import supports_returning
+
+
+# Each helper is one round trip on Postgres. SQLite has no RETURNING, so it pays a second SELECT.
+def insert_returning(db_session: Session, table, values: dict):
+    query = table.insert().values(values)
+    if supports_returning(db_session):
+        return db_session.execute(query.returning(*table.c)).first()
+    id = db_session.execute(query).inserted_primary_key[0]
+    return db_session.execute(table.select().where(table.c.id == id)).first()
+
+
+def update_returning(db_session: Session, table, id: int, condition, values: dict):
+    query = table.update().where(condition).values(values)
+    if supports_returning(db_session):
+        return db_session.execute(query.returning(*table.c)).first()
+    if db_session.execute(query).rowcount == 0:
+        return None
+    return db_session.execute(table.select().where(table.c.id == id)).first()
+
+
+def delete_returning(db_session: Session, table, condition):
+    query = table.delete().where(condition)
+    if supports_returning(db_session):
+        return db_session.execute(query.returning(*table.c)).first()
+    row = db_session.execute(table.select().where(condition)).first()
+    if row is not None:
+        db_session.execute(query)
+    return row
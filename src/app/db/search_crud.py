@@ -0,0 +1,106 @@
+import threading
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.orm import Session
+
+from app.api.models import Issue
+from app.db.search_index import InvertedIndex
+
+issues = Issue.__table__
+search_document = literal_column("issues.search")
+
+index = InvertedIndex()
+_loaded = False
+_stale = set()
+_lock = threading.Lock()
+# Held for the first full load, so concurrent searches wait for a complete index instead of reading a partial one.
+_load_lock = threading.Lock()
+
+
+def uses_database(db_session: Session) -> bool:
+    return db_session.get_bind().dialect.name == "postgresql"
+
+
+def _is_postgres(database) -> bool:
+    return database.url.dialect == "postgresql"
+
+
+def _filtered(query, productId: int, status: str):
+    if productId is not None:
+        query = query.where(issues.c.productId == productId)
+    if status is not None:
+        query = query.where(issues.c.status == status)
+    return query
+
+
+def search(db_session: Session, q: str, productId: int = None, status: str = None, limit: int = 100, offset: int = 0) -> list:
+    if uses_database(db_session):
+        terms = func.websearch_to_tsquery("english", q)
+        rank = func.ts_rank(search_document, terms).label("rank")
+        query = _filtered(select([issues, rank]).where(search_document.op("@@")(terms)), productId, status)
+        rows = db_session.execute(query.order_by(rank.desc(), issues.c.id).limit(limit).offset(offset))
+        return [dict(row) for row in rows]
+
+    _refresh(db_session)
+    hits = index.search(q, productId=productId, status=status)[offset:offset + limit]
+    if not hits:
+        return []
+    rows = {row.id: row for row in db_session.execute(issues.select().where(issues.c.id.in_([id for id, _ in hits])))}
+    return [dict(rows[id], rank=score) for id, score in hits if id in rows]
+
+
+_COLUMNS = [issues.c.id, issues.c.productId, issues.c.status, issues.c.title, issues.c.description]
+
+
+def _refresh(db_session: Session):
+    global _loaded
+    if not _loaded:
+        with _load_lock:
+            if not _loaded:
+                with _lock:
+                    # Writes from here on are re-read by the next refresh, even if the full load already saw them.
+                    _stale.clear()
+                for row in db_session.execute(select(_COLUMNS)):
+                    index.add(row.id, row.productId, row.status, row.title, row.description)
+                _loaded = True
+    with _lock:
+        stale = set(_stale)
+        _stale.clear()
+    if not stale:
+        return
+    for row in db_session.execute(select(_COLUMNS).where(issues.c.id.in_(stale))):
+        index.add(row.id, row.productId, row.status, row.title, row.description)
+        stale.discard(row.id)
+    for id in stale:
+        index.remove(id)
+
+
+# Write paths call these; Postgres keeps its tsvector column current by itself.
+def touch(db_session: Session, ids):
+    if not uses_database(db_session):
+        with _lock:
+            _stale.update(ids)
+
+
+def forget_product(db_session: Session, productId: int):
+    if not uses_database(db_session):
+        index.remove_product(productId)
+
+
+def touch_async(database, ids):
+    if not _is_postgres(database):
+        with _lock:
+            _stale.update(ids)
+
+
+def forget_product_async(database, productId: int):
+    if not _is_postgres(database):
+        index.remove_product(productId)
+
+
+def reset():
+    global _loaded
+    with _lock:
+        _loaded = False
+        _stale.clear()
+    index.clear()
@@ -0,0 +1,92 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+TOKEN = re.compile(r"[a-z0-9]+")
+TITLE_WEIGHT = 2
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> list:
+    return TOKEN.findall((text or "").lower())
+
+
+class InvertedIndex:
+    """In-process BM25 index over issue titles and descriptions, for databases without full-text search."""
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._total_length = 0
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, id: int, productId: int, status: str, title: str, description: str):
+        terms = defaultdict(int)
+        for token in tokenize(title):
+            terms[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            terms[token] += 1
+        length = sum(terms.values())
+        with self._lock:
+            self._remove(id)
+            self._documents[id] = (productId, status, length, tuple(terms))
+            self._total_length += length
+            for token, frequency in terms.items():
+                self._postings[token][id] = frequency
+
+    def remove(self, id: int):
+        with self._lock:
+            self._remove(id)
+
+    def remove_product(self, productId: int):
+        with self._lock:
+            for id in [id for id, document in self._documents.items() if document[0] == productId]:
+                self._remove(id)
+
+    def _remove(self, id: int):
+        document = self._documents.pop(id, None)
+        if document is None:
+            return
+        self._total_length -= document[2]
+        for token in document[3]:
+            postings = self._postings[token]
+            postings.pop(id, None)
+            if not postings:
+                del self._postings[token]
+
+    def search(self, q: str, productId: int = None, status: str = None) -> list:
+        """Returns (id, score) pairs for documents containing every query term, best first."""
+        terms = set(tokenize(q))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            count = len(self._documents)
+            average = self._total_length / count
+            candidates = set.intersection(*(set(posting) for posting in postings))
+            results = []
+            for id in candidates:
+                docProductId, docStatus, length, _ = self._documents[id]
+                if (productId is not None and docProductId != productId) or (status is not None and docStatus != status):
+                    continue
+                score = 0.0
+                for posting in postings:
+                    idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                    frequency = posting[id]
+                    score += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average))
+                results.append((id, score))
+        results.sort(key=lambda result: (-result[1], result[0]))
+        return results
@@ -0,0 +1,150 @@
+from collections import Counter as Tally
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, bindparam, case, cast, func, select, text
+from sqlalchemy.orm import Session
+
+from app.api.models import Issue, IssueSummary
+from app.db.db_factory import ISSUE_STATS_SUMMARY
+
+issues = Issue.__table__
+issue_summary = IssueSummary.__table__
+
+CLOSED_STATUSES = ("closed", "resolved")
+# (label, exclusive upper bound on age in whole days); anything older lands in OLDEST_BUCKET.
+AGE_BUCKETS = (("<1d", 1), ("1-7d", 7), ("7-30d", 30), ("30-90d", 90))
+OLDEST_BUCKET = "90d+"
+
+UPSERT = text(
+    'INSERT INTO issue_summary ("productId", status, "assignedTo", "createdDay", count) '
+    'VALUES (:productId, :status, :assignedTo, :createdDay, :count) '
+    'ON CONFLICT ("productId", status, "assignedTo", "createdDay") DO UPDATE SET count = issue_summary.count + excluded.count'
+).bindparams(bindparam("createdDay", type_=Date))
+
+
+def summary_key(productId: int, status: str, assignedTo: str, createdDate: datetime):
+    return productId, status or "", assignedTo or "", createdDate.date()
+
+
+def _summary_query(productId: int, ids):
+    return (
+        select([issues.c.productId, issues.c.status, issues.c.assignedTo, issues.c.createdDate])
+        .where(issues.c.productId == productId)
+        .where(issues.c.id.in_(list(ids)))
+        .with_for_update()
+    )
+
+
+def _deltas(added, removed) -> list:
+    deltas = Tally(added)
+    deltas.subtract(Tally(removed))
+    return [
+        {"productId": productId, "status": status, "assignedTo": assignedTo, "createdDay": day, "count": count}
+        for (productId, status, assignedTo, day), count in deltas.items() if count
+    ]
+
+
+def summary_rows(db_session: Session, productId: int, ids) -> list:
+    if not ISSUE_STATS_SUMMARY or not ids:
+        return []
+    return [summary_key(*row) for row in db_session.execute(_summary_query(productId, ids))]
+
+
+def record(db_session: Session, added=(), removed=()):
+    rows = _deltas(added, removed) if ISSUE_STATS_SUMMARY else []
+    if rows:
+        db_session.execute(UPSERT, rows)
+
+
+def forget_product(db_session: Session, productId: int):
+    if ISSUE_STATS_SUMMARY:
+        db_session.execute(issue_summary.delete().where(issue_summary.c.productId == productId))
+
+
+# The same hooks for the async database path; call them inside the write's transaction.
+async def summary_rows_async(database, productId: int, ids) -> list:
+    if not ISSUE_STATS_SUMMARY or not ids:
+        return []
+    return [summary_key(*row) for row in await database.fetch_all(query=_summary_query(productId, ids))]
+
+
+async def record_async(database, added=(), removed=()):
+    rows = _deltas(added, removed) if ISSUE_STATS_SUMMARY else []
+    if rows:
+        await database.execute_many(query=UPSERT, values=rows)
+
+
+async def forget_product_async(database, productId: int):
+    if ISSUE_STATS_SUMMARY:
+        await database.execute(query=issue_summary.delete().where(issue_summary.c.productId == productId))
+
+
+def rebuild_summary(connection):
+    # SQLite's CAST(... AS DATE) yields a number, so it needs its own date() function.
+    day = func.date(issues.c.createdDate) if connection.dialect.name == "sqlite" else cast(issues.c.createdDate, Date)
+    status = func.coalesce(issues.c.status, "")
+    assignedTo = func.coalesce(issues.c.assignedTo, "")
+    counts = select([issues.c.productId, status, assignedTo, day, func.count()]).group_by(issues.c.productId, status, assignedTo, day)
+    connection.execute(issue_summary.delete())
+    connection.execute(issue_summary.insert().from_select(["productId", "status", "assignedTo", "createdDay", "count"], counts))
+
+
+def _age_bucket(column, as_datetime: bool, today: date):
+    # Ages are whole days so the live query and the per-day summary put every issue in the same bucket.
+    whens = []
+    for label, days in AGE_BUCKETS:
+        cutoff = today - timedelta(days=days - 1)
+        whens.append((column >= (datetime.combine(cutoff, time.min) if as_datetime else cutoff), label))
+    return case(whens, else_=OLDEST_BUCKET)
+
+
+def _grouped(db_session: Session, productId: int = None):
+    if ISSUE_STATS_SUMMARY:
+        table, created, count, as_datetime = issue_summary, issue_summary.c.createdDay, func.sum(issue_summary.c.count), False
+    else:
+        table, created, count, as_datetime = issues, issues.c.createdDate, func.count(), True
+    # createdDate is filled in by the database's clock, so ages count from its date rather than the worker's.
+    today = db_session.execute(select([func.current_date()])).scalar()
+    bucket = _age_bucket(created, as_datetime, today).label("bucket")
+    columns = [table.c.productId, table.c.status, table.c.assignedTo, bucket]
+    query = select(columns + [count.label("count")]).group_by(*columns)
+    if productId is not None:
+        query = query.where(table.c.productId == productId)
+    return db_session.execute(query).fetchall()
+
+
+def _empty_stats(detailed: bool) -> dict:
+    stats = {"total": 0, "open": 0, "closed": 0, "byStatus": {}}
+    if detailed:
+        labels = [label for label, _ in AGE_BUCKETS] + [OLDEST_BUCKET]
+        stats.update(byAssignee={}, age={"open": dict.fromkeys(labels, 0), "closed": dict.fromkeys(labels, 0)})
+    return stats
+
+
+def _add(stats: dict, row):
+    if not row.count:
+        return
+    state = "closed" if row.status in CLOSED_STATUSES else "open"
+    stats["total"] += row.count
+    stats[state] += row.count
+    stats["byStatus"][row.status or ""] = stats["byStatus"].get(row.status or "", 0) + row.count
+    if "age" in stats:
+        stats["byAssignee"][row.assignedTo or ""] = stats["byAssignee"].get(row.assignedTo or "", 0) + row.count
+        stats["age"][state][row.bucket] += row.count
+
+
+def product_stats(db_session: Session, productId: int) -> dict:
+    stats = dict(_empty_stats(detailed=True), productId=productId)
+    for row in _grouped(db_session, productId):
+        _add(stats, row)
+    return stats
+
+
+def all_stats(db_session: Session) -> dict:
+    stats = _empty_stats(detailed=True)
+    products = {}
+    for row in _grouped(db_session):
+        _add(stats, row)
+        _add(products.setdefault(row.productId, dict(_empty_stats(detailed=False), productId=row.productId)), row)
+    stats["products"] = [products[productId] for productId in sorted(products) if products[productId]["total"]]
+    return stats
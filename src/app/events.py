@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from collections import deque
+
+from sqlalchemy import event as orm_event, text
+from sqlalchemy.orm import Session
+
+from app.api.fast_json import dumps
+from app.metrics import registry
+
+logger = logging.getLogger("app.events")
+
+EVENT_HISTORY = int(os.getenv("EVENT_HISTORY", "1000"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+# "local" fans out within this process only; "postgres" relays every event through LISTEN/NOTIFY to all workers.
+EVENTS_BROADCAST = os.getenv("EVENTS_BROADCAST", "local")
+CHANNEL = "issue_events"
+# One statement per commit, whatever the number of events.
+NOTIFY_ALL = text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload")
+# Session.info key for events waiting on the session's commit.
+STAGED = "staged_issue_events"
+
+published = registry.counter("events_published_total", "Issue change events published.")
+dropped = registry.counter("events_dropped_subscribers_total", "Subscribers disconnected because they fell too far behind.")
+
+
+class Event:
+    # `position` orders events within the broker that received them; `id` is the same in every worker.
+    __slots__ = ("id", "productId", "type", "data", "position", "_encoded")
+
+    def __init__(self, id: int, productId: int, type: str, data: str):
+        self.id = id
+        self.productId = productId
+        self.type = type
+        self.data = data
+        self.position = 0
+        self._encoded = None
+
+    def encode(self) -> str:
+        # Encoded once and shared by every subscriber.
+        if self._encoded is None:
+            self._encoded = f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+        return self._encoded
+
+    def to_json(self) -> str:
+        return json.dumps({"id": self.id, "productId": self.productId, "type": self.type, "data": self.data})
+
+    @classmethod
+    def from_json(cls, payload: str) -> "Event":
+        value = json.loads(payload)
+        return cls(value["id"], value["productId"], value["type"], value["data"])
+
+
+class Subscription:
+    __slots__ = ("productId", "queue", "overflowed")
+
+    def __init__(self, productId: int, size: int):
+        self.productId = productId
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+
+class Broker:
+    """Fans issue change events out to the event streams of one process and keeps a short history per product for resuming.
+
+    Events are kept and streamed in the order they arrive. Their ids only identify them, so a client resumes after the
+    event it saw last, and on any worker that received the same events in the same order.
+    """
+
+    def __init__(self, history: int = EVENT_HISTORY, queue_size: int = EVENT_QUEUE_SIZE):
+        self.history = history
+        self.queue_size = queue_size
+        self.transport = None
+        self._events = {}
+        self._evicted = {}
+        self._subscribers = {}
+        self._position = 0
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def event(self, productId: int, type: str, id: int, issue=None) -> Event:
+        data = dumps({"type": type, "productId": productId, "id": id, "issue": dict(issue) if issue is not None else None}).decode()
+        # Random rather than a clock or counter, so workers never hand out the same id; 53 bits stay exact in JavaScript.
+        return Event(uuid.uuid4().int >> 75, productId, type, data)
+
+    def publish(self, productId: int, type: str, id: int, issue=None):
+        """Delivers an event to this process's subscribers at once; writes use `stage` so events follow their commit."""
+        published.inc()
+        self.receive(self.event(productId, type, id, issue))
+
+    def stage(self, db_session: Session, productId: int, type: str, id: int, issue=None):
+        """Queues an event on the session: it is sent with the session's commit and dropped if the session rolls back."""
+        db_session.info.setdefault(STAGED, []).append(self.event(productId, type, id, issue))
+
+    def send(self, db_session: Session, events: list):
+        # With a broadcast, the NOTIFY is part of the transaction: Postgres delivers it on commit or not at all.
+        if self.transport is not None:
+            self.transport.notify(db_session, events)
+
+    async def send_async(self, database, events: list):
+        """`send` for the async database path; call it inside the write's transaction."""
+        if self.transport is not None:
+            await self.transport.notify_async(database, events)
+
+    def committed(self, events: list):
+        published.inc(len(events))
+        # A broadcast reaches this process through its LISTEN connection like every other worker.
+        if self.transport is None:
+            for event in events:
+                self.receive(event)
+
+    def receive(self, event: Event):
+        with self._lock:
+            events = self._events.setdefault(event.productId, deque(maxlen=self.history))
+            if len(events) == self.history:
+                self._evicted[event.productId] = events[0].id
+            self._position += 1
+            event.position = self._position
+            events.append(event)
+            loop = self._loop if self._subscribers.get(event.productId) else None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: Event):
+        for subscription in list(self._subscribers.get(event.productId, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Never let one slow client hold up the rest; it resumes from the history when it reconnects.
+                subscription.overflowed = True
+                dropped.inc()
+                self.unsubscribe(subscription)
+
+    def subscribe(self, productId: int, last_event_id: int = None):
+        """Returns the subscription and the events after `last_event_id`, or None in place of them when that id has aged out."""
+        self._loop = asyncio.get_event_loop()
+        subscription = Subscription(productId, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(productId, set()).add(subscription)
+            return subscription, [] if last_event_id is None else self._since(productId, last_event_id)
+
+    def events_since(self, productId: int, last_event_id: int = None):
+        """Held events after `last_event_id` (all of them for None), or None when some may have been missed."""
+        with self._lock:
+            return self._since(productId, last_event_id)
+
+    def _since(self, productId: int, last_event_id: int = None):
+        events = list(self._events.get(productId, ()))
+        if last_event_id is None or last_event_id == self._evicted.get(productId):
+            return events
+        for index, event in enumerate(events):
+            if event.id == last_event_id:
+                return events[index + 1:]
+        # Aged out, or seen before this process started listening: events may have been missed.
+        return None
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.productId)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.productId]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._evicted.clear()
+            self._subscribers.clear()
+
+
+broker = Broker()
+
+registry.collector(lambda: [("events_subscribers", "gauge", "Open issue event streams.", broker.subscriber_count())])
+
+
+@orm_event.listens_for(Session, "before_commit")
+def _send_staged(db_session):
+    staged = db_session.info.get(STAGED)
+    if staged:
+        broker.send(db_session, staged)
+
+
+@orm_event.listens_for(Session, "after_commit")
+def _deliver_staged(db_session):
+    staged = db_session.info.pop(STAGED, None)
+    if staged:
+        broker.committed(staged)
+
+
+@orm_event.listens_for(Session, "after_rollback")
+def _drop_staged(db_session):
+    db_session.info.pop(STAGED, None)
+
+
+async def event_stream(request, broker: Broker, productId: int, last_event_id: int = None, heartbeat: float = EVENT_HEARTBEAT_SECONDS):
+    subscription, backlog = broker.subscribe(productId, last_event_id)
+    last = 0
+    try:
+        yield "retry: 3000\n\n"
+        if backlog is None:
+            # The client missed more than the history holds and has to refetch the issue list.
+            yield "event: reset\ndata: {}\n\n"
+            backlog = []
+        for event in backlog:
+            yield event.encode()
+            last = event.position
+        checked = time.monotonic()
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            # An event can arrive both in the backlog and live when it was published during subscribe().
+            if event.position > last:
+                yield event.encode()
+                last = event.position
+            if time.monotonic() - checked > 1:
+                checked = time.monotonic()
+                if await request.is_disconnected():
+                    return
+    finally:
+        broker.unsubscribe(subscription)
+
+
+class PostgresBroadcast:
+    """Relays events between workers with NOTIFY; every worker, including the sender, receives them from its LISTEN thread.
+
+    LISTEN holds its connection for the life of the process, so it opens its own instead of taking one from the pool.
+    """
+
+    def __init__(self, broker: Broker, engine):
+        self.broker = broker
+        self.engine = engine
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _params(events: list) -> dict:
+        return {"channel": CHANNEL, "payloads": [event.to_json() for event in events]}
+
+    def notify(self, db_session: Session, events: list):
+        db_session.execute(NOTIFY_ALL, self._params(events))
+
+    async def notify_async(self, database, events: list):
+        await database.execute(query=NOTIFY_ALL, values=self._params(events))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="issue-events-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _connect(self):
+        dialect = self.engine.dialect
+        cargs, cparams = dialect.create_connect_args(self.engine.url)
+        return dialect.connect(*cargs, **cparams)
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            try:
+                connection = self._connect()
+                try:
+                    connection.autocommit = True
+                    connection.cursor().execute(f"LISTEN {CHANNEL}")
+                    self._poll(connection)
+                finally:
+                    connection.close()
+            except Exception:
+                logger.exception("issue event listener failed, reconnecting")
+                self._stopped.wait(1)
+
+    def _poll(self, raw):
+        while not self._stopped.is_set():
+            if select.select([raw], [], [], 1.0) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                self.broker.receive(Event.from_json(raw.notifies.pop(0).payload))
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import env_flag
+from app.db import ingest_crud, issue_crud
+from app.metrics import registry
+
+logger = logging.getLogger("app.ingest")
+
+# Opt-in: create_issue queues the payload and answers 202 with a ticket; a background task inserts the queue in batches.
+INGEST_BATCHING = env_flag("INGEST_BATCHING")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_WINDOW_SECONDS = float(os.getenv("INGEST_WINDOW_MS", "20")) / 1000
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_TICKET_TTL_SECONDS = int(os.getenv("INGEST_TICKET_TTL_SECONDS", "3600"))
+FAILED_TICKET_HISTORY = 10000
+
+BATCH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+queued = registry.counter("ingest_queued_total", "Issues accepted onto the ingest queue.")
+rejected = registry.counter("ingest_rejected_total", "Issues refused because the ingest queue was full.")
+failed = registry.counter("ingest_failed_total", "Queued issues that could not be inserted.")
+batch_sizes = registry.histogram("ingest_batch_size", "Issues inserted per group commit.", BATCH_SIZE_BUCKETS)
+
+
+class IngestQueue:
+    """Buffers validated issue payloads and inserts them in batches, one commit per batch.
+
+    A batch closes once it holds `batch_size` issues or `window` seconds after its first one arrived, whichever comes
+    first. Under load, batches grow while the previous one commits, so the commit cost is shared by more requests.
+    A batch that fails is retried one product at a time, then one issue at a time, so only the bad issues fail.
+    """
+
+    def __init__(self, batch_size: int = INGEST_BATCH_SIZE, window: float = INGEST_WINDOW_SECONDS,
+                 maxsize: int = INGEST_QUEUE_SIZE, ticket_ttl: int = INGEST_TICKET_TTL_SECONDS):
+        self.batch_size = batch_size
+        self.window = window
+        self.ticket_ttl = ticket_ttl
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pending = {}
+        self._failed = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._expired_at = 0.0
+        self._task = None
+
+    def submit(self, payload) -> str:
+        """Returns the payload's ticket; raises queue.Full when the writer is too far behind to take more."""
+        ticket = uuid.uuid4().hex
+        with self._lock:
+            self._pending[ticket] = payload.productId
+        try:
+            self._queue.put_nowait((ticket, payload))
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(ticket, None)
+            rejected.inc()
+            raise
+        queued.inc()
+        return ticket
+
+    def status(self, ticket: str, productId: int):
+        """"queued" while this process holds the ticket, otherwise None; written tickets are in the database.
+
+        "failed" only for tickets whose failure could not be written there either.
+        """
+        with self._lock:
+            if self._pending.get(ticket) == productId:
+                return "queued"
+            if self._failed.get(ticket) == productId:
+                return "failed"
+        return None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def next_batch(self, timeout: float = 0.5) -> list:
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, session_factory, batch: list):
+        tickets = [ticket for ticket, _ in batch]
+        db_session = session_factory()
+        try:
+            if not self._insert(db_session, batch):
+                logger.warning("retrying a failed ingest batch of %s issues in parts", len(batch))
+                self._fail(db_session, self._retry(db_session, batch) if len(batch) > 1 else batch)
+            batch_sizes.observe(len(batch))
+            if time.monotonic() - self._expired_at > 60:
+                self._expired_at = time.monotonic()
+                self._expire(db_session)
+        finally:
+            db_session.close()
+            with self._lock:
+                for ticket in tickets:
+                    self._pending.pop(ticket, None)
+
+    def _expire(self, db_session):
+        try:
+            ingest_crud.expire(db_session, datetime.utcnow() - timedelta(seconds=self.ticket_ttl))
+            db_session.commit()
+        except Exception:
+            logger.exception("expiring ingest tickets failed")
+            db_session.rollback()
+
+    def _insert(self, db_session, batch: list) -> bool:
+        try:
+            issue_crud.bulk_post(db_session, [payload for _, payload in batch], tickets=[ticket for ticket, _ in batch])
+            return True
+        except Exception:
+            logger.warning("inserting %s queued issues failed", len(batch), exc_info=True)
+            db_session.rollback()
+            return False
+
+    def _retry(self, db_session, batch: list) -> list:
+        """Inserts a failed batch product by product, and a failed product's issues one by one; returns what still failed."""
+        by_product = OrderedDict()
+        for ticket, payload in batch:
+            by_product.setdefault(payload.productId, []).append((ticket, payload))
+        failures = []
+        for part in by_product.values():
+            if len(by_product) > 1 and self._insert(db_session, part):
+                continue
+            for item in part:
+                if not self._insert(db_session, [item]):
+                    failures.append(item)
+        return failures
+
+    def _fail(self, db_session, failures: list):
+        if not failures:
+            return
+        failed.inc(len(failures))
+        try:
+            ingest_crud.fail(db_session, [ticket for ticket, _ in failures], [payload.productId for _, payload in failures])
+            db_session.commit()
+            return
+        except Exception:
+            logger.exception("recording %s failed ingest tickets failed", len(failures))
+            db_session.rollback()
+        # The database is unreachable; this worker can still answer for its own tickets.
+        with self._lock:
+            for ticket, payload in failures:
+                self._failed[ticket] = payload.productId
+            while len(self._failed) > FAILED_TICKET_HISTORY:
+                self._failed.popitem(last=False)
+
+    def flush(self, session_factory):
+        """Writes everything queued so far, in batches, on the calling thread."""
+        while True:
+            batch = self.next_batch(timeout=0)
+            if not batch:
+                return
+            self.write(session_factory, batch)
+
+    async def run(self, session_factory):
+        while not self._stopping:
+            batch = await run_in_threadpool(self.next_batch)
+            if batch:
+                await run_in_threadpool(self.write, session_factory, batch)
+        await run_in_threadpool(self.flush, session_factory)
+
+    def start(self, session_factory):
+        self._stopping = False
+        self._task = asyncio.get_event_loop().create_task(self.run(session_factory))
+
+    async def stop(self):
+        """Lets the writer finish what is already queued."""
+        self._stopping = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+ingest_queue = IngestQueue()
+
+registry.collector(lambda: [("ingest_queue_depth", "gauge", "Issues waiting in the ingest queue.", ingest_queue.depth())])
@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from app.metrics import registry
+
+logger = logging.getLogger("app.db.slow_query")
+
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_MS", "500")) / 1000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+requests_total = registry.counter("http_requests_total", "HTTP requests by route and status.", labels=("method", "route", "status"))
+request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", LATENCY_BUCKETS, labels=("method", "route")
+)
+statements = registry.counter("db_statements_total", "SQL statements executed through the SQLAlchemy engine.")
+statement_seconds = registry.histogram("db_statement_duration_seconds", "SQL statement latency.", STATEMENT_BUCKETS)
+statements_per_request = registry.histogram(
+    "db_statements_per_request", "SQL statements issued while serving one request.", STATEMENT_COUNT_BUCKETS, labels=("route",)
+)
+db_seconds_per_request = registry.histogram(
+    "db_time_per_request_seconds", "Time spent in SQL while serving one request.", LATENCY_BUCKETS, labels=("route",)
+)
+slow_queries = registry.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", labels=("route",))
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+current_request = ContextVar("current_request", default=None)
+
+_route_templates = {}
+
+
+def route_template(scope: dict) -> str:
+    # Label by path template, never the raw path, so ids cannot blow up metric cardinality.
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _route_templates.get(endpoint)
+    if template is None:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                template = _route_templates[endpoint] = route.path
+                break
+        else:
+            return "unmatched"
+    return template
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = route_template(scope)
+            requests_total.labels(scope["method"], route, str(status)).inc()
+            request_seconds.labels(scope["method"], route).observe(elapsed)
+            statements_per_request.labels(route).observe(stats.statements)
+            db_seconds_per_request.labels(route).observe(stats.db_seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    statements.inc()
+    statement_seconds.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        route = route_template(stats.scope) if stats is not None else "background"
+        slow_queries.labels(route).inc()
+        logger.warning("slow query %.1fms route=%s: %s", elapsed * 1000, route, " ".join(statement.split())[:500])
+
+
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
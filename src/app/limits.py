@@ -0,0 +1,198 @@
+import math
+import os
+import time
+from collections import OrderedDict
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from app.config import env_flag
+from app.metrics import registry
+
+# Requests per second each client may sustain, keyed by the client address. 0 (the default) disables rate limiting.
+# Buckets are per worker process, so divide by the worker count for a per-deployment figure.
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", str(RATE_LIMIT * 2)))
+RATE_LIMIT_CLIENTS = int(os.getenv("RATE_LIMIT_CLIENTS", "10000"))
+# X-API-Key values that get a bucket of their own, e.g. for clients sharing an address behind NAT. The API does not
+# authenticate keys, so any other value is ignored; otherwise a client could send a fresh key with every request.
+RATE_LIMIT_API_KEYS = frozenset(key.strip() for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip())
+
+# Opt-in: caps the cost of requests in flight and lowers that cap while connection pool checkouts are slow.
+LOAD_SHEDDING = env_flag("LOAD_SHEDDING")
+LOAD_SHED_MAX_CONCURRENCY = int(os.getenv("LOAD_SHED_MAX_CONCURRENCY", "64"))
+LOAD_SHED_MIN_CONCURRENCY = int(os.getenv("LOAD_SHED_MIN_CONCURRENCY", "4"))
+LOAD_SHED_TARGET_WAIT_SECONDS = float(os.getenv("LOAD_SHED_TARGET_WAIT_MS", "20")) / 1000
+LOAD_SHED_INTERVAL_SECONDS = float(os.getenv("LOAD_SHED_INTERVAL_MS", "100")) / 1000
+
+API_KEY_HEADER = b"x-api-key"
+DEFAULT_COST = 1
+
+rate_limited = registry.counter("http_rate_limited_total", "Requests refused with 429 because the client exceeded its rate.")
+shed = registry.counter("http_shed_total", "Requests refused with 503 because the concurrency limit was reached.")
+
+
+def request_cost(cost: int):
+    """Declares how many tokens and concurrency slots a route uses; put it under the router decorator.
+
+    0 exempts the route from both limits, which health checks and long-lived streams need.
+    """
+    def declare(endpoint):
+        endpoint.request_cost = cost
+        return endpoint
+    return declare
+
+
+def route_cost(scope: dict) -> int:
+    # Limits run before routing, so match the route here rather than reading scope["endpoint"].
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route.endpoint, "request_cost", DEFAULT_COST)
+    return DEFAULT_COST
+
+
+def client_key(scope: dict, api_keys=frozenset()) -> str:
+    if api_keys:
+        for name, value in scope.get("headers", []):
+            if name == API_KEY_HEADER and value.decode("latin-1") in api_keys:
+                return "key:" + value.decode("latin-1")
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def _refuse(status: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class TokenBuckets:
+    """One token bucket per client: `rate` tokens a second refill it up to `burst`, and each request takes its cost.
+
+    Only the most recently seen `max_clients` buckets are kept; a forgotten client starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = RATE_LIMIT_CLIENTS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._clock = clock
+        self._buckets = OrderedDict()
+
+    def take(self, key: str, cost: int) -> float:
+        """Takes `cost` tokens from the client's bucket, or returns the seconds until it could, leaving it untouched."""
+        now = self._clock()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        # A route costing more than the burst could never run; let it through on a full bucket instead.
+        cost = min(cost, self.burst)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """Caps the summed cost of requests in flight, adjusting the cap by additive increase and multiplicative decrease.
+
+    At most once per `interval`, when a request finishes: if the recent pool checkout wait is above `target_wait` the
+    cap shrinks by `backoff`, otherwise it grows by one if requests were using all of it. Requests over the cap are
+    refused rather than queued, so the ones admitted keep a bounded latency.
+    """
+
+    def __init__(self, max_limit: int = LOAD_SHED_MAX_CONCURRENCY, min_limit: int = LOAD_SHED_MIN_CONCURRENCY,
+                 target_wait: float = LOAD_SHED_TARGET_WAIT_SECONDS, interval: float = LOAD_SHED_INTERVAL_SECONDS,
+                 backoff: float = 0.75, clock=time.monotonic):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.target_wait = target_wait
+        self.interval = interval
+        self.backoff = backoff
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._saturated = False
+        self._clock = clock
+        self._adjusted = clock()
+
+    def acquire(self, cost: int) -> bool:
+        # A lone request always runs, however expensive, so the cap can never lock a route out entirely.
+        if self.in_flight and self.in_flight + cost > int(self.limit):
+            self._saturated = True
+            return False
+        self.in_flight += cost
+        if self.in_flight >= int(self.limit):
+            self._saturated = True
+        return True
+
+    def release(self, cost: int, wait: float):
+        self.in_flight -= cost
+        now = self._clock()
+        if now - self._adjusted < self.interval:
+            return
+        self._adjusted = now
+        if wait > self.target_wait:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self._saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self._saturated = False
+
+
+class RateLimitMiddleware:
+    """Answers 429 with Retry-After once a client has spent its tokens."""
+
+    def __init__(self, app, buckets: TokenBuckets, api_keys=RATE_LIMIT_API_KEYS):
+        self.app = app
+        self.buckets = buckets
+        self.api_keys = api_keys
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cost = route_cost(scope)
+        wait = self.buckets.take(client_key(scope, self.api_keys), cost) if cost else 0.0
+        if wait:
+            rate_limited.inc()
+            await _refuse(429, "rate limit exceeded", wait)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class LoadShedMiddleware:
+    """Answers 503 with Retry-After while the limiter's cap is used up; `pool_wait()` returns the recent checkout wait."""
+
+    def __init__(self, app, limiter: ConcurrencyLimiter, pool_wait):
+        self.app = app
+        self.limiter = limiter
+        self.pool_wait = pool_wait
+
+    async def __call__(self, scope, receive, send):
+        cost = route_cost(scope) if scope["type"] == "http" else 0
+        if not cost:
+            await self.app(scope, receive, send)
+            return
+        if not self.limiter.acquire(cost):
+            shed.inc()
+            await _refuse(503, "server is overloaded", 1)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(cost, self.pool_wait())
+
+
+def limiter_metrics(limiter: ConcurrencyLimiter) -> list:
+    return [
+        ("http_concurrency_limit", "gauge", "Current cap on the cost of requests in flight.", int(limiter.limit)),
+        ("http_requests_in_flight_cost", "gauge", "Summed cost of requests in flight.", limiter.in_flight),
+    ]
+
+
+rate_limits = TokenBuckets(RATE_LIMIT, RATE_LIMIT_BURST) if RATE_LIMIT > 0 else None
+concurrency_limiter = ConcurrencyLimiter()
+if LOAD_SHEDDING:
+    registry.collector(lambda: limiter_metrics(concurrency_limiter))
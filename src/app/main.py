@@ -1,16 +1,83 @@
 from fastapi import FastAPI
-from app.db.db_factory import engine
-from app.api import status, products, issues
-from app.api.models import Base
+from app.db.db_factory import (
+    DATABASE_ASYNC, DATABASE_REPLICA_URLS, READ_YOUR_WRITES_SECONDS, SessionLocal, dispose_engine, get_database, get_engine,
+    recent_pool_wait,
+)
+from app.api.cache_policy import CachePolicyMiddleware
+from app.compression import COMPRESSION, CompressionMiddleware
+from app.db.replicas import ReadYourWritesMiddleware
+from app.events import EVENTS_BROADCAST, PostgresBroadcast, broker
+from app.ingest import INGEST_BATCHING, ingest_queue
+from app.instrumentation import InstrumentationMiddleware
+from app.limits import LOAD_SHEDDING, LoadShedMiddleware, RateLimitMiddleware, concurrency_limiter, rate_limits
 
-Base.metadata.create_all(engine)
 
+def create_app(database_async: bool = DATABASE_ASYNC) -> FastAPI:
+    """Builds the API. The async routers are only imported in that database mode, and nothing connects until startup.
 
-app = FastAPI()
+    The schema is not created here; run `python -m app.db.migrate` before starting the server.
+    """
+    from app.api import status, search, events
 
-app.include_router(status.router)
-app.include_router(products.router, prefix="/products", tags=["products"])
-app.include_router(issues.router, prefix="/products", tags=["issues"])
+    app = FastAPI()
+    app.add_middleware(CachePolicyMiddleware)
+    if COMPRESSION:
+        app.add_middleware(CompressionMiddleware)
+    if INGEST_BATCHING and database_async:
+        # The async create route writes each issue itself; nothing would ever drain the queue or its tickets.
+        raise RuntimeError("INGEST_BATCHING is not supported with DATABASE_ASYNC")
+    if DATABASE_REPLICA_URLS:
+        app.add_middleware(ReadYourWritesMiddleware, window=READ_YOUR_WRITES_SECONDS)
+    if LOAD_SHEDDING:
+        # The shedder steers by the SQLAlchemy pools' checkout waits, which the async driver's pool does not report.
+        if database_async:
+            raise RuntimeError("LOAD_SHEDDING is not supported with DATABASE_ASYNC")
+        app.add_middleware(LoadShedMiddleware, limiter=concurrency_limiter, pool_wait=recent_pool_wait)
+    # Outside the shedder, so a client over its rate never takes a concurrency slot.
+    if rate_limits is not None:
+        app.add_middleware(RateLimitMiddleware, buckets=rate_limits)
+    app.add_middleware(InstrumentationMiddleware)
 
+    app.include_router(status.router)
+    app.include_router(search.router, prefix="/issues", tags=["search"])
+    app.include_router(events.router, prefix="/products", tags=["events"])
 
+    # The async routers replace the CRUD routes only; search, bulk, stats, changes, transfer, tickets and purge
+    # status run on the SQLAlchemy engine in both modes.
+    from app.api import products, issues
+    if database_async:
+        from app.api import async_products, async_issues
+        app.include_router(async_products.router, prefix="/products", tags=["products"])
+        app.include_router(async_issues.router, prefix="/products", tags=["issues"])
+    else:
+        app.include_router(products.router, prefix="/products", tags=["products"])
+        app.include_router(issues.router, prefix="/products", tags=["issues"])
+    app.include_router(products.shared_router, prefix="/products", tags=["products"])
+    app.include_router(issues.shared_router, prefix="/products", tags=["issues"])
 
+    @app.on_event("startup")
+    async def startup():
+        get_engine()
+        if database_async:
+            await get_database().connect()
+        if EVENTS_BROADCAST == "postgres":
+            broker.transport = PostgresBroadcast(broker, get_engine())
+            broker.transport.start()
+        if INGEST_BATCHING:
+            ingest_queue.start(SessionLocal)
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        if INGEST_BATCHING:
+            await ingest_queue.stop()
+        if EVENTS_BROADCAST == "postgres":
+            broker.transport.stop()
+            broker.transport = None
+        if database_async:
+            await get_database().disconnect()
+        dispose_engine()
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,111 @@
+import threading
+from bisect import bisect_left
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {"buckets": buckets, "count": cumulative, "sum": total}
+
+
+class Family:
+    """One child metric per distinct label tuple, created on first use."""
+
+    def __init__(self, factory, labels):
+        self.label_names = tuple(labels)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labels=()):
+        return self._register(name, "counter", help, Family(Counter, labels) if labels else Counter())
+
+    def histogram(self, name: str, help: str, buckets, labels=()):
+        factory = lambda: Histogram(buckets)
+        return self._register(name, "histogram", help, Family(factory, labels) if labels else factory())
+
+    def collector(self, collect):
+        # collect() returns (name, type, help, metric) tuples for values owned elsewhere, e.g. pool or cache stats.
+        self._collectors.append(collect)
+
+    def _register(self, name: str, kind: str, help: str, metric):
+        self._metrics.append((name, kind, help, metric))
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        metrics = list(self._metrics)
+        for collect in self._collectors:
+            metrics.extend(collect())
+        for name, kind, help, metric in metrics:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            children = [((), metric)] if not isinstance(metric, Family) else metric.items()
+            names = () if not isinstance(metric, Family) else metric.label_names
+            for values, child in children:
+                labels = dict(zip(names, values))
+                if kind == "histogram":
+                    snapshot = child.snapshot()
+                    for bound, count in snapshot["buckets"].items():
+                        lines.append(f"{name}_bucket{_labels(dict(labels, le=bound))} {count}")
+                    lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+                    lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {child.value if isinstance(child, Counter) else child}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
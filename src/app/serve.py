@@ -0,0 +1,184 @@
+"""Production server: gunicorn managing uvicorn workers.
+
+    python -m app.serve
+    python -m app.serve --workers 8 --db-max-connections 80
+
+Run migrations first (`python -m app.db.migrate`); workers never touch the schema. Send SIGHUP to the master for a
+graceful restart: new workers start and old ones finish their in-flight requests before exiting.
+"""
+import argparse
+import os
+import sys
+
+
+def _env_int(name: str, default: int = None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def available_cores() -> int:
+    """CPUs this process may run on, capped by a container CPU quota when there is one."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cores = min(cores, max(1, int(quota + 0.5)))
+    return cores
+
+
+def _cgroup_cpu_quota():
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f, open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as g:
+                quota, period = f.read().strip(), g.read().strip()
+        except OSError:
+            return None
+    if quota in ("max", "-1"):
+        return None
+    return int(quota) / int(period)
+
+
+def worker_count(cores: int, per_core: float = 1.0, maximum: int = None) -> int:
+    # Each uvicorn worker is a full event loop, so one per core is the starting point; sync routes add a threadpool on top.
+    workers = max(1, int(cores * per_core))
+    return min(workers, maximum) if maximum else workers
+
+
+def pool_budget(max_connections: int, workers: int, pool_size: int, max_overflow: int, reserved: int = 0):
+    """Splits a global connection budget into (pool size, max overflow) per worker, never exceeding the configured values.
+
+    `reserved` connections per worker are held outside the pool and come off its share first.
+    """
+    per_worker = max_connections // workers - reserved
+    if per_worker < 1:
+        raise ValueError(f"a budget of {max_connections} connections cannot serve {workers} workers")
+    size = min(pool_size, per_worker)
+    return size, min(max_overflow, per_worker - size)
+
+
+def worker_class() -> str:
+    # uvloop and httptools come with uvicorn on Linux; fall back to asyncio and h11 where they are missing.
+    try:
+        import uvloop, httptools  # noqa: F401
+        return "uvicorn.workers.UvicornWorker"
+    except ImportError:
+        return "uvicorn.workers.UvicornH11Worker"
+
+
+def gunicorn_options(args) -> dict:
+    return {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": worker_class(),
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "keepalive": args.keep_alive,
+        "accesslog": "-" if args.access_log else None,
+        "errorlog": "-",
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=_env_int("PORT", 8000))
+    parser.add_argument("--workers", type=int, default=_env_int("WEB_CONCURRENCY"), help="defaults to one per available core")
+    parser.add_argument("--workers-per-core", type=float, default=float(os.getenv("WORKERS_PER_CORE", "1")))
+    parser.add_argument("--max-workers", type=int, default=_env_int("MAX_WORKERS"))
+    parser.add_argument("--max-requests", type=int, default=_env_int("MAX_REQUESTS", 10000), help="recycle a worker after this many requests, 0 never")
+    parser.add_argument("--max-requests-jitter", type=int, default=_env_int("MAX_REQUESTS_JITTER", 1000))
+    parser.add_argument("--timeout", type=int, default=_env_int("WORKER_TIMEOUT", 60), help="seconds before a silent worker is killed")
+    parser.add_argument("--graceful-timeout", type=int, default=_env_int("GRACEFUL_TIMEOUT", 30))
+    parser.add_argument("--keep-alive", type=int, default=_env_int("KEEP_ALIVE", 5))
+    parser.add_argument(
+        "--db-max-connections", type=int, default=_env_int("DB_MAX_CONNECTIONS"),
+        help="connections the database allows this deployment in total; split across workers",
+    )
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+    if args.workers is None:
+        args.workers = worker_count(available_cores(), args.workers_per_core, args.max_workers)
+    return args
+
+
+def configure_pool(args):
+    if args.db_max_connections is None:
+        return
+    # Workers import db_factory after the fork, so the sizes are handed down through the environment.
+    # A Postgres event broadcast keeps one LISTEN connection per worker open beside the pool.
+    reserved = 1 if os.getenv("EVENTS_BROADCAST") == "postgres" else 0
+    size, overflow = pool_budget(
+        args.db_max_connections, args.workers, _env_int("DB_POOL_SIZE", 5), _env_int("DB_MAX_OVERFLOW", 10), reserved
+    )
+    os.environ["DB_POOL_SIZE"] = str(size)
+    os.environ["DB_MAX_OVERFLOW"] = str(overflow)
+
+
+def configure_cache(args):
+    """Keeps several workers from serving each other's stale rows out of separate in-process caches."""
+    if args.workers < 2:
+        return
+    backend = os.getenv("CACHE_BACKEND")
+    if backend is None:
+        os.environ["CACHE_BACKEND"] = "none"
+        print(
+            f"{args.workers} workers cannot share the in-process cache, so it is off; set CACHE_BACKEND=redis to cache",
+            file=sys.stderr,
+        )
+    elif backend == "memory":
+        print(
+            f"CACHE_BACKEND=memory with {args.workers} workers: each caches on its own, and reads can be up to CACHE_TTL "
+            "seconds stale after another worker's write",
+            file=sys.stderr,
+        )
+
+
+def configure_events(args):
+    """Relays events through Postgres when several workers would otherwise each stream only their own writes."""
+    if args.workers < 2:
+        return
+    broadcast = os.getenv("EVENTS_BROADCAST")
+    if broadcast is None:
+        if not os.getenv("DATABASE_URL", "").startswith("postgres"):
+            raise SystemExit(
+                f"{args.workers} workers need EVENTS_BROADCAST=postgres, which needs a Postgres DATABASE_URL; "
+                "set EVENTS_BROADCAST=local to accept that event streams only see their own worker's writes"
+            )
+        os.environ["EVENTS_BROADCAST"] = "postgres"
+    elif broadcast == "local":
+        print(
+            f"EVENTS_BROADCAST=local with {args.workers} workers: event streams only see writes handled by their own worker",
+            file=sys.stderr,
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_events(args)
+    configure_pool(args)
+    configure_cache(args)
+
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for name, value in gunicorn_options(args).items():
+                if value is not None:
+                    self.cfg.set(name, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    Server().run()
+
+
+if __name__ == "__main__":
+    main()
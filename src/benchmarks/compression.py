@@ -0,0 +1,45 @@
+"""Measure bandwidth saved against CPU spent for each available response encoding and level on an issue list page.
+
+    python -m benchmarks.compression --rows 1000 --repeat 10
+
+No database or server is needed: the payload is the JSON the fast path renders for `--rows` in-memory issues.
+Brotli and zstd are measured only when their packages are installed.
+"""
+import argparse
+
+from app.compression import available_encodings, compress
+from benchmarks.serialization import best_of, fast_path, make_rows
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 11), "zstd": (1, 3, 19)}
+
+
+def run(rows: int, repeat: int, encodings: list = None) -> list:
+    _, tuples = make_rows(rows)
+    payload = fast_path(tuples)
+    results = []
+    for encoding in encodings or available_encodings():
+        for level in LEVELS[encoding]:
+            size = len(compress(payload, encoding, level))
+            seconds = best_of(lambda: compress(payload, encoding, level), repeat)
+            results.append({
+                "encoding": encoding, "level": level, "bytes": len(payload), "compressed": size,
+                "ratio": round(len(payload) / size, 1), "ms": round(seconds * 1000, 3),
+                "mb_per_s": round(len(payload) / seconds / 1e6, 1),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    for result in run(args.rows, args.repeat):
+        print(
+            f"{result['encoding']:>4} level {result['level']:>2}: {result['bytes']} -> {result['compressed']} bytes "
+            f"({result['ratio']}x) in {result['ms']} ms, {result['mb_per_s']} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
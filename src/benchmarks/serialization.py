@@ -0,0 +1,72 @@
+"""Time the response-model serialization path against the fast JSON path for an issue list page.
+
+    python -m benchmarks.serialization --rows 1000 --repeat 20
+
+No database or server is needed: rows are built in memory, once as ORM instances and once as projected tuples.
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import List
+
+from fastapi.routing import APIRoute, serialize_response
+from starlette.responses import JSONResponse
+
+from app.api.fast_json import FastJSONResponse, rows_to_dicts
+from app.api.models import Issue, IssueResponse
+
+FIELDS = list(IssueResponse.__fields__)
+
+
+def make_rows(count: int):
+    issues = []
+    for number in range(count):
+        issue = Issue(
+            title=f"issue {number}", description="benchmark issue", productId=1, createdBy="bench", updatedBy="bench",
+            updatedDate=datetime(2020, 8, 23, 23, 28, 56, number % 1000000), assignedTo=f"user-{number % 50}", status="open",
+        )
+        issue.id = number + 1
+        issue.createdDate = datetime(2020, 8, 23, 12, 0, 0)
+        issues.append(issue)
+    return issues, [tuple(getattr(issue, name) for name in FIELDS) for issue in issues]
+
+
+def model_path(field, issues) -> bytes:
+    # What FastAPI does for response_model=List[IssueResponse]: validate every row, jsonable_encoder, stdlib json.
+    return JSONResponse(serialize_response(field=field, response=issues)).body
+
+
+def fast_path(rows) -> bytes:
+    return FastJSONResponse(rows_to_dicts(rows, FIELDS)).body
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(rows: int, repeat: int) -> dict:
+    field = APIRoute("/", lambda: None, response_model=List[IssueResponse]).response_field
+    issues, tuples = make_rows(rows)
+    if model_path(field, issues) != fast_path(tuples):
+        raise AssertionError("fast path output differs from the response model output")
+    model = best_of(lambda: model_path(field, issues), repeat)
+    fast = best_of(lambda: fast_path(tuples), repeat)
+    return {"rows": rows, "model_ms": round(model * 1000, 3), "fast_ms": round(fast * 1000, 3), "speedup": round(model / fast, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    result = run(args.rows, args.repeat)
+    print(f"{result['rows']} rows: response model {result['model_ms']} ms, fast path {result['fast_ms']} ms, {result['speedup']}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from urllib.error import URLError
+from urllib.request import urlopen
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@contextmanager
+def running_server(env: dict, port: int = 8765, args=None, startup_timeout: float = 30.0):
+    env = {**os.environ, **env}
+    subprocess.run([sys.executable, "-m", "app.db.migrate"], cwd=SRC_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    command = args or [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=SRC_DIR, env=env)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}/status/", startup_timeout)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def wait_until_ready(url: str, timeout: float) -> float:
+    started = time.perf_counter()
+    while True:
+        try:
+            with urlopen(url) as response:
+                response.read()
+            return time.perf_counter() - started
+        except (URLError, ConnectionError):
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"server at {url} did not become ready in {timeout}s")
+            time.sleep(0.05)
@@ -0,0 +1,100 @@
+"""Measure cold start: module import time (python -X importtime) and time to the first HTTP response.
+
+    python -m benchmarks.startup --database-url sqlite:////tmp/startup.db --runs 5
+
+Every run starts a fresh interpreter. Results are written to benchmarks/results/startup-<commit>-<time>.json
+so cold start can be tracked across commits next to the load suite results.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.request import urlopen
+
+from benchmarks.server import SRC_DIR, wait_until_ready
+from benchmarks.suite import RESULTS_DIR, git_revision
+
+
+def parse_importtime(output: str) -> list:
+    """Returns (module, self_us, cumulative_us) for every line `python -X importtime` wrote."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def import_profile(module: str, env: dict, top: int = 10) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=SRC_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    modules = parse_importtime(result.stderr)
+    total = next(cumulative for name, _, cumulative in modules if name == module)
+    slowest = sorted(modules, key=lambda entry: entry[1], reverse=True)[:top]
+    return {"import_ms": round(total / 1000, 1), "slowest_self_ms": {name: round(self_us / 1000, 1) for name, self_us, _ in slowest}}
+
+
+def first_response(env: dict, port: int, timeout: float = 30.0) -> dict:
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=SRC_DIR, env=env)
+    try:
+        ready = wait_until_ready(f"http://127.0.0.1:{port}/status/", timeout)
+        # The first request that needs the database also pays for the driver import and the first connection.
+        with urlopen(f"http://127.0.0.1:{port}/products/") as response:
+            response.read()
+        first_query = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {"ready_ms": round(ready * 1000, 1), "first_query_ms": round(first_query * 1000, 1)}
+
+
+def run(args) -> dict:
+    env = {**os.environ, "DATABASE_URL": args.database_url}
+    subprocess.run([sys.executable, "-m", "app.db.migrate"], cwd=SRC_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    imports = [import_profile("app.main", env) for _ in range(args.runs)]
+    responses = [first_response(env, args.port) for _ in range(args.runs)]
+
+    def median(runs, key):
+        return round(statistics.median(run[key] for run in runs), 1)
+
+    return {
+        "meta": dict(git_revision(), timestamp=datetime.utcnow().isoformat(), runs=args.runs, database=args.database_url.split(":")[0]),
+        "import_ms": median(imports, "import_ms"),
+        "ready_ms": median(responses, "ready_ms"),
+        "first_query_ms": median(responses, "first_query_ms"),
+        "slowest_self_ms": imports[-1]["slowest_self_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement; the median is reported")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default=None, help="results file, defaults to benchmarks/results/startup-<commit>-<time>.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"import app.main {report['import_ms']} ms, ready {report['ready_ms']} ms, first query {report['first_query_ms']} ms", file=sys.stderr)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"startup-{report['meta']['commit'] or 'unknown'}-{stamp}.json")
+    with open(output, "w") as results_file:
+        json.dump(report, results_file, indent=2)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,124 @@
+import json
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from starlette.testclient import TestClient
 
-from app.main import app
+from app.main import app, create_app
+from app.db import migrations, search_crud
+from app.db.cache import cache
+from app.db.db_factory import get_db, get_read_db
 
 
 @pytest.fixture(scope="module")
 def test_app():
     client = TestClient(app)
-    yield client
\ No newline at end of file
+    yield client
+
+
+@pytest.fixture(scope="module")
+def test_async_app():
+    client = TestClient(create_app(database_async=True))
+    yield client
+
+
+@pytest.fixture
+def db_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    migrations.upgrade(engine)
+    cache.clear()
+    search_crud.reset()
+    yield engine
+    cache.clear()
+    search_crud.reset()
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def db_app(db_engine):
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_read_db, None)
+
+
+@pytest.fixture
+def product_payload():
+    return {"title": "product 1", "description": "something", "productOwner": "foo", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000"}
+
+
+@pytest.fixture
+def issue_payload():
+    return {"title": "issue title 1", "description": "something happened", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status": "open"}
+
+
+@pytest.fixture
+def create_issue(db_app, issue_payload):
+    """Posts one issue to the product, with `fields` over issue_payload, and returns its id."""
+
+    def create(productId, **fields):
+        body = dict(issue_payload, productId=productId, **fields)
+        return db_app.post(f"/products/{productId}/issues/", data=json.dumps(body)).json()["id"]
+
+    return create
+
+
+@pytest.fixture
+def create_product(db_app, product_payload, issue_payload):
+    """Posts a product, with `fields` over product_payload, and returns its id.
+
+    `issues` adds that many issues titled "issue 0", "issue 1"..., or one issue per dict of fields over issue_payload,
+    in one bulk request.
+    """
+
+    def create(issues=0, **fields):
+        productId = db_app.post("/products/", data=json.dumps(dict(product_payload, **fields))).json()["id"]
+        if isinstance(issues, int):
+            issues = [{"title": f"issue {number}"} for number in range(issues)]
+        if issues:
+            db_app.post(f"/products/{productId}/issues/bulk", data=json.dumps([dict(issue_payload, **issue) for issue in issues]))
+        return productId
+
+    return create
+
+
+@pytest.fixture
+def query_budget(db_engine):
+    """Fails the test when the block runs more statements than the budget for the engine's dialect."""
+
+    @contextmanager
+    def budget(**limits):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(db_engine, "before_cursor_execute", record)
+        limit = limits[db_engine.dialect.name]
+        assert len(statements) <= limit, f"{len(statements)} statements over a budget of {limit}:\n" + "\n".join(statements)
+
+    return budget
@@ -0,0 +1,189 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from databases import DatabaseURL
+
+from app import main
+from app.api.models import IssueSchema
+from app.db import async_issue_crud, async_product_crud
+from app.db.cache import cache
+
+
+def test_async_post_creates_product_successfully_with_valid_data(test_async_app, monkeypatch):
+    test_data = {"title": "issue on something 1", "description": "something happened 1", "id": 1, "productOwner": "foo", "createdBy": "foo",  "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000+00:00"}
+
+    async def mock_post(payload):
+        return test_data
+
+    monkeypatch.setattr(async_product_crud, "post", mock_post)
+
+    response = test_async_app.post("/products/", data=json.dumps(test_data))
+    assert response.status_code == 201
+    assert response.json() == test_data
+
+
+def test_async_put_update_product_fails_when_product_does_not_exist(test_async_app, monkeypatch):
+    test_data = {"title": "foo", "description": "bar", "productOwner": "foo", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000+00:00"}
+
+    async def mock_put(id, title, description, productOwner, createdBy, updatedBy, updatedDate, version):
+        return None
+
+    monkeypatch.setattr(async_product_crud, "put", mock_put)
+
+    response = test_async_app.put("/products/999/", data=json.dumps(test_data))
+    assert response.status_code == 404
+    assert response.json()["detail"] == "product not found"
+
+
+def test_async_get_reads_issues_page_with_next_cursor_link(test_async_app, monkeypatch):
+    test_data = [
+        {"title": "issue title 1", "description": "something happened 1", "id": 1, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"},
+        {"title": "issue title 2", "description": "something happened 2", "id": 2, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
+    ]
+
+    async def mock_get_all(productId, limit, after, **params):
+        return [issue for issue in test_data if after is None or issue["id"] > after][:limit]
+
+    monkeypatch.setattr(async_issue_crud, "get_all_by_product", mock_get_all)
+
+    response = test_async_app.get("/products/1/issues/?limit=1")
+    assert response.status_code == 200
+    assert response.json() == test_data[:1]
+
+    response = test_async_app.get(response.headers["link"].split(";")[0].strip("<>"))
+    assert response.status_code == 200
+    assert response.json() == test_data[1:]
+
+
+def test_async_post_create_issue_fails_when_product_does_not_exist(test_async_app, monkeypatch):
+    test_data = {"title": "issue title 1", "description": "something happened 1", "id": 1, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
+
+    async def mock_get_product(id):
+        return None
+
+    monkeypatch.setattr(async_product_crud, "get", mock_get_product)
+
+    response = test_async_app.post("/products/1/issues/", data=json.dumps(test_data))
+    assert response.status_code == 404
+    assert response.json()["detail"] == "product not found! Must create product first"
+
+
+def test_async_delete_removes_issue_successfully_when_issue_exists(test_async_app, monkeypatch):
+    test_data = {"title": "something happened 1", "description": "something happened 1", "id": 1, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
+
+    async def mock_delete(productId, id, version):
+        return test_data
+
+    monkeypatch.setattr(async_issue_crud, "delete", mock_delete)
+
+    response = test_async_app.delete("/products/1/issues/1/")
+    assert response.status_code == 200
+    assert response.json() == test_data
+
+
+def test_async_put_passes_the_payload_so_issues_can_move(test_async_app, monkeypatch):
+    test_data = {"title": "issue title 1", "description": "something happened 1", "id": 1, "productId": 2,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold", "version": 2}
+    calls = []
+
+    async def mock_put(productId, id, payload, version):
+        calls.append((productId, id, payload.productId, version))
+        return test_data
+
+    monkeypatch.setattr(async_issue_crud, "put", mock_put)
+
+    response = test_async_app.put("/products/1/issues/1/", data=json.dumps(test_data))
+    assert response.status_code == 200
+    assert calls == [(1, 1, 2, None)]
+
+
+def test_async_issue_listing_passes_filters_sort_and_fields_to_the_crud(test_async_app, monkeypatch):
+    rows = [{"id": 2, "title": "newest", "createdDate": "2020-08-24T00:00:00"}, {"id": 1, "title": "older", "createdDate": "2020-08-23T00:00:00"}]
+    calls = []
+
+    async def mock_get_all(productId, limit, after, after_value, sort, filters, fields):
+        calls.append((filters["status"], filters["assignedTo"], sort, fields))
+        return rows[:limit]
+
+    monkeypatch.setattr(async_issue_crud, "get_all_by_product", mock_get_all)
+
+    response = test_async_app.get("/products/1/issues/?status=open&assignedTo=bar&sort=-createdDate&fields=title&limit=1")
+    assert response.status_code == 200
+    assert response.json() == [{"id": 2, "title": "newest"}]
+    assert calls == [("open", "bar", "-createdDate", ["title", "id"])]
+    assert "after=" in response.headers["link"]
+    assert test_async_app.get("/products/1/issues/?fields=nope").status_code == 400
+
+
+def test_async_product_listing_pages_and_embeds_includes(test_async_app, monkeypatch):
+    products = [{"id": id, "title": f"product {id}", "description": "something", "productOwner": "foo", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "version": 1} for id in (1, 2)]
+
+    async def mock_get_all(fields, limit, after):
+        return [product for product in products if after is None or product["id"] > after][:limit]
+
+    async def mock_count(productIds):
+        return {1: 3}
+
+    monkeypatch.setattr(async_product_crud, "get_all", mock_get_all)
+    monkeypatch.setattr(async_issue_crud, "count_by_product", mock_count)
+
+    response = test_async_app.get("/products/?limit=1&include=issue_counts")
+    assert response.status_code == 200
+    assert [(product["id"], product["issueCount"]) for product in response.json()] == [(1, 3)]
+    response = test_async_app.get(response.headers["link"].split(";")[0].strip("<>"))
+    assert [(product["id"], product["issueCount"]) for product in response.json()] == [(2, 0)]
+
+
+def test_async_mode_serves_the_routes_that_run_on_the_sqlalchemy_engine(test_async_app):
+    paths = {route.path for route in test_async_app.app.routes}
+    assert {
+        "/products/stats", "/products/{id}/purge", "/products/{productId}/issues/bulk", "/products/{productId}/issues/stats",
+        "/products/{productId}/issues/changes", "/products/{productId}/issues/export", "/products/{productId}/issues/import",
+        "/products/{productId}/issues/tickets/{ticket}", "/issues/search",
+    } <= paths
+
+
+def test_ingest_batching_refuses_the_async_mode(monkeypatch):
+    monkeypatch.setattr(main, "INGEST_BATCHING", True)
+    with pytest.raises(RuntimeError, match="DATABASE_ASYNC"):
+        main.create_app(database_async=True)
+
+
+class FakeDatabase:
+    url = DatabaseURL("postgresql://localhost/test")
+
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def fetch_one(self, query):
+        self.queries.append(str(query))
+        return self.row
+
+    async def execute(self, query):
+        self.queries.append(str(query))
+
+    async def execute_many(self, query, values):
+        self.queries += [str(query.values(**value)) for value in values]
+
+
+def test_async_issue_move_revives_and_invalidates_the_read_cache(monkeypatch, issue_payload):
+    row = dict(issue_payload, id=7, productId=2, createdDate=datetime(2020, 8, 23), version=2, changeSeq=1)
+    database = FakeDatabase(row)
+    monkeypatch.setattr(async_issue_crud, "get_database", lambda: database)
+    versions = [cache.version(name) for name in ("issues:1", "issues:2", "issue-rows:1:v0:issue:7")]
+
+    asyncio.run(async_issue_crud.put(productId=1, id=7, payload=IssueSchema(**dict(issue_payload, productId=2))))
+
+    assert [cache.version(name) for name in ("issues:1", "issues:2", "issue-rows:1:v0:issue:7")] > versions
+    assert sum(query.startswith("DELETE FROM issue_tombstones") for query in database.queries) == 1
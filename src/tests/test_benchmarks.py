@@ -0,0 +1,44 @@
+from benchmarks import compression, overload, scaling, serialization, transfer
+from benchmarks.suite import compare
+
+
+def result(rps, p95_ms, queries_per_request):
+    return {"rps": rps, "p95_ms": p95_ms, "queries_per_request": queries_per_request}
+
+
+def test_compare_flags_throughput_latency_and_query_regressions():
+    base = {"results": {"sync": {"product_get": result(500, 10, 1.0), "issue_put": result(100, 50, 2.0), "status": result(2000, 2, 0.0)}}}
+    head = {"results": {"sync": {"product_get": result(400, 10, 1.0), "issue_put": result(100, 70, 3.0), "status": result(1950, 2.1, 0.0)}}}
+
+    rows = {row["scenario"]: row["regressions"] for row in compare(base, head, threshold=0.1)}
+    assert rows == {"product_get": ["rps"], "issue_put": ["p95", "queries"], "status": []}
+
+
+def test_serialization_benchmark_checks_both_paths_agree():
+    result = serialization.run(rows=20, repeat=1)
+    assert result["rows"] == 20
+    assert result["model_ms"] > 0 and result["fast_ms"] > 0
+
+
+def test_scaling_is_relative_to_the_smallest_worker_count():
+    results = {1: {"rps": 400}, 2: {"rps": 780}, 4: {"rps": 1500}}
+    assert scaling.scaling(results) == {1: 1.0, 2: 1.95, 4: 3.75}
+
+
+def test_compression_benchmark_reports_every_gzip_level():
+    results = compression.run(rows=50, repeat=1, encodings=["gzip"])
+    assert [result["level"] for result in results] == [1, 6, 9]
+    assert all(result["compressed"] < result["bytes"] for result in results)
+
+
+def test_transfer_benchmark_imports_and_exports_every_row(tmp_path):
+    result = transfer.run(f"sqlite:///{tmp_path}/bench.db", rows=30, format="csv", batch_size=7)
+    assert result["rows"] == 30
+    assert result["import_rows_per_s"] > 0 and result["export_rows_per_s"] > 0
+
+
+def test_overload_tally_counts_refusals_apart_from_answers_and_errors():
+    samples = [(200, 0.01), (200, 0.03), (429, 0.001), (503, 0.002), (None, 1.0), (404, 0.02)]
+    result = overload.tally(samples, elapsed=2)
+    assert (result["ok"], result["refused"], result["errors"]) == (2, 2, 2)
+    assert (result["ok_rps"], result["p99_ms"]) == (1.0, 30.0)
@@ -0,0 +1,127 @@
+import pytest
+from sqlalchemy import event
+
+from app.api.models import IssueSchema, Product, ProductSchema
+from app.db import issue_crud, product_crud
+from app.db.cache import MISSING, MemoryCache, forget, get_or_load
+
+
+@pytest.fixture
+def product(product_payload):
+    return ProductSchema(**product_payload)
+
+
+@pytest.fixture
+def issue_schema(issue_payload):
+    def issue_schema(productId, **fields):
+        return IssueSchema(**dict(issue_payload, productId=productId, **fields))
+
+    return issue_schema
+
+
+def count_queries(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_memory_cache_evicts_least_recently_used_entries():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    info = cache.info()
+    assert (info["hits"], info["misses"], info["evictions"]) == (2, 1, 1)
+
+
+def test_memory_cache_expires_entries_after_ttl():
+    now = [0.0]
+    cache = MemoryCache(ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    now[0] = 10.5
+
+    assert cache.get("a") is MISSING
+    assert cache.info()["expirations"] == 1
+
+
+def test_memory_cache_namespace_versions_survive_clearing_entries():
+    cache = MemoryCache(max_entries=1)
+    cache.bump("issues:1")
+    cache.set("other", 1)
+    assert cache.version("issues:1") == 1
+
+
+def test_memory_cache_versions_stay_bounded_without_going_back():
+    cache = MemoryCache(max_entries=2)
+    cache.bump("a")
+    bumped = cache.version("a")
+    cache.bump("b")
+    cache.bump("c")
+
+    assert len(cache._versions) == 2
+    assert cache.version("a") >= bumped
+    assert cache.version("never bumped") >= bumped
+
+
+def test_a_row_forgotten_while_loading_is_not_cached(db_engine, db_session, product):
+    productId = product_crud.post(db_session, product).id
+    stale = db_session.query(Product).get(productId)
+
+    def load_then_write():
+        # A writer commits and forgets the row after this reader loaded it but before the fill.
+        forget(f"product:{productId}")
+        return stale
+
+    get_or_load(db_session, Product, f"product:{productId}", load_then_write)
+    statements = count_queries(db_engine)
+    product_crud.get(db_session, productId)
+    assert len(statements) == 1
+
+
+def test_product_reads_are_served_from_cache_until_written(db_engine, db_session, product):
+    productId = product_crud.post(db_session, product).id
+    statements = count_queries(db_engine)
+
+    assert product_crud.get(db_session, productId).title == "product 1"
+    assert product_crud.get(db_session, productId).title == "product 1"
+    assert [product.title for product in product_crud.get_all(db_session)] == ["product 1"]
+    assert [product.title for product in product_crud.get_all(db_session)] == ["product 1"]
+    assert len(statements) == 2
+
+    product_crud.put(db_session, productId, product.copy(update={"title": "renamed"}))
+    db_session.expunge_all()
+    assert product_crud.get(db_session, productId).title == "renamed"
+    assert [product.title for product in product_crud.get_all(db_session)] == ["renamed"]
+
+
+def test_issue_writes_invalidate_cached_issue_reads(db_engine, db_session, product, issue_schema):
+    productId = product_crud.post(db_session, product).id
+    issueId = issue_crud.post(db_session, issue_schema(productId)).id
+    assert [row.title for row in issue_crud.get_all_by_product(db_session, productId, limit=10)] == ["issue title 1"]
+    assert issue_crud.get_by_id(db_session, productId, issueId).status == "open"
+
+    issue_crud.post(db_session, issue_schema(productId, title="issue title 2"))
+    assert len(issue_crud.get_all_by_product(db_session, productId, limit=10)) == 2
+
+    issue_crud.put(db_session, productId, issueId, issue_schema(productId, status="closed"))
+    db_session.expunge_all()
+    assert issue_crud.get_by_id(db_session, productId, issueId).status == "closed"
+
+    issue_crud.delete(db_session, productId, issueId)
+    assert issue_crud.get_by_id(db_session, productId, issueId) is None
+    assert [row.title for row in issue_crud.get_all_by_product(db_session, productId, limit=10)] == ["issue title 2"]
+
+
+def test_projected_issue_listings_are_cached(db_engine, db_session, product, issue_schema):
+    productId = product_crud.post(db_session, product).id
+    issue_crud.post(db_session, issue_schema(productId))
+    statements = count_queries(db_engine)
+
+    first = issue_crud.get_all_by_product(db_session, productId, limit=10, fields=["title", "id"])
+    second = issue_crud.get_all_by_product(db_session, productId, limit=10, fields=["title", "id"])
+    assert [(row.title, row.id) for row in first] == [(row.title, row.id) for row in second]
+    assert len(statements) == 1
@@ -0,0 +1,67 @@
+import json
+
+
+def pull(db_app, productId, since=None, limit=100):
+    params = {"limit": limit} if since is None else {"since": since, "limit": limit}
+    response = db_app.get(f"/products/{productId}/issues/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_changes_return_only_writes_after_the_token(db_app, create_product, create_issue, issue_payload):
+    productId = create_product()
+    first, second, third = (create_issue(productId, title=title) for title in ("one", "two", "three"))
+
+    full = pull(db_app, productId)
+    assert [issue["id"] for issue in full["changed"]] == [first, second, third]
+    assert full["deleted"] == [] and full["more"] is False
+
+    assert pull(db_app, productId, full["next"]) == {"changed": [], "deleted": [], "next": full["next"], "more": False}
+
+    body = dict(issue_payload, title="two again", productId=productId)
+    db_app.put(f"/products/{productId}/issues/{second}/", data=json.dumps(body))
+    db_app.delete(f"/products/{productId}/issues/{first}/")
+    delta = pull(db_app, productId, full["next"])
+    assert [issue["title"] for issue in delta["changed"]] == ["two again"]
+    assert delta["deleted"] == [first]
+
+    # A full sync only lists what still exists.
+    assert [issue["id"] for issue in pull(db_app, productId)["changed"]] == [third, second]
+
+
+def test_changes_page_through_with_more(db_app, create_product, create_issue):
+    productId = create_product()
+    start = pull(db_app, productId)["next"]
+    ids = [create_issue(productId, title=f"issue {n}") for n in range(5)]
+    db_app.delete(f"/products/{productId}/issues/{ids[0]}/")
+
+    seen, deleted, token, more = [], [], start, True
+    while more:
+        page = pull(db_app, productId, token, limit=2)
+        seen += [issue["id"] for issue in page["changed"]]
+        deleted += page["deleted"]
+        token, more = page["next"], page["more"]
+    assert seen == ids[1:]
+    assert deleted == [ids[0]]
+
+
+def test_moved_issues_are_deleted_from_the_old_product(db_app, create_product, create_issue, issue_payload):
+    source = create_product()
+    target = create_product()
+    id = create_issue(source, title="moving")
+    tokens = {productId: pull(db_app, productId)["next"] for productId in (source, target)}
+
+    db_app.put(f"/products/{source}/issues/{id}/", data=json.dumps(dict(issue_payload, productId=target)))
+    assert pull(db_app, source, tokens[source])["deleted"] == [id]
+    assert [issue["id"] for issue in pull(db_app, target, tokens[target])["changed"]] == [id]
+
+    db_app.put(f"/products/{target}/issues/{id}/", data=json.dumps(dict(issue_payload, productId=source)))
+    back = pull(db_app, source, tokens[source])
+    assert [issue["id"] for issue in back["changed"]] == [id]
+    assert back["deleted"] == []
+
+
+def test_changes_reject_bad_tokens_and_unknown_products(db_app, create_product):
+    productId = create_product()
+    assert db_app.get(f"/products/{productId}/issues/changes", params={"since": "not-a-token"}).status_code == 400
+    assert db_app.get("/products/999/issues/changes").status_code == 404
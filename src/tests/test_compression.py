@@ -0,0 +1,86 @@
+import gzip
+import json
+
+from fastapi import FastAPI
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.testclient import TestClient
+
+from app.compression import CompressionMiddleware, choose_encoding
+
+LINE = b'{"id": 1, "title": "a line of newline-delimited json"}\n'
+
+
+def raw_client(minimum_size=100):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size, encodings=["gzip"])
+
+    @app.get("/text")
+    def text(size: int):
+        return PlainTextResponse("x" * size)
+
+    @app.get("/stream")
+    def stream(lines: int, media_type: str = "application/x-ndjson"):
+        return StreamingResponse((LINE for _ in range(lines)), media_type=media_type)
+
+    return TestClient(app)
+
+
+def fetch(client, url):
+    # Undecoded, so the test sees exactly what went over the wire.
+    response = client.get(url, headers={"Accept-Encoding": "gzip"}, stream=True)
+    return response, response.raw.read(decode_content=False)
+
+
+def test_choose_encoding_follows_q_values_then_server_preference():
+    assert choose_encoding("gzip, br", ["zstd", "br", "gzip"]) == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("*;q=0.1, gzip;q=0", ["gzip"]) is None
+    assert choose_encoding("identity", ["gzip"]) is None
+    assert choose_encoding("*", ["br", "gzip"]) == "br"
+
+
+def test_small_bodies_go_out_uncompressed_and_large_ones_gzipped():
+    client = raw_client()
+
+    response, body = fetch(client, "/text?size=50")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert body == b"x" * 50
+
+    response, body = fetch(client, "/text?size=5000")
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) == len(body) < 5000
+    assert gzip.decompress(body) == b"x" * 5000
+
+
+def test_streams_are_compressed_once_they_pass_the_threshold():
+    client = raw_client()
+
+    response, body = fetch(client, "/stream?lines=1")
+    assert "content-encoding" not in response.headers
+    assert body == LINE
+
+    response, body = fetch(client, "/stream?lines=500")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == LINE * 500
+
+    response, body = fetch(client, "/stream?lines=500&media_type=text/event-stream")
+    assert "content-encoding" not in response.headers
+    assert body == LINE * 500
+
+
+def test_api_responses_are_compressed_and_carry_cache_policies(db_app, create_product, product_payload):
+    productId = create_product()
+    for _ in range(20):
+        create_product()
+
+    response = db_app.get("/products/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 21
+    assert response.headers["cache-control"] == "no-cache"
+
+    assert db_app.get(f"/products/{productId}/").headers["cache-control"] == "no-cache"
+    assert db_app.get("/status/").headers["cache-control"] == "no-store"
+    assert "cache-control" not in db_app.put(f"/products/{productId}/", data=json.dumps(product_payload)).headers
+    assert "cache-control" not in db_app.get("/products/999/").headers
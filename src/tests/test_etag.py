@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+from app.api.models import ProductSchema
+from app.db import issue_crud, product_crud
+
+
+PRODUCT = {"title": "issue on something 1", "description": "something happened 1", "id": 1, "productOwner": "foo", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "version": 3}
+
+
+def test_get_product_returns_not_modified_when_etag_matches(test_app, monkeypatch):
+    monkeypatch.setattr(product_crud, "get", lambda db_session, id: PRODUCT)
+
+    response = test_app.get("/products/1/")
+    assert response.status_code == 200
+    assert response.headers["etag"] == 'W/"3"'
+
+    response = test_app.get("/products/1/", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = test_app.get("/products/1/", headers={"If-None-Match": 'W/"2"'})
+    assert response.status_code == 200
+
+
+def test_put_product_fails_with_precondition_failed_when_etag_is_stale(test_app, monkeypatch):
+    monkeypatch.setattr(product_crud, "get", lambda db_session, id: PRODUCT)
+
+    def mock_put(db_session, id, payload, version):
+        assert version == 2
+        return None
+
+    monkeypatch.setattr(product_crud, "put", mock_put)
+
+    response = test_app.put("/products/1/", data=json.dumps(PRODUCT), headers={"If-Match": 'W/"2"'})
+    assert response.status_code == 412
+
+
+def test_put_product_fails_with_precondition_failed_when_etag_is_malformed(test_app):
+    response = test_app.put("/products/1/", data=json.dumps(PRODUCT), headers={"If-Match": '"not-a-version"'})
+    assert response.status_code == 412
+
+
+def test_delete_issue_passes_if_match_version_to_crud(test_app, monkeypatch):
+    issue = {"title": "issue title 1", "description": "something happened 1", "productId": 1, "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status": "on hold", "createdBy": "foo", "id": 2, "createdDate": "2020-08-24T15:18:01.455618", "version": 7}
+
+    def mock_delete(db_session, productId, id, version):
+        assert version == 7
+        return issue
+
+    monkeypatch.setattr(issue_crud, "delete", mock_delete)
+
+    response = test_app.delete("/products/1/issues/2/", headers={"If-Match": 'W/"7"'})
+    assert response.status_code == 200
+
+
+def test_conditional_product_update_loses_to_a_concurrent_writer(db_engine, db_session):
+    payload = ProductSchema(title="product 1", description="something", productOwner="foo", createdBy="foo", updatedBy="foo", updatedDate=datetime(2020, 8, 23))
+    product = product_crud.post(db_session, payload)
+    assert product.version == 1
+
+    theirs = product_crud.put(db_session, product.id, payload.copy(update={"title": "theirs"}), version=1)
+    assert theirs.version == 2
+
+    assert product_crud.put(db_session, product.id, payload.copy(update={"title": "mine"}), version=1) is None
+    assert product_crud.get(db_session, product.id).title == "theirs"
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.api.models import IssueSchema
+from app.db import issue_crud
+from app.events import Broker, Event, broker, event_stream
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after: int):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks > self.disconnect_after
+
+
+def payload(event):
+    return json.loads(event.data)
+
+
+def test_broker_fans_out_per_product_and_resumes_from_history():
+    events = Broker(history=3)
+
+    async def scenario():
+        first, _ = events.subscribe(1)
+        second, _ = events.subscribe(1)
+        other, _ = events.subscribe(2)
+        for id in (10, 11, 12):
+            events.publish(1, "created", id)
+        await asyncio.sleep(0)
+        return first, second, other
+
+    first, second, other = asyncio.run(scenario())
+    assert [payload(first.queue.get_nowait())["id"] for _ in range(3)] == [10, 11, 12]
+    assert second.queue.qsize() == 3 and other.queue.empty()
+
+    evicted = events.events_since(1)[0].id
+    events.publish(1, "created", 13)
+    held = events.events_since(1)
+    assert [payload(event)["id"] for event in held] == [11, 12, 13]
+    assert [payload(event)["id"] for event in events.events_since(1, held[0].id)] == [12, 13]
+    # A client that saw the evicted event can still resume; one that did not, or predates the broker, must reset.
+    assert len(events.events_since(1, evicted)) == 3
+    assert events.events_since(1, evicted - 1) is None
+    assert events.events_since(1, 0) is None
+
+
+def test_slow_subscribers_are_dropped_instead_of_blocking_publishers():
+    events = Broker(queue_size=2)
+
+    async def scenario():
+        slow, _ = events.subscribe(1)
+        for id in range(3):
+            events.publish(1, "updated", id)
+        await asyncio.sleep(0)
+        return slow
+
+    slow = asyncio.run(scenario())
+    assert slow.overflowed
+    assert events.subscriber_count() == 0
+
+
+def test_event_stream_replays_backlog_then_sends_live_events_from_other_threads():
+    events = Broker()
+    events.publish(1, "created", 1)
+    resume_from = events.events_since(1)[0].id
+    events.publish(1, "updated", 1, {"id": 1, "title": "changed"})
+
+    async def collect():
+        chunks = []
+        stream = event_stream(FakeRequest(disconnect_after=1), events, 1, resume_from, heartbeat=0.05)
+        async for chunk in stream:
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                # A sync route publishes from a threadpool thread, not the event loop.
+                threading.Thread(target=events.publish, args=(1, "deleted", 1)).start()
+        return chunks
+
+    chunks = asyncio.run(collect())
+    assert chunks[0] == "retry: 3000\n\n"
+    assert "\nevent: updated\n" in chunks[1]
+    assert json.loads(chunks[1].split("data: ")[1])["issue"] == {"id": 1, "title": "changed"}
+    assert "event: deleted" in chunks[2]
+    assert chunks[3] == ": ping\n\n"
+    assert events.subscriber_count() == 0
+
+
+def test_event_stream_asks_for_a_reset_when_history_was_lost():
+    async def collect():
+        return [chunk async for chunk in event_stream(FakeRequest(disconnect_after=0), Broker(), 1, 1, heartbeat=0.01)]
+
+    assert asyncio.run(collect()) == ["retry: 3000\n\n", "event: reset\ndata: {}\n\n"]
+
+
+def test_streams_follow_arrival_order_whatever_the_ids():
+    events = Broker()
+    # Ids from different workers need not be ordered; a broadcast delivers every worker the same arrival order.
+    for id in (50, 7, 30):
+        events.receive(Event(id, 1, "created", str(id)))
+
+    async def collect(resume_from):
+        stream = event_stream(FakeRequest(disconnect_after=0), events, 1, resume_from, heartbeat=0.01)
+        return [chunk async for chunk in stream]
+
+    assert [chunk.split("\n")[0] for chunk in asyncio.run(collect(50))[1:]] == ["id: 7", "id: 30"]
+    assert [event.id for event in events.events_since(1, 7)] == [30]
+
+
+class RecordingTransport:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def notify(self, db_session, events):
+        if self.fail:
+            raise RuntimeError("NOTIFY failed")
+        # Still inside the write's transaction, so the new issue is visible here.
+        self.sent.append([(event.type, db_session.execute("SELECT count(*) FROM issues").scalar()) for event in events])
+
+
+def test_events_are_sent_with_the_commit_and_never_for_a_rollback(db_engine, create_product, issue_payload, monkeypatch):
+    productId = create_product()
+    db_session = sessionmaker(bind=db_engine)()
+    transport = RecordingTransport()
+    monkeypatch.setattr(broker, "transport", transport)
+
+    issue_crud.bulk_post(db_session, [IssueSchema(**dict(issue_payload, productId=productId))] * 3)
+    assert transport.sent == [[("created", 3)] * 3]
+
+    broker.stage(db_session, productId, "created", 1)
+    db_session.rollback()
+    db_session.commit()
+    assert len(transport.sent) == 1
+
+    monkeypatch.setattr(broker, "transport", RecordingTransport(fail=True))
+    with pytest.raises(RuntimeError):
+        issue_crud.bulk_post(db_session, [IssueSchema(**dict(issue_payload, productId=productId))])
+    db_session.rollback()
+    assert db_session.execute("SELECT count(*) FROM issues").scalar() == 3
+    db_session.close()
+
+
+def test_issue_writes_publish_events(db_app, create_product, create_issue, issue_payload):
+    broker.clear()
+    productId = create_product()
+    id = create_issue(productId)
+    db_app.put(f"/products/{productId}/issues/{id}/", data=json.dumps(dict(issue_payload, productId=productId, status="closed")))
+    db_app.delete(f"/products/{productId}/issues/{id}/")
+    bulk = db_app.post(f"/products/{productId}/issues/bulk", data=json.dumps([issue_payload])).json()["results"][0]["id"]
+
+    published = [payload(event) for event in broker.events_since(productId)]
+    assert [(event["type"], event["id"]) for event in published] == [("created", id), ("updated", id), ("deleted", id), ("created", bulk)]
+    assert published[1]["issue"]["status"] == "closed"
+    assert published[3]["issue"] is None
@@ -0,0 +1,37 @@
+import pytest
+
+from app.api import fast_json, issues, products
+
+UNICODE_PRODUCT = {"title": "produit ünïcode", "description": "something \"quoted\""}
+
+
+def issue(number):
+    return {"title": f"issue ✓ {number}", "description": "line\nbreak", "updatedDate": "2020-08-23T23:28:56" if number % 2 else "2020-08-23T23:28:56.000123"}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+def test_fast_path_renders_the_same_bytes_as_the_model_path(db_app, create_product, monkeypatch, backend):
+    productId = create_product(issues=[issue(number) for number in range(5)], **UNICODE_PRODUCT)
+    create_product(**dict(UNICODE_PRODUCT, updatedDate="2020-08-23T23:28:56"))
+    urls = [
+        "/products/", "/products/?limit=1&include=issues,issue_counts", f"/products/{productId}/issues/",
+        f"/products/{productId}/issues/?limit=2&sort=-updatedDate",
+    ]
+
+    golden = [db_app.get(url) for url in urls]
+    monkeypatch.setattr(products, "FAST_JSON", True)
+    monkeypatch.setattr(issues, "FAST_JSON", True)
+    fast = [db_app.get(url) for url in urls]
+
+    for expected, actual in zip(golden, fast):
+        assert expected.status_code == actual.status_code == 200
+        assert actual.content == expected.content
+        assert actual.headers.get("link") == expected.headers.get("link")
+        assert actual.headers["content-type"] == expected.headers["content-type"]
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import ingest
+from app.api.models import IssueSchema
+from app.db import ingest_crud, issue_crud
+from app.ingest import IngestQueue
+
+
+@pytest.fixture
+def payload(issue_payload):
+    def payload(productId, number=0):
+        return IssueSchema(**dict(issue_payload, title=f"issue {number}", productId=productId))
+
+    return payload
+
+
+def test_queue_group_commits_in_batches_and_records_tickets(db_engine, db_session, create_product, payload, monkeypatch):
+    factory = sessionmaker(bind=db_engine)
+    batches = []
+    bulk_post = issue_crud.bulk_post
+
+    def recording_bulk_post(db_session, payloads, tickets=None):
+        batches.append(len(payloads))
+        return bulk_post(db_session, payloads, tickets=tickets)
+
+    monkeypatch.setattr(issue_crud, "bulk_post", recording_bulk_post)
+    productId = create_product()
+    queue = IngestQueue(batch_size=3, window=0)
+    tickets = [queue.submit(payload(productId, number)) for number in range(7)]
+    assert {queue.status(ticket, productId) for ticket in tickets} == {"queued"}
+
+    queue.flush(factory)
+    assert batches == [3, 3, 1]
+    assert {queue.status(ticket, productId) for ticket in tickets} == {None}
+    ids = [ingest_crud.resolve(db_session, ticket, productId).issueId for ticket in tickets]
+    titles = {issue.id: issue.title for issue in issue_crud.get_all_by_product(db_session, productId=productId, limit=10)}
+    assert [titles[id] for id in ids] == [f"issue {number}" for number in range(7)]
+
+
+def test_a_failing_issue_fails_alone_and_any_worker_can_report_it(db_engine, db_session, create_product, payload):
+    productId = create_product()
+    queue = IngestQueue(batch_size=10, window=0)
+    good = [queue.submit(payload(productId, number)) for number in range(3)]
+    # No such product, so its insert breaks the batch.
+    bad = queue.submit(payload(999))
+    good.append(queue.submit(payload(productId, 3)))
+    queue.flush(sessionmaker(bind=db_engine))
+
+    assert [ingest_crud.resolve(db_session, ticket, productId).status for ticket in good] == ["created"] * 4
+    assert tuple(ingest_crud.resolve(db_session, bad, 999)) == ("failed", None)
+    assert queue.status(bad, 999) is None
+    assert ingest_crud.resolve(db_session, good[0], 999) is None
+
+
+def test_failures_stay_in_memory_when_they_cannot_be_written(db_engine, payload, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(issue_crud, "bulk_post", broken)
+    monkeypatch.setattr(ingest_crud, "fail", broken)
+    queue = IngestQueue(batch_size=10, window=0)
+    ticket = queue.submit(payload(1))
+    queue.flush(sessionmaker(bind=db_engine))
+    assert queue.status(ticket, 1) == "failed"
+    assert queue.status(ticket, 2) is None
+
+
+def test_background_task_drains_the_queue_on_stop(db_engine, db_session, create_product, payload):
+    productId = create_product()
+    queue = IngestQueue(batch_size=100, window=0.01)
+
+    async def scenario():
+        queue.start(sessionmaker(bind=db_engine))
+        tickets = [queue.submit(payload(productId, number)) for number in range(5)]
+        await queue.stop()
+        return tickets
+
+    tickets = asyncio.run(scenario())
+    assert all(ingest_crud.resolve(db_session, ticket, productId) is not None for ticket in tickets)
+
+
+def test_create_issue_returns_a_ticket_that_resolves_to_the_issue(db_app, db_engine, create_product, issue_payload, monkeypatch):
+    productId = create_product()
+    queue = IngestQueue(batch_size=10, window=0, maxsize=1)
+    monkeypatch.setattr(ingest, "INGEST_BATCHING", True)
+    monkeypatch.setattr(ingest, "ingest_queue", queue)
+
+    response = db_app.post(f"/products/{productId}/issues/", data=json.dumps(dict(issue_payload, productId=productId)))
+    assert response.status_code == 202
+    ticket = response.json()["ticket"]
+    assert response.headers["location"] == f"/products/{productId}/issues/tickets/{ticket}"
+    assert db_app.get(response.headers["location"]).json() == {"ticket": ticket, "status": "queued", "id": None}
+
+    overflow = db_app.post(f"/products/{productId}/issues/", data=json.dumps(dict(issue_payload, productId=productId)))
+    assert overflow.status_code == 503
+    assert overflow.headers["retry-after"] == "1"
+
+    queue.flush(sessionmaker(bind=db_engine))
+    resolved = db_app.get(f"/products/{productId}/issues/tickets/{ticket}").json()
+    assert resolved["status"] == "created"
+    assert db_app.get(f"/products/{productId}/issues/{resolved['id']}/").status_code == 200
+    assert db_app.get(f"/products/{productId}/issues/tickets/unknown").status_code == 404
+    assert db_app.get(f"/products/{productId + 1}/issues/tickets/{ticket}").status_code == 404
@@ -0,0 +1,46 @@
+import json
+import logging
+
+from app import instrumentation
+from app.db import product_crud
+from app.metrics import Registry
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", labels=("route",))
+    latency = registry.histogram("latency_seconds", "Latency.", (0.1, 1.0))
+    requests.labels('/a"b').inc(2)
+    latency.observe(0.5)
+
+    text = registry.render()
+    assert '# TYPE requests_total counter\nrequests_total{route="/a\\"b"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+    assert "latency_seconds_count 1" in text
+
+
+def test_metrics_are_labelled_by_route_template(test_app, product_payload, monkeypatch):
+    product = dict(product_payload, id=42, createdDate=product_payload["updatedDate"])
+    monkeypatch.setattr(product_crud, "get", lambda db_session, id: product)
+
+    assert test_app.get("/products/42/").status_code == 200
+    text = test_app.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/products/{id}/",status="200"}' in text
+    assert "/products/42/" not in text
+
+
+def test_statements_are_counted_per_request_and_slow_ones_logged(db_app, db_engine, product_payload, monkeypatch, caplog):
+    instrumentation.instrument_engine(db_engine)
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_SECONDS", 0.0)
+    per_request = instrumentation.statements_per_request.labels("/products/")
+    before = per_request.snapshot()
+
+    with caplog.at_level(logging.WARNING, logger="app.db.slow_query"):
+        assert db_app.post("/products/", data=json.dumps(product_payload)).status_code == 201
+
+    after = per_request.snapshot()
+    assert after["count"] == before["count"] + 1
+    assert after["sum"] >= before["sum"] + 1
+    assert any("route=/products/" in record.getMessage() and "INSERT INTO products" in record.getMessage() for record in caplog.records)
@@ -1,4 +1,6 @@
 import json
+from datetime import datetime
+from types import SimpleNamespace
 
 import pytest
 
@@ -61,13 +63,122 @@ def test_get_reads_all_issues_for_given_productId_successfully(test_app, monkeyp
         {"title": "issue title 2", "description": "something happened 2", "id": 2, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
     ]
 
-    def mock_get_all(db_session, productId):
+    def mock_get_all(db_session, productId, limit, after, after_value, sort, filters, fields):
         return test_data
 
     monkeypatch.setattr(issue_crud, "get_all_by_product", mock_get_all)
     response = test_app.get("/products/1/issues")
     assert response.status_code == 200
     assert response.json() == test_data
+    assert "link" not in response.headers
+
+def test_get_reads_issues_page_with_next_cursor_link(test_app, monkeypatch):
+    test_data = [
+        {"title": "issue title 1", "description": "something happened 1", "id": 1, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"},
+        {"title": "issue title 2", "description": "something happened 2", "id": 2, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
+    ]
+    calls = []
+
+    def mock_get_all(db_session, productId, limit, after, after_value, sort, filters, fields):
+        calls.append((limit, after))
+        return [SimpleNamespace(**issue) for issue in test_data if after is None or issue["id"] > after][:limit]
+
+    monkeypatch.setattr(issue_crud, "get_all_by_product", mock_get_all)
+    response = test_app.get("/products/1/issues/?limit=1")
+    assert response.status_code == 200
+    assert response.json() == test_data[:1]
+    next_url = response.headers["link"].split(";")[0].strip("<>")
+
+    response = test_app.get(next_url)
+    assert response.status_code == 200
+    assert response.json() == test_data[1:]
+    assert "link" not in response.headers
+    assert calls == [(2, None), (2, 1)]
+
+def test_get_read_issues_fails_with_invalid_cursor(test_app, monkeypatch):
+    response = test_app.get("/products/1/issues/?after=not-a-cursor")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "invalid cursor"
+
+def test_get_streams_issues_as_ndjson(test_app, monkeypatch):
+    test_data = [
+        {"title": "issue title 1", "description": "something happened 1", "id": 1, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"},
+        {"title": "issue title 2", "description": "something happened 2", "id": 2, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
+    ]
+
+    def mock_stream(db_session, productId, after, filters):
+        return iter([SimpleNamespace(**issue) for issue in test_data])
+
+    monkeypatch.setattr(issue_crud, "stream_by_product", mock_stream)
+    response = test_app.get("/products/1/issues/?stream=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == test_data
+
+    for query in ("sort=-updatedDate", "sort=-id", "fields=title"):
+        response = test_app.get(f"/products/1/issues/?stream=true&{query}")
+        assert response.status_code == 400
+        assert response.json()["detail"] == "stream does not support sort or fields"
+
+def test_get_reads_issues_with_filters_and_sort(test_app, monkeypatch):
+    calls = []
+
+    def mock_get_all(db_session, productId, limit, after, after_value, sort, filters, fields):
+        calls.append((sort, filters, fields))
+        return []
+
+    monkeypatch.setattr(issue_crud, "get_all_by_product", mock_get_all)
+    response = test_app.get("/products/1/issues/?status=open&assignedTo=bar&updatedAfter=2020-08-23T00:00:00&sort=-updatedDate")
+    assert response.status_code == 200
+    sort, filters, fields = calls[0]
+    assert sort == "-updatedDate"
+    assert filters["status"] == "open"
+    assert filters["assignedTo"] == "bar"
+    assert filters["updatedAfter"].isoformat() == "2020-08-23T00:00:00"
+    assert filters["createdBy"] is None
+    assert fields is None
+
+def test_get_reads_issues_sorted_by_date_with_next_cursor_link(test_app, monkeypatch):
+    test_data = [
+        {"title": "issue title 1", "description": "something happened 1", "id": 1, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-24T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"},
+        {"title": "issue title 2", "description": "something happened 2", "id": 2, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
+    ]
+    calls = []
+
+    def mock_get_all(db_session, productId, limit, after, after_value, sort, filters, fields):
+        calls.append((after, after_value))
+        rows = [SimpleNamespace(**dict(issue, updatedDate=datetime.fromisoformat(issue["updatedDate"]))) for issue in test_data]
+        return [row for row in rows if after_value is None or row.updatedDate < after_value][:limit]
+
+    monkeypatch.setattr(issue_crud, "get_all_by_product", mock_get_all)
+    response = test_app.get("/products/1/issues/?sort=-updatedDate&limit=1")
+    assert response.json() == test_data[:1]
+
+    response = test_app.get(response.headers["link"].split(";")[0].strip("<>"))
+    assert response.json() == test_data[1:]
+    assert calls == [(None, None), (1, datetime(2020, 8, 24, 23, 28, 56, 782000))]
+
+def test_get_reads_issues_fails_with_unknown_sort_key(test_app, monkeypatch):
+    response = test_app.get("/products/1/issues/?sort=description")
+    assert response.status_code == 422
+
+def test_get_reads_only_requested_issue_fields(test_app, monkeypatch):
+    calls = []
+
+    def mock_get_all(db_session, productId, limit, after, after_value, sort, filters, fields):
+        calls.append(fields)
+        return [("issue title 1", "open", 1)]
+
+    monkeypatch.setattr(issue_crud, "get_all_by_product", mock_get_all)
+    response = test_app.get("/products/1/issues/?fields=status,title")
+    assert response.status_code == 200
+    assert response.json() == [{"title": "issue title 1", "status": "open", "id": 1}]
+    assert calls == [["title", "status", "id"]]
+
+def test_get_read_issues_fails_with_unknown_field(test_app, monkeypatch):
+    response = test_app.get("/products/1/issues/?fields=title,secret")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "unknown fields: secret"
 
 def test_get_reads_issue_successfully_with_id(test_app, monkeypatch):
     test_data = {"title": "issue title 1","description": "something happened 1","productId": 2,"updatedBy": "foo","updatedDate": "2020-08-23T23:28:56.782000","assignedTo": "bar","status": "on hold","createdBy": "foo","id": 2,"createdDate": "2020-08-24T15:18:01.455618"}
@@ -112,12 +223,7 @@ def test_put_updates_issue_successfully_with_valid_data(test_app, monkeypatch):
     test_data = {"title": "issue title 1","description": "something happened 1","productId": 1,"updatedBy": "foo","updatedDate": "2020-08-23T23:28:56.782000","assignedTo": "bar","status": "on hold","createdBy": "foo","id": 2,"createdDate": "2020-08-24T15:18:01.455618"}
     test_update_data = {"title": "updated issue title","description": "updated description","productId": 1,"updatedBy": "updated foo","updatedDate": "2020-08-23T23:28:56.782000","assignedTo": "updated bar","status": "on hold","createdBy": "updated foo","id": 2,"createdDate": "2020-08-24T15:18:01.455618"}
 
-    def mock_get(db_session,productId, id):
-        return test_data
-
-    monkeypatch.setattr(issue_crud, "get_by_id", mock_get)
-
-    def mock_put(db_session, issue, title, description, productId, createdBy, updatedBy, updatedDate, assignedTo, status):
+    def mock_put(db_session, productId, id, payload, version):
         return test_update_data
 
     monkeypatch.setattr(issue_crud, "put", mock_put)
@@ -141,10 +247,10 @@ def test_put_updates_issue_successfully_with_valid_data(test_app, monkeypatch):
     ],
 )
 def test_put_update_issue_fails_with_invalid_data(test_app, monkeypatch, productId, id, payload, status_code):
-    def mock_get(db_session, productId, id):
+    def mock_put(db_session, productId, id, payload, version):
         return None
 
-    monkeypatch.setattr(issue_crud, "get_by_id", mock_get)
+    monkeypatch.setattr(issue_crud, "put", mock_put)
 
     response = test_app.put(f"/products/{productId}/issues/{id}/", data=json.dumps(payload),)
     assert response.status_code == status_code
@@ -152,12 +258,7 @@ def test_put_update_issue_fails_with_invalid_data(test_app, monkeypatch, product
 def test_delete_removes_issue_successfully_when_issue_exists(test_app, monkeypatch):
     test_data = {"title": "something happened 1", "description": "something happened 1", "id": 1, "productId": 1,  "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"}
 
-    def mock_get(db_session, productId, id):
-        return test_data
-
-    monkeypatch.setattr(issue_crud, "get_by_id", mock_get)
-
-    def mock_delete(db_session, productId, id):
+    def mock_delete(db_session, productId, id, version):
         return test_data
 
     monkeypatch.setattr(issue_crud, "delete", mock_delete)
@@ -167,10 +268,10 @@ def test_delete_removes_issue_successfully_when_issue_exists(test_app, monkeypat
     assert response.json() == test_data
 
 def test_delete_remove_issue_fails_when_issue_does_not_exist(test_app, monkeypatch):
-    def mock_get(db_session, productId, id):
+    def mock_delete(db_session, productId, id, version):
         return None
 
-    monkeypatch.setattr(issue_crud, "get_by_id", mock_get)
+    monkeypatch.setattr(issue_crud, "delete", mock_delete)
 
     response = test_app.delete("/products/999/issues/999/")
     assert response.status_code == 404
@@ -192,4 +293,79 @@ def test_delete_remove_issue_fails_when_issue_id_is_invalid(test_app, monkeypatc
     monkeypatch.setattr(issue_crud, "get_by_id", mock_get)
 
     response = test_app.delete("/products/1/issues/0/")
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+def test_bulk_post_creates_valid_issues_and_reports_invalid_ones(test_app, monkeypatch):
+    test_product = {"title": "issue on something 1", "description": "something happened 1", "id": 1, "product_owner": "foo", "createdBy": "foo",  "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000+00:00"}
+    test_data = [
+        {"title": "issue title 1", "description": "something happened 1", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"},
+        {"title": "", "description": "something happened 2", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"},
+        {"title": "issue title 3", "description": "something happened 3", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"on hold"},
+    ]
+    calls = []
+
+    def mock_get_product(db_session, productId):
+        calls.append(productId)
+        return test_product
+
+    monkeypatch.setattr(product_crud, "get", mock_get_product)
+
+    def mock_bulk_post(db_session, payloads):
+        assert [payload.productId for payload in payloads] == [7, 7]
+        return [10, 11]
+
+    monkeypatch.setattr(issue_crud, "bulk_post", mock_bulk_post)
+
+    response = test_app.post("/products/7/issues/bulk", data=json.dumps(test_data))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 2
+    assert body["failed"] == 1
+    assert [(result["index"], result["id"], result["status"]) for result in body["results"]] == [(0, 10, 201), (1, None, 422), (2, 11, 201)]
+    assert body["results"][1]["errors"][0]["loc"] == ["title"]
+    assert calls == [7]
+
+def test_bulk_post_fails_when_product_does_not_exist(test_app, monkeypatch):
+    def mock_get_product(db_session, productId):
+        return None
+
+    monkeypatch.setattr(product_crud, "get", mock_get_product)
+
+    response = test_app.post("/products/1/issues/bulk", data=json.dumps([{"title": "issue title 1"}]))
+    assert response.status_code == 404
+    assert response.json()["detail"] == "product not found! Must create product first"
+
+def test_bulk_post_fails_when_batch_is_too_large(test_app, monkeypatch):
+    monkeypatch.setattr("app.api.issues.BULK_MAX_ITEMS", 1)
+
+    response = test_app.post("/products/1/issues/bulk", data=json.dumps([{}, {}]))
+    assert response.status_code == 413
+
+def test_bulk_patch_updates_existing_issues_and_reports_missing_ones(test_app, monkeypatch):
+    test_data = [
+        {"id": 1, "title": "issue title 1", "description": "something happened 1", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"closed"},
+        {"id": 2, "title": "issue title 2", "description": "something happened 2", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000", "assignedTo": "bar", "status":"closed"},
+    ]
+
+    def mock_bulk_put(db_session, productId, payloads):
+        return {1}
+
+    monkeypatch.setattr(issue_crud, "bulk_put", mock_bulk_put)
+
+    response = test_app.patch("/products/1/issues/bulk", data=json.dumps(test_data))
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"index": 0, "id": 1, "status": 200, "errors": None},
+        {"index": 1, "id": 2, "status": 404, "errors": "issue not found"},
+    ]
+
+def test_bulk_delete_removes_existing_issues_and_reports_missing_ones(test_app, monkeypatch):
+    def mock_bulk_delete(db_session, productId, ids):
+        return {3}
+
+    monkeypatch.setattr(issue_crud, "bulk_delete", mock_bulk_delete)
+
+    response = test_app.delete("/products/1/issues/bulk", data=json.dumps([3, 4]))
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (1, 1)
+    assert [result["status"] for result in body["results"]] == [200, 404]
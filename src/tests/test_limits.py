@@ -0,0 +1,112 @@
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.limits import ConcurrencyLimiter, LoadShedMiddleware, RateLimitMiddleware, TokenBuckets, request_cost
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def limited_client(middleware, **options):
+    app = FastAPI()
+    app.add_middleware(middleware, **options)
+
+    @app.get("/cheap")
+    def cheap():
+        return {}
+
+    @app.get("/expensive")
+    @request_cost(3)
+    def expensive():
+        return {}
+
+    @app.get("/health")
+    @request_cost(0)
+    def health():
+        return {}
+
+    return TestClient(app)
+
+
+def test_token_buckets_refill_at_the_rate_up_to_the_burst():
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=2, burst=4, max_clients=2, clock=clock)
+    assert [buckets.take("a", 1) for _ in range(4)] == [0, 0, 0, 0]
+    assert buckets.take("a", 1) == 0.5
+    assert buckets.take("a", 3) == 1.5
+
+    clock.now = 1.0
+    assert buckets.take("a", 2) == 0
+    assert buckets.take("b", 10) == 0
+    clock.now = 100.0
+    assert [buckets.take("a", 1) for _ in range(5)][-1] == 0.5
+
+    # Only the two most recent clients are remembered; "b" is forgotten and starts full.
+    buckets.take("c", 4)
+    assert buckets.take("b", 4) == 0
+
+
+def test_concurrency_limit_backs_off_on_slow_checkouts_and_recovers_when_saturated():
+    clock = FakeClock()
+    limiter = ConcurrencyLimiter(max_limit=8, min_limit=2, target_wait=0.02, interval=1, backoff=0.5, clock=clock)
+    assert [limiter.acquire(2) for _ in range(5)] == [True, True, True, True, False]
+    assert limiter.acquire(1) is False
+
+    clock.now = 1
+    limiter.release(2, wait=0.5)
+    assert limiter.limit == 4
+    limiter.release(2, wait=0.5)
+    assert limiter.limit == 4
+    clock.now = 2
+    limiter.release(2, wait=0.5)
+    clock.now = 3
+    limiter.release(2, wait=0.5)
+    assert (limiter.limit, limiter.in_flight) == (2, 0)
+
+    assert limiter.acquire(5) is True
+    clock.now = 4
+    limiter.release(5, wait=0.0)
+    assert limiter.limit == 3
+    clock.now = 5
+    limiter.release(0, wait=0.0)
+    assert limiter.limit == 3
+
+
+def test_rate_limit_answers_429_per_client_with_retry_after():
+    client = limited_client(RateLimitMiddleware, buckets=TokenBuckets(rate=1, burst=4), api_keys={"known"})
+    assert client.get("/expensive").status_code == 200
+    assert client.get("/cheap").status_code == 200
+
+    refused = client.get("/expensive")
+    assert refused.status_code == 429
+    assert refused.headers["retry-after"] == "3"
+    assert refused.json() == {"detail": "rate limit exceeded"}
+
+    # Unknown keys share the address's bucket, so rotating them buys nothing.
+    assert client.get("/expensive", headers={"X-API-Key": "rotated"}).status_code == 429
+    assert client.get("/expensive", headers={"X-API-Key": "known"}).status_code == 200
+    assert all(client.get("/health").status_code == 200 for _ in range(10))
+
+
+def test_load_shedding_answers_503_while_the_limit_is_used_up():
+    limiter = ConcurrencyLimiter(max_limit=4, min_limit=1, target_wait=0.02, interval=0)
+    waits = [0.0]
+    client = limited_client(LoadShedMiddleware, limiter=limiter, pool_wait=lambda: waits[-1])
+    assert limiter.acquire(2)
+
+    refused = client.get("/expensive")
+    assert refused.status_code == 503
+    assert refused.headers["retry-after"] == "1"
+    assert client.get("/cheap").status_code == 200
+    assert client.get("/health").status_code == 200
+    assert limiter.in_flight == 2
+
+    waits.append(0.5)
+    client.get("/cheap")
+    assert limiter.limit == 3
+    assert client.get("/expensive").status_code == 503
@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.pool import StaticPool
+
+from app.db import migrations
+
+
+def sqlite_engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+def test_upgrade_creates_schema_and_indexes():
+    engine = sqlite_engine()
+    applied = migrations.upgrade(engine)
+    assert applied[:2] == ["v0001_initial", "v0002_issue_indexes"]
+
+    inspector = inspect(engine)
+    assert {"products", "issues", "schema_migrations"} <= set(inspector.get_table_names())
+    indexes = {index["name"]: index["column_names"] for index in inspector.get_indexes("issues")}
+    assert indexes["ix_issues_productId_id"] == ["productId", "id"]
+    assert indexes["ix_issues_productId_status_updatedDate"] == ["productId", "status", "updatedDate"]
+
+
+def test_upgrade_is_idempotent_and_honours_target():
+    engine = sqlite_engine()
+    assert migrations.upgrade(engine, target=1) == ["v0001_initial"]
+    assert [applied for _, _, applied in migrations.status(engine)][:2] == [True, False]
+
+    assert migrations.upgrade(engine)[0] == "v0002_issue_indexes"
+    assert migrations.upgrade(engine) == []
+
+
+def test_models_match_migrated_indexes():
+    from app.api.models import Issue
+
+    model_indexes = {index.name for index in Issue.__table__.indexes}
+    engine = sqlite_engine()
+    migrations.upgrade(engine)
+    assert model_indexes <= {index["name"] for index in inspect(engine).get_indexes("issues")}
+
+
+def test_ingest_tickets_match_the_model():
+    from app.api.models import IngestTicket
+
+    engine = sqlite_engine()
+    migrations.upgrade(engine)
+    columns = {column["name"]: column["nullable"] for column in inspect(engine).get_columns("issue_ingest_tickets")}
+    assert columns == {column.name: column.nullable for column in IngestTicket.__table__.columns}
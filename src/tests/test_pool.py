@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+
+from app.db.pool import InstrumentedNullPool, InstrumentedQueuePool, pool_status
+
+
+def test_queue_pool_tracks_checkouts_and_wait_time():
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=2, max_overflow=0)
+    first = pool.connect()
+    second = pool.connect()
+
+    status = pool_status(pool)
+    assert status["checked_out"] == 2
+    assert status["size"] == 2
+    assert status["wait_seconds"]["count"] == 2
+
+    first.close()
+    second.close()
+    assert pool_status(pool)["checked_out"] == 0
+
+
+def test_queue_pool_counts_timeouts():
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.01)
+    connection = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+
+    status = pool_status(pool)
+    assert status["timeouts"] == 1
+    assert status["wait_seconds"]["count"] == 2
+    assert status["recent_wait_seconds"] > 0
+    connection.close()
+
+
+def test_null_pool_keeps_statistics_across_recreate():
+    pool = InstrumentedNullPool(lambda: sqlite3.connect(":memory:"))
+    pool.connect().close()
+    recreated = pool.recreate()
+    assert recreated.stats is pool.stats
+    assert pool_status(recreated)["wait_seconds"]["count"] == 1
@@ -0,0 +1,44 @@
+def test_included_issues_cost_the_same_queries_for_any_number_of_products(db_app, create_product, query_budget):
+    for _ in range(2):
+        create_product(issues=3)
+    with query_budget(postgresql=3, sqlite=3) as few:
+        response = db_app.get("/products/?include=issues,issue_counts")
+    assert len(response.json()) == 2
+
+    for _ in range(10):
+        create_product(issues=3)
+    with query_budget(postgresql=3, sqlite=3) as many:
+        response = db_app.get("/products/?include=issues,issue_counts")
+    assert len(response.json()) == 12
+    assert len(few) == len(many)
+
+
+def test_includes_embed_counts_and_latest_issues(db_app, create_product):
+    first, second = create_product(issues=4), create_product(issues=4)
+    create_product()
+
+    products = db_app.get("/products/?include=issues,issue_counts&issueLimit=2").json()
+    assert [product["issueCount"] for product in products] == [4, 4, 0]
+    assert [issue["title"] for issue in products[0]["latestIssues"]] == ["issue 3", "issue 2"]
+    assert products[2]["latestIssues"] == []
+
+    product = db_app.get(f"/products/{second}/?include=issue_counts")
+    assert product.json()["issueCount"] == 4
+    assert "latestIssues" not in product.json()
+    assert "etag" not in product.headers
+
+    plain = db_app.get(f"/products/{first}/").json()
+    assert "issueCount" not in plain and "latestIssues" not in plain
+    assert db_app.get("/products/?include=comments").status_code == 400
+
+
+def test_products_are_paginated_with_keyset_cursors(db_app, create_product):
+    ids = [create_product() for _ in range(5)]
+
+    seen, url = [], "/products/?limit=2&include=issue_counts"
+    while url:
+        response = db_app.get(url)
+        seen += [product["id"] for product in response.json()]
+        link = response.headers.get("link")
+        url = link[1:link.index(">")] if link else None
+    assert seen == ids
@@ -72,7 +72,7 @@ def test_get_reads_all_products_successfully(test_app, monkeypatch):
         {"title": "issue on something 2", "description": "something happened 2", "id": 2, "productOwner": "foo", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000+00:00", "createdDate": "2020-08-23T23:28:56.782000+00:00"},
     ]
 
-    def mock_get_all(db_session):
+    def mock_get_all(db_session, fields=None, limit=None, after=None):
         return test_data
 
     monkeypatch.setattr(product_crud, "get_all", mock_get_all)
@@ -86,12 +86,7 @@ def test_put_updates_product_successfully_with_valid_data(test_app, monkeypatch)
     test_data = {"title": "issue on something 1", "description": "something happened 1", "id": 1, "productOwner": "foo", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000+00:00", "createdDate": "2020-08-23T23:28:56.782000+00:00"}
     test_update_data = {"title": "issue updated", "description": "updated", "id": 1, "productOwner": "foo", "createdBy": "foo", "updatedBy": "bar", "updatedDate": "2020-08-24T11:28:56.782000", "createdDate": "2020-08-23T23:28:56.782000+00:00"}
 
-    def mock_get(db_session, id):
-        return test_data
-
-    monkeypatch.setattr(product_crud, "get", mock_get)
-
-    def mock_put(db_session, product, title, description, productOwner, createdBy, updatedBy, updatedDate):
+    def mock_put(db_session, id, payload, version):
         return test_update_data
 
     monkeypatch.setattr(product_crud, "put", mock_put)
@@ -116,10 +111,10 @@ def test_put_updates_product_successfully_with_valid_data(test_app, monkeypatch)
     ],
 )
 def test_put_update_product_fails_with_invalid_data(test_app, monkeypatch, id, payload, status_code):
-    def mock_get(db_session, id):
+    def mock_put(db_session, id, payload, version):
         return None
 
-    monkeypatch.setattr(product_crud, "get", mock_get)
+    monkeypatch.setattr(product_crud, "put", mock_put)
 
     response = test_app.put(f"/products/{id}/", data=json.dumps(payload),)
     assert response.status_code == status_code
@@ -128,12 +123,7 @@ def test_put_update_product_fails_with_invalid_data(test_app, monkeypatch, id, p
 def test_delete_removes_product_successfully_when_product_exists(test_app, monkeypatch):
     test_data = {"title": "issue on something 1", "description": "something happened 1", "id": 1, "productOwner": "foo", "createdBy": "foo", "updatedBy": "foo", "updatedDate": "2020-08-23T23:28:56.782000+00:00", "createdDate": "2020-08-23T23:28:56.782000+00:00"}
 
-    def mock_get(db_session, id):
-        return test_data
-
-    monkeypatch.setattr(product_crud, "get", mock_get)
-
-    def mock_delete(db_session, id):
+    def mock_delete(db_session, id, version):
         return test_data
 
     monkeypatch.setattr(product_crud, "delete", mock_delete)
@@ -144,10 +134,10 @@ def test_delete_removes_product_successfully_when_product_exists(test_app, monke
 
 
 def test_delete_remove_product_fails_when_product_does_not_exist(test_app, monkeypatch):
-    def mock_get(db_session, id):
+    def mock_delete(db_session, id, version):
         return None
 
-    monkeypatch.setattr(product_crud, "get", mock_get)
+    monkeypatch.setattr(product_crud, "delete", mock_delete)
 
     response = test_app.delete("/products/999/")
     assert response.status_code == 404
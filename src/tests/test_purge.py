@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app.api.models import IssueSummary, ProductPurge
+from app.db import product_crud, stats_crud
+from app.events import broker
+
+
+def test_background_delete_purges_issues_in_batches(db_app, query_budget, create_product, monkeypatch):
+    monkeypatch.setattr(product_crud, "PURGE_BATCH_SIZE", 3)
+    productId = create_product(issues=7)
+    other = create_product(issues=2)
+
+    with query_budget(postgresql=100, sqlite=100) as statements:
+        response = db_app.delete(f"/products/{productId}/?background=true")
+    assert response.status_code == 202
+    assert response.headers["location"] == f"/products/{productId}/purge"
+    assert response.json()["status"] == "running" and response.json()["total"] == 7
+    assert len([statement for statement in statements if statement.startswith("DELETE FROM issues WHERE issues.id IN")]) == 3
+
+    # TestClient waits for background tasks, so the purge has finished by now.
+    progress = db_app.get(f"/products/{productId}/purge").json()
+    assert (progress["status"], progress["total"], progress["deleted"]) == ("done", 7, 7)
+    assert db_app.get(f"/products/{productId}/").status_code == 404
+    assert db_app.get(f"/products/{productId}/issues/").json() == []
+    assert len(db_app.get(f"/products/{other}/issues/").json()) == 2
+
+
+def test_background_delete_checks_the_product_first(db_app, create_product):
+    productId = create_product(issues=1)
+    assert db_app.delete("/products/999/?background=true").status_code == 404
+    assert db_app.delete(f"/products/{productId}/?background=true", headers={"If-Match": 'W/"7"'}).status_code == 412
+    assert db_app.get(f"/products/{productId}/purge").status_code == 404
+
+
+def test_a_running_purge_restarts_once_its_progress_goes_stale(db_session, create_product):
+    productId = create_product(issues=1)
+    _, started = product_crud.start_purge(db_session, productId)
+    assert started
+    _, started = product_crud.start_purge(db_session, productId)
+    assert not started
+
+    # Its worker died: the progress row was last touched long ago.
+    db_session.query(ProductPurge).update({"updatedDate": datetime(2020, 1, 1)}, synchronize_session=False)
+    db_session.commit()
+    purge, started = product_crud.start_purge(db_session, productId)
+    assert started and purge.status == "running"
+
+
+def test_purge_batches_take_their_issues_out_of_the_summary(db_engine, db_session, create_product, monkeypatch):
+    monkeypatch.setattr(stats_crud, "ISSUE_STATS_SUMMARY", True)
+    monkeypatch.setattr(product_crud, "PURGE_BATCH_SIZE", 2)
+    productId = create_product(issues=5)
+    product_crud.start_purge(db_session, productId)
+
+    def crash(db_session, id):
+        raise RuntimeError("worker stopped")
+
+    # Stop after the last batch, before the product and its summary rows go.
+    monkeypatch.setattr(product_crud, "delete", crash)
+    product_crud.purge(db_engine, productId)
+    assert product_crud.get_purge(db_session, productId).status == "failed"
+    counts = db_session.query(func.sum(IssueSummary.count)).filter(IssueSummary.productId == productId).scalar()
+    assert counts == 0
+
+
+def test_purged_issues_reach_event_streams_and_delta_syncs(db_app, db_engine, db_session, create_product, monkeypatch):
+    monkeypatch.setattr(product_crud, "PURGE_BATCH_SIZE", 2)
+    broker.clear()
+    productId = create_product(issues=3)
+    ids = sorted(issue["id"] for issue in db_app.get(f"/products/{productId}/issues/").json())
+    token = db_app.get(f"/products/{productId}/issues/changes").json()["next"]
+    product_crud.start_purge(db_session, productId)
+
+    def crash(db_session, id):
+        raise RuntimeError("worker stopped")
+
+    # Stop before the product goes, while its change feed can still be read.
+    monkeypatch.setattr(product_crud, "delete", crash)
+    product_crud.purge(db_engine, productId)
+    changes = db_app.get(f"/products/{productId}/issues/changes", params={"since": token}).json()
+    assert sorted(changes["deleted"]) == ids
+    deleted = [json.loads(event.data)["id"] for event in broker.events_since(productId) if event.type == "deleted"]
+    assert sorted(deleted) == ids
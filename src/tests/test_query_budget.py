@@ -0,0 +1,59 @@
+import json
+
+# Postgres budgets assume RETURNING; SQLite pays one extra SELECT per write instead.
+# Issue writes also bump the product's change sequence, and deletes leave a tombstone (see changes_crud).
+# Postgres deletes a product's issues and tombstones by ON DELETE CASCADE; SQLite deletes them explicitly.
+
+
+def test_product_writes_stay_within_round_trip_budget(db_app, query_budget, product_payload):
+    with query_budget(postgresql=1, sqlite=2):
+        response = db_app.post("/products/", data=json.dumps(product_payload))
+    assert response.status_code == 201
+    productId = response.json()["id"]
+
+    with query_budget(postgresql=1, sqlite=2):
+        response = db_app.put(f"/products/{productId}/", data=json.dumps(dict(product_payload, title="renamed")))
+    assert response.status_code == 200
+    assert response.json()["title"] == "renamed"
+
+    with query_budget(postgresql=2, sqlite=5):
+        response = db_app.delete(f"/products/{productId}/")
+    assert response.status_code == 200
+
+    with query_budget(postgresql=3, sqlite=6):
+        response = db_app.delete(f"/products/{productId}/")
+    assert response.status_code == 404
+
+
+def test_issue_writes_stay_within_round_trip_budget(db_app, query_budget, create_product, issue_payload):
+    productId = create_product()
+    body = dict(issue_payload, productId=productId)
+
+    with query_budget(postgresql=3, sqlite=4):
+        response = db_app.post(f"/products/{productId}/issues/", data=json.dumps(body))
+    assert response.status_code == 201
+    issue = response.json()
+
+    with query_budget(postgresql=2, sqlite=3):
+        response = db_app.put(
+            f"/products/{productId}/issues/{issue['id']}/", data=json.dumps(dict(body, status="closed")), headers={"If-Match": 'W/"1"'}
+        )
+    assert response.status_code == 200
+    assert response.headers["etag"] == 'W/"2"'
+
+    with query_budget(postgresql=3, sqlite=4):
+        response = db_app.delete(f"/products/{productId}/issues/{issue['id']}/", headers={"If-Match": 'W/"1"'})
+    assert response.status_code == 412
+
+    with query_budget(postgresql=3, sqlite=4):
+        response = db_app.delete(f"/products/{productId}/issues/{issue['id']}/", headers={"If-Match": 'W/"2"'})
+    assert response.status_code == 200
+
+
+def test_cached_reads_skip_the_database(db_app, query_budget, create_product):
+    productId = create_product()
+    db_app.get(f"/products/{productId}/")
+
+    with query_budget(postgresql=0, sqlite=0):
+        response = db_app.get(f"/products/{productId}/")
+    assert response.status_code == 200
@@ -0,0 +1,145 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from app import main
+from app.api.models import Product
+from app.db import db_factory, migrations
+from app.db.cache import cache, get_or_load
+from app.db.pool import PoolStats
+from app.db.replicas import PRIMARY_COOKIE, ReadYourWritesMiddleware, ReplicaSet, pinned_to_primary
+
+
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    migrations.upgrade(engine)
+    return engine
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_replicas_round_robin_and_skip_unhealthy_ones():
+    first, second = memory_engine(), memory_engine()
+    broken = create_engine("sqlite:////nonexistent/directory/replica.db")
+    clock = Clock()
+    replicas = ReplicaSet([first, broken, second], check_interval=5, clock=clock)
+
+    assert [replicas.choose() for _ in range(4)] == [first, second, second, first]
+    assert [replica["healthy"] for replica in replicas.status()] == [True, False, True]
+
+    # Until the next check is due a down replica is skipped without being probed again.
+    clock.now = 1
+    replicas.choose()
+    assert replicas.status()[1]["failures"] == 1
+    clock.now = 6
+    for _ in range(3):
+        replicas.choose()
+    assert replicas.status()[1]["failures"] == 2
+
+    assert ReplicaSet([broken], clock=clock).choose() is None
+
+
+def test_middleware_pins_reads_only_after_successful_writes():
+    app = FastAPI()
+
+    @app.post("/ok")
+    def ok():
+        return {}
+
+    @app.post("/missing")
+    def missing():
+        return PlainTextResponse("missing", status_code=404)
+
+    @app.get("/read")
+    def read():
+        return {}
+
+    client = TestClient(ReadYourWritesMiddleware(app, window=5))
+    assert PRIMARY_COOKIE not in client.get("/read").cookies
+    assert PRIMARY_COOKIE not in client.post("/missing").cookies
+    cookie = client.post("/ok").cookies[PRIMARY_COOKIE]
+    assert pinned_to_primary({PRIMARY_COOKIE: cookie})
+    assert not pinned_to_primary({PRIMARY_COOKIE: cookie}, now=float(cookie) + 1)
+    assert not pinned_to_primary({PRIMARY_COOKIE: "garbage"})
+
+
+def test_bypassing_sessions_skip_the_cache(db_session):
+    cache.clear()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return None
+
+    db_session.info["bypass_cache"] = True
+    get_or_load(db_session, object, "bypass-test", loader)
+    get_or_load(db_session, object, "bypass-test", loader)
+    assert len(loads) == 2
+
+
+@pytest.fixture
+def replicated_app(monkeypatch):
+    primary, replica = memory_engine(), memory_engine()
+    monkeypatch.setattr(db_factory, "_engine", primary)
+    monkeypatch.setattr(db_factory, "_replicas", ReplicaSet([replica]))
+    monkeypatch.setitem(db_factory.SessionLocal.kw, "bind", primary)
+    monkeypatch.setattr(main, "DATABASE_REPLICA_URLS", ["sqlite://"])
+    cache.clear()
+    yield TestClient(main.create_app(database_async=False))
+    cache.clear()
+
+
+def test_reads_use_the_replica_unless_the_client_just_wrote(replicated_app, product_payload):
+    # The replica never receives the write, standing in for one that is lagging behind.
+    id = replicated_app.post("/products/", data=json.dumps(product_payload)).json()["id"]
+    assert replicated_app.get(f"/products/{id}/").status_code == 200
+
+    replicated_app.cookies.clear()
+    assert replicated_app.get(f"/products/{id}/").status_code == 404
+    assert replicated_app.get("/products/").json() == []
+    assert replicated_app.get("/status/replicas").json()["replicas"][0]["healthy"] is True
+
+
+def test_load_shedding_watches_replica_pools_too(replicated_app):
+    for wait, engine in ((0.01, db_factory._engine), (0.3, db_factory._replicas.replicas[0].engine)):
+        engine.pool.stats = PoolStats()
+        engine.pool.stats.recent_wait = wait
+    assert db_factory.recent_pool_wait() == 0.3
+
+
+def test_load_shedding_refuses_the_async_mode(monkeypatch):
+    monkeypatch.setattr(main, "LOAD_SHEDDING", True)
+    with pytest.raises(RuntimeError, match="DATABASE_ASYNC"):
+        main.create_app(database_async=True)
+
+
+def test_replica_reads_do_not_cache_rows_from_before_a_recent_write(replicated_app, product_payload, monkeypatch):
+    monkeypatch.setattr(cache, "lag_window", 5.0)
+    replicated_app.post("/products/", data=json.dumps(product_payload))
+    replicated_app.cookies.clear()
+    assert replicated_app.get("/products/").json() == []
+
+    # Once the replica catches up its next read shows the product, because the lagging answer was not cached.
+    with db_factory._replicas.replicas[0].engine.begin() as connection:
+        connection.execute(Product.__table__.insert().values(dict(product_payload, updatedDate=datetime(2020, 8, 23), createdDate=datetime(2020, 8, 23))))
+    assert len(replicated_app.get("/products/").json()) == 1
+
+    monkeypatch.setattr(cache, "lag_window", 0.0)
+    cache.clear()
+    assert len(replicated_app.get("/products/").json()) == 1
+    with db_factory._replicas.replicas[0].engine.begin() as connection:
+        connection.execute("DELETE FROM products")
+    # Without a recent invalidation replica reads fill the cache as before.
+    assert len(replicated_app.get("/products/").json()) == 1
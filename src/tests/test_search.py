@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app.db import search_crud
+from app.db.search_index import InvertedIndex
+
+
+def titles(response):
+    assert response.status_code == 200
+    return [result["title"] for result in response.json()]
+
+
+def test_inverted_index_ranks_title_matches_first_and_requires_every_term():
+    index = InvertedIndex()
+    index.add(1, 1, "open", "login page", "the crash happens on submit")
+    index.add(2, 1, "open", "crash on login", "stack trace attached")
+    index.add(3, 2, "closed", "crash report", "nothing to do with logins")
+
+    assert [id for id, _ in index.search("crash")] == [2, 3, 1]
+    assert [id for id, _ in index.search("Login CRASH")] == [2, 1]
+    assert [id for id, _ in index.search("crash", productId=2, status="closed")] == [3]
+    assert index.search("crash missing") == []
+
+    index.remove(2)
+    index.remove_product(2)
+    assert [id for id, _ in index.search("crash")] == [1]
+    assert len(index) == 1
+
+
+def test_search_is_ranked_scoped_and_paginated(db_app, create_product, create_issue):
+    productId = create_product()
+    otherId = create_product()
+    create_issue(productId, title="printer jams", description="paper gets stuck in the printer")
+    create_issue(productId, title="slow dashboard", description="reported next to the printer", status="closed")
+    create_issue(otherId, title="printer offline", description="cannot reach the printer")
+
+    response = db_app.get("/issues/search", params={"q": "printer"})
+    assert sorted(titles(response)[:2]) == ["printer jams", "printer offline"]
+    assert titles(response)[2] == "slow dashboard"
+    assert all(result["rank"] > 0 for result in response.json())
+
+    assert titles(db_app.get("/issues/search", params={"q": "printer", "productId": productId})) == ["printer jams", "slow dashboard"]
+    assert titles(db_app.get("/issues/search", params={"q": "printer", "status": "closed"})) == ["slow dashboard"]
+    assert titles(db_app.get("/issues/search", params={"q": "scanner"})) == []
+
+    first = db_app.get("/issues/search", params={"q": "printer", "limit": 2})
+    assert titles(first) == titles(response)[:2]
+    next_url = first.headers["Link"].split(";")[0].strip("<>")
+    second = db_app.get(next_url)
+    assert titles(second) == ["slow dashboard"]
+    assert "Link" not in second.headers
+
+
+def test_search_reflects_writes(db_app, create_product, create_issue, issue_payload):
+    productId = create_product()
+    id = create_issue(productId, title="printer jams", description="paper gets stuck")
+    assert titles(db_app.get("/issues/search", params={"q": "printer"})) == ["printer jams"]
+
+    db_app.put(f"/products/{productId}/issues/{id}/", data=json.dumps(dict(issue_payload, title="scanner jams", description="paper gets stuck", productId=productId)))
+    assert titles(db_app.get("/issues/search", params={"q": "printer"})) == []
+    assert titles(db_app.get("/issues/search", params={"q": "scanner"})) == ["scanner jams"]
+
+    db_app.post(f"/products/{productId}/issues/bulk", data=json.dumps([dict(issue_payload, title="scanner offline", description="no network")]))
+    assert sorted(titles(db_app.get("/issues/search", params={"q": "scanner"}))) == ["scanner jams", "scanner offline"]
+
+    db_app.delete(f"/products/{productId}/issues/{id}/")
+    assert titles(db_app.get("/issues/search", params={"q": "scanner"})) == ["scanner offline"]
+
+    db_app.delete(f"/products/{productId}/")
+    assert titles(db_app.get("/issues/search", params={"q": "scanner"})) == []
+
+
+def test_search_rejects_bad_input(db_app):
+    assert db_app.get("/issues/search").status_code == 422
+    assert db_app.get("/issues/search", params={"q": ""}).status_code == 422
+    assert db_app.get("/issues/search", params={"q": "printer", "after": "not-a-cursor"}).status_code == 400
+
+
+def test_searches_wait_for_the_first_load_to_finish(db_engine, create_product, monkeypatch):
+    create_product(issues=[{"title": f"printer {n}", "description": "paper jams"} for n in range(3)])
+    Session = sessionmaker(bind=db_engine)
+    started, add = threading.Event(), search_crud.index.add
+
+    def slow_add(*args):
+        started.set()
+        time.sleep(0.1)
+        add(*args)
+
+    monkeypatch.setattr(search_crud.index, "add", slow_add)
+    loader = threading.Thread(target=search_crud.search, args=(Session(), "printer"))
+    loader.start()
+    started.wait()
+    assert len(search_crud.search(Session(), "printer")) == 3
+    loader.join()
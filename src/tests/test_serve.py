@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from app import serve
+
+
+def test_worker_count_follows_cores():
+    assert serve.worker_count(4) == 4
+    assert serve.worker_count(4, per_core=2) == 8
+    assert serve.worker_count(16, maximum=6) == 6
+    assert serve.worker_count(1, per_core=0.5) == 1
+
+
+def test_pool_budget_splits_connections_across_workers():
+    assert serve.pool_budget(100, 4, pool_size=5, max_overflow=10) == (5, 10)
+    assert serve.pool_budget(40, 4, pool_size=5, max_overflow=10) == (5, 5)
+    assert serve.pool_budget(12, 4, pool_size=5, max_overflow=10) == (3, 0)
+    with pytest.raises(ValueError):
+        serve.pool_budget(3, 4, pool_size=5, max_overflow=10)
+    assert serve.pool_budget(12, 4, pool_size=5, max_overflow=10, reserved=1) == (2, 0)
+    with pytest.raises(ValueError):
+        serve.pool_budget(8, 8, pool_size=5, max_overflow=10, reserved=1)
+
+
+def test_arguments_default_from_environment_and_size_the_pool(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("MAX_REQUESTS", "500")
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "30")
+    monkeypatch.setenv("DB_POOL_SIZE", "5")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "10")
+    args = serve.parse_args(["--port", "9000"])
+
+    options = serve.gunicorn_options(args)
+    assert options["bind"] == "0.0.0.0:9000"
+    assert options["workers"] == 3
+    assert options["max_requests"] == 500
+    assert options["worker_class"].startswith("uvicorn.workers.")
+
+    serve.configure_pool(args)
+    assert (os.environ["DB_POOL_SIZE"], os.environ["DB_MAX_OVERFLOW"]) == ("5", "5")
+
+    monkeypatch.setenv("EVENTS_BROADCAST", "postgres")
+    serve.configure_pool(args)
+    assert (os.environ["DB_POOL_SIZE"], os.environ["DB_MAX_OVERFLOW"]) == ("5", "4")
+
+
+def test_workers_default_to_available_cores(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(serve, "available_cores", lambda: 6)
+    assert serve.parse_args([]).workers == 6
+    assert serve.parse_args(["--max-workers", "4"]).workers == 4
+
+
+def test_several_workers_turn_the_in_process_cache_off_unless_asked_for(monkeypatch, capsys):
+    # Set first so monkeypatch restores the original environment, whatever configure_cache writes.
+    monkeypatch.setenv("CACHE_BACKEND", "memory")
+    monkeypatch.delenv("CACHE_BACKEND")
+    serve.configure_cache(serve.parse_args(["--workers", "1"]))
+    assert "CACHE_BACKEND" not in os.environ
+
+    serve.configure_cache(serve.parse_args(["--workers", "4"]))
+    assert os.environ["CACHE_BACKEND"] == "none"
+    assert "cache" in capsys.readouterr().err
+
+    monkeypatch.setenv("CACHE_BACKEND", "redis")
+    serve.configure_cache(serve.parse_args(["--workers", "4"]))
+    assert os.environ["CACHE_BACKEND"] == "redis"
+    assert capsys.readouterr().err == ""
+
+
+def test_several_workers_broadcast_events_through_postgres(monkeypatch, capsys):
+    monkeypatch.setenv("EVENTS_BROADCAST", "local")
+    monkeypatch.delenv("EVENTS_BROADCAST")
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    serve.configure_events(serve.parse_args(["--workers", "1"]))
+    assert "EVENTS_BROADCAST" not in os.environ
+    with pytest.raises(SystemExit, match="EVENTS_BROADCAST"):
+        serve.configure_events(serve.parse_args(["--workers", "4"]))
+
+    monkeypatch.setenv("DATABASE_URL", "postgresql://app@db/app")
+    serve.configure_events(serve.parse_args(["--workers", "4"]))
+    assert os.environ["EVENTS_BROADCAST"] == "postgres"
+
+    monkeypatch.setenv("EVENTS_BROADCAST", "local")
+    serve.configure_events(serve.parse_args(["--workers", "4"]))
+    assert "own worker" in capsys.readouterr().err
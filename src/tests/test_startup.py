@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.db import db_factory
+from benchmarks.server import SRC_DIR
+from benchmarks.startup import parse_importtime
+
+IMPORT_CHECK = """
+import sys
+import app.main
+from app.db import db_factory
+assert db_factory._engine is None, "engine created at import"
+assert db_factory._database is None, "async database created at import"
+loaded = [name for name in ("databases", "app.api.async_products", "app.api.async_issues") if name in sys.modules]
+assert not loaded, loaded
+"""
+
+
+def test_importing_the_app_needs_no_database():
+    env = {name: value for name, value in os.environ.items() if name not in ("DATABASE_URL", "DATABASE_ASYNC")}
+    result = subprocess.run([sys.executable, "-c", IMPORT_CHECK], cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_engine_is_created_on_first_use(monkeypatch):
+    monkeypatch.setattr(db_factory, "_engine", None)
+    monkeypatch.setitem(db_factory.SessionLocal.kw, "bind", None)
+    monkeypatch.setattr(db_factory, "DATABASE_URL", None)
+    with pytest.raises(RuntimeError, match="DATABASE_URL"):
+        db_factory.get_engine()
+
+    monkeypatch.setattr(db_factory, "DATABASE_URL", "sqlite://")
+    engine = db_factory.get_engine()
+    assert db_factory.get_engine() is engine
+    assert db_factory.SessionLocal.kw["bind"] is engine
+    db_factory.dispose_engine()
+    assert db_factory._engine is None
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   app.metrics\n"
+        "import time:      3000 |       3500 | app.main\n"
+    )
+    assert parse_importtime(output) == [("app.metrics", 120, 120), ("app.main", 3000, 3500)]
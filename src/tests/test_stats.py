@@ -0,0 +1,61 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import stats_crud
+
+@pytest.fixture
+def seed(db_app, create_product, create_issue, issue_payload):
+    def seed():
+        productId = create_product()
+        otherId = create_product(issues=[{"status": "resolved"}, {"status": "open"}])
+        for status, assignedTo in (("open", "bar"), ("open", "baz"), ("closed", "bar"), ("on hold", "bar")):
+            create_issue(productId, status=status, assignedTo=assignedTo)
+
+        first = db_app.get(f"/products/{productId}/issues/").json()[0]
+        db_app.put(f"/products/{productId}/issues/{first['id']}/", data=json.dumps(dict(issue_payload, productId=productId, status="resolved", assignedTo="qux")))
+        db_app.delete(f"/products/{productId}/issues/{first['id'] + 1}/")
+        second = db_app.get(f"/products/{otherId}/issues/").json()[1]
+        db_app.patch(f"/products/{otherId}/issues/bulk", data=json.dumps([dict(issue_payload, status="closed", id=second["id"])]))
+        return productId, otherId
+
+    return seed
+
+
+@pytest.mark.parametrize("summary", [False, True])
+def test_issue_stats_are_grouped_by_status_assignee_and_age(db_app, seed, monkeypatch, summary):
+    monkeypatch.setattr(stats_crud, "ISSUE_STATS_SUMMARY", summary)
+    productId, otherId = seed()
+
+    response = db_app.get(f"/products/{productId}/issues/stats")
+    assert response.status_code == 200
+    assert response.json() == {
+        "productId": productId, "total": 3, "open": 1, "closed": 2,
+        "byStatus": {"resolved": 1, "closed": 1, "on hold": 1},
+        "byAssignee": {"qux": 1, "bar": 2},
+        "age": {"open": {"<1d": 1, "1-7d": 0, "7-30d": 0, "30-90d": 0, "90d+": 0},
+                "closed": {"<1d": 2, "1-7d": 0, "7-30d": 0, "30-90d": 0, "90d+": 0}},
+    }
+
+    stats = db_app.get("/products/stats").json()
+    assert stats["total"] == 5
+    assert stats["byStatus"] == {"resolved": 2, "closed": 2, "on hold": 1}
+    assert [(product["productId"], product["total"], product["closed"]) for product in stats["products"]] == [(productId, 3, 2), (otherId, 2, 2)]
+
+
+def test_summary_rebuild_matches_live_counts_for_old_issues(db_engine, db_session, seed, monkeypatch):
+    productId, _ = seed()
+    old = datetime.utcnow() - timedelta(days=40)
+    db_engine.execute(stats_crud.issues.update().where(stats_crud.issues.c.status == "on hold").values(createdDate=old))
+    live = stats_crud.all_stats(db_session)
+    assert live["age"]["open"]["30-90d"] == 1
+
+    with db_engine.begin() as connection:
+        stats_crud.rebuild_summary(connection)
+    monkeypatch.setattr(stats_crud, "ISSUE_STATS_SUMMARY", True)
+    assert stats_crud.all_stats(db_session) == live
+
+
+def test_issue_stats_fail_with_not_found_when_product_does_not_exist(db_app):
+    assert db_app.get("/products/999/issues/stats").status_code == 404
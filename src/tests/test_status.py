@@ -3,3 +3,18 @@ def test_status(test_app):
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
+
+def test_status_reports_pool_statistics(test_app):
+    response = test_app.get("/status/pool")
+    assert response.status_code == 200
+    assert "pool" in response.json()
+
+def test_status_reports_cache_statistics(test_app):
+    response = test_app.get("/status/cache")
+    assert response.status_code == 200
+    assert response.json()["backend"] == "memory"
+
+def test_status_reports_statement_count(test_app):
+    response = test_app.get("/status/queries")
+    assert response.status_code == 200
+    assert isinstance(response.json()["statements"], int)
@@ -0,0 +1,74 @@
+import asyncio
+import csv
+import io
+import json
+
+from app.api import issues, transfer
+
+
+
+def collect(records):
+    async def run():
+        return [record async for record in records]
+    return asyncio.run(run())
+
+
+async def chunked(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_records_survive_chunk_boundaries_multibyte_text_and_quoted_newlines(monkeypatch):
+    text = 'title,description\nfirst,"two\nlines, ""quoted"""\r\nsecond,ünïcode\n\nthird,\n'.encode()
+    chunks = [text[start:start + 5] for start in range(0, len(text), 5)]
+    assert collect(transfer.csv_records(chunked(*chunks), ["title", "description"])) == [
+        (1, {"title": "first", "description": 'two\nlines, "quoted"'}),
+        (2, {"title": "second", "description": "ünïcode"}),
+        (3, {"title": "third", "description": None}),
+    ]
+    # A quote inside an unquoted value is literal; an unterminated quoted value is cut off and reported.
+    monkeypatch.setattr(transfer, "CSV_MAX_RECORD_CHARS", 30)
+    text = 'title,description\nsays 5" long,ok\nopen,"never closed\nnext,row\nmore,rows\nlast,row\nfinal,"again\n'
+    assert collect(transfer.csv_records(chunked(text.encode()), ["title", "description"])) == [
+        (1, {"title": 'says 5" long', "description": "ok"}),
+        (2, None),
+        (3, {"title": "last", "description": "row"}),
+        (4, None),
+    ]
+    assert collect(transfer.ndjson_records(chunked(b'{"a": 1}\n[1]\n', b"not json\n"))) == [(1, {"a": 1}), (2, None), (3, None)]
+
+
+def test_export_and_import_round_trip_in_both_formats(db_app, create_product, monkeypatch):
+    monkeypatch.setattr(issues, "IMPORT_BATCH_SIZE", 2)
+    rows = [{"title": f"issue {number}", "description": 'says "hi",\nthen leaves'} for number in range(5)]
+    source = create_product(issues=rows)
+
+    for format in ("csv", "ndjson"):
+        exported = db_app.get(f"/products/{source}/issues/export?format={format}")
+        assert exported.status_code == 200
+        assert exported.headers["content-type"].startswith(transfer.MEDIA_TYPES[format])
+        target = create_product()
+
+        response = db_app.post(f"/products/{target}/issues/import?format={format}", data=exported.content)
+        assert response.json() == {"imported": 5, "failed": 0, "errors": []}
+        copied = db_app.get(f"/products/{target}/issues/").json()
+        assert [(issue["title"], issue["description"]) for issue in copied] == [(row["title"], row["description"]) for row in rows]
+        assert {issue["productId"] for issue in copied} == {target}
+
+    lines = db_app.get(f"/products/{source}/issues/export?format=csv").text.splitlines()
+    assert next(csv.reader(io.StringIO(lines[0]))) == issues.ISSUE_FIELDS
+
+
+def test_import_reports_rows_it_could_not_load(db_app, create_product, issue_payload):
+    productId = create_product()
+    body = "\n".join([json.dumps(issue_payload), "{broken", json.dumps(dict(issue_payload, title="x")), json.dumps(issue_payload)])
+
+    result = db_app.post(f"/products/{productId}/issues/import", data=body).json()
+    assert (result["imported"], result["failed"]) == (2, 2)
+    assert [(error["index"], error["status"]) for error in result["errors"]] == [(2, 422), (3, 422)]
+    assert result["errors"][0]["errors"] == "malformed row"
+
+    unknown = db_app.post(f"/products/{productId}/issues/import?format=csv", data="title,priority\nfoo,high\n")
+    assert unknown.status_code == 400
+    assert db_app.post("/products/999/issues/import", data=body).status_code == 404
+    assert db_app.get("/products/999/issues/export").status_code == 404